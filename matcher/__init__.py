@@ -1,2 +1,2 @@
-from .core import Matcher
+from .core import Matcher, MatcherSession
 from . import solvers
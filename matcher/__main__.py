@@ -5,7 +5,15 @@ CLI interface for the matcher
 import argparse
 import csv
 import json
+import numpy as np
 from .core import Matcher
+from .edge_files import (
+    read_edges,
+    read_edges_in_parallel,
+    edge_ids,
+    empty_edges,
+    to_edge_arrays,
+)
 from .solvers import MinMaxSolver, FairFlow
 import logging
 from collections import defaultdict
@@ -33,6 +41,9 @@ parser.add_argument(
         One or more score files,
         with each row containing comma-separated paperID, userID, and score (in that order).
         e.g. "paper1,reviewer1,0.5"
+        Files ending in .npz, .parquet, .arrow or .feather are read as columnar
+        edge files instead (see matcher/edge_files.py); this also applies to
+        --constraints and --probability_limits.
         """,
 )
 
@@ -105,7 +116,7 @@ parser.add_argument(
 # TODO: can argparse throw an error if the solver isn't in the list?
 parser.add_argument(
     "--solver",
-    help="Choose from: {}".format(["MinMax", "FairFlow", "Randomized", "FairIR", "PerturbedMaximization"]),
+    help="Choose from: {}".format(["MinMax", "FairFlow", "Randomized", "FairIR", "PerturbedMaximization", "Auction"]),
     default="MinMax",
 )
 
@@ -114,6 +125,83 @@ parser.add_argument(
     help="""JSON file with attribute constraints"""
 )
 
+parser.add_argument(
+    "--processes",
+    type=int,
+    help="""
+        Number of processes used to read CSV score files, which are split into
+        chunks and parsed in parallel, and to solve the components of the
+        problem with --decompose. Defaults to the number of CPUs.
+        """,
+)
+
+parser.add_argument(
+    "--encoder_cache_dir",
+    help="""
+        Directory in which to cache the encoded matrices. Reruns with the same
+        reviewers, papers, scores, weights, constraints and probability limits
+        load them from there instead of encoding the inputs again.
+        """,
+)
+
+parser.add_argument(
+    "--candidate_limit",
+    type=int,
+    help="""
+        For the MinMax and FairFlow solvers, only consider each paper's best
+        N reviewers (plus enough others to satisfy the reviewer loads) when
+        building the flow networks. The limit is widened automatically if the
+        pruned problem has no solution.
+        """,
+)
+
+parser.add_argument(
+    "--flow_backend",
+    choices=["ortools", "highs"],
+    help="""
+        Min-cost flow implementation used by the MinMax, FairFlow and
+        Randomized solvers. Defaults to ortools.
+        """,
+)
+
+parser.add_argument(
+    "--parallelism",
+    type=int,
+    help="""
+        Number of threads the Auction solver computes bids in.
+        """,
+)
+
+parser.add_argument(
+    "--cost_scale",
+    help="""
+        For the MinMax solver, multiply the edge costs by this integer before
+        truncating them to integers, or "auto" to choose the scale from the
+        scores. The rank-order loss of the scale is logged.
+        """,
+)
+
+parser.add_argument(
+    "--coarse_cost_scale",
+    type=int,
+    help="""
+        For the MinMax solver, first solve with the edge costs at this scale
+        (a divisor of --cost_scale), then solve again at --cost_scale with
+        only the edges that are nearly tied with the coarse solution.
+        """,
+)
+
+parser.add_argument(
+    "--decompose",
+    action="store_true",
+    help="""
+        Split the problem into the connected components of its allowed
+        paper-reviewer pairs, and solve them separately in --processes
+        worker processes. Supported by the MinMax, FairFlow and Auction
+        solvers.
+        """,
+)
+
 args = parser.parse_args()
 
 # Main Logic
@@ -129,6 +217,8 @@ if args.solver == "FairIR":
     solver_class = "FairIR"
 if args.solver == "PerturbedMaximization":
     solver_class = "PerturbedMaximization"
+if args.solver == "Auction":
+    solver_class = "Auction"
 
 if not solver_class:
     raise ValueError("Invalid solver class {}".format(args.solver))
@@ -141,41 +231,25 @@ weight_by_type = {
     score_file: args.weights[idx] for idx, score_file in enumerate(args.scores)
 }
 
-scores_by_type = {score_file: {"edges": []} for score_file in args.scores}
-
-for score_file in args.scores:
-    logger.info("processing file={}".format(score_file))
-    file_reviewers = []
-    file_papers = []
-
-    with open(score_file) as file_handle:
-
-        for row in csv.reader(file_handle):
-            paper_id = row[0].strip()
-            profile_id = row[1].strip()
-            score = row[2].strip()
-
-            file_reviewers.append(profile_id)
-            file_papers.append(paper_id)
-            scores_by_type[score_file]["edges"].append(
-                (paper_id, profile_id, score)
-            )
+logger.info("processing files={}".format(args.scores))
+edges_by_type = dict(
+    zip(
+        args.scores,
+        read_edges_in_parallel(args.scores, processes=args.processes),
+    )
+)
 
+for score_file, edges in edges_by_type.items():
+    file_papers, file_reviewers = edge_ids(edges)
     reviewer_set.update(file_reviewers)
     paper_set.update(file_papers)
 
-constraints = []
+constraint_edges = empty_edges()
 if args.constraints:
-    with open(args.constraints) as file_handle:
-        for row in csv.reader(file_handle):
-            paper_id = row[0]
-            profile_id = row[1]
-            constraint = row[2]
-
-            reviewer_set.update([profile_id])
-            paper_set.update([paper_id])
-
-            constraints.append((paper_id, profile_id, constraint))
+    constraint_edges = read_edges(args.constraints, strip=False)
+    constraint_papers, constraint_reviewers = edge_ids(constraint_edges)
+    reviewer_set.update(constraint_reviewers)
+    paper_set.update(constraint_papers)
 
 reviewers = sorted(list(reviewer_set))
 papers = sorted(list(paper_set))
@@ -188,58 +262,78 @@ if args.user_group_file:
             reviewer_email = row[1]
             user_group_map[group_id].append(reviewer_email)
 
-reviewers_copy = [reviewer for reviewer in reviewers]
 if args.user_group:
-    selected_reviewers = user_group_map.get(args.user_group)
-    for reviewer in reviewers:
-        if reviewer not in selected_reviewers:
-            reviewers_copy.remove(reviewer)
-    reviewers = reviewers_copy
+    selected_reviewers = set(user_group_map.get(args.user_group, []))
+    reviewers = [
+        reviewer for reviewer in reviewers if reviewer in selected_reviewers
+    ]
+
+# the same indexes the Encoder builds from these lists
+index_by_paper = {paper_id: idx for idx, paper_id in enumerate(papers)}
+index_by_reviewer = {
+    profile_id: idx for idx, profile_id in enumerate(reviewers)
+}
 
 minimums = [args.min_papers_default] * len(reviewers)
 maximums = [args.max_papers_default] * len(reviewers)
 
 if args.max_papers:
-    missing_reviewers = []
+    max_papers_by_reviewer = {}
     with open(args.max_papers) as file_handle:
-        for idx, row in enumerate(csv.reader(file_handle)):
-            profile_id = row[0]
-            max_assignment = int(row[1])
-
-            if profile_id in reviewers:
-                reviewer_idx = reviewers.index(profile_id)
-
-                maximums[reviewer_idx] = max_assignment
-            else:
-                missing_reviewers.append(profile_id)
+        for row in csv.reader(file_handle):
+            max_papers_by_reviewer[row[0]] = int(row[1])
+
+    reviewer_indices = np.fromiter(
+        (
+            index_by_reviewer.get(profile_id, -1)
+            for profile_id in max_papers_by_reviewer
+        ),
+        dtype=int,
+        count=len(max_papers_by_reviewer),
+    )
+    known = reviewer_indices >= 0
+
+    maximums = np.array(maximums)
+    maximums[reviewer_indices[known]] = np.fromiter(
+        max_papers_by_reviewer.values(),
+        dtype=int,
+        count=len(max_papers_by_reviewer),
+    )[known]
+    maximums = maximums.tolist()
+
+    missing_reviewers = [
+        profile_id
+        for profile_id, is_known in zip(max_papers_by_reviewer, known)
+        if not is_known
+    ]
     if missing_reviewers:
         logger.info(
-            "Reviewers missing in all score files: " + ", ".join(profile_id)
+            "Reviewers missing in all score files: "
+            + ", ".join(missing_reviewers)
         )
 
 demands = [args.num_reviewers] * len(papers)
 num_alternates = args.num_alternates
 
+scores_by_type = {
+    score_file: {
+        "edges": to_edge_arrays(edges, index_by_paper, index_by_reviewer)
+    }
+    for score_file, edges in edges_by_type.items()
+}
+constraints = to_edge_arrays(
+    constraint_edges, index_by_paper, index_by_reviewer
+)
+
 probability_limits = []
 if args.probability_limits:
     try:
         probability_limits = float(args.probability_limits)
     except ValueError:  # read from file
-        missing_reviewers = set()
-        missing_papers = set()
-        with open(args.probability_limits) as file_handle:
-            for row in csv.reader(file_handle):
-                paper_id = row[0].strip()
-                profile_id = row[1].strip()
-                limit = row[2].strip()
-
-                if profile_id in reviewer_set and paper_id in paper_set:
-                    probability_limits.append((paper_id, profile_id, limit))
-
-                if profile_id not in reviewer_set:
-                    missing_reviewers.add(profile_id)
-                if paper_id not in paper_set:
-                    missing_papers.add(paper_id)
+        limit_edges = read_edges(args.probability_limits)
+        limit_papers, limit_reviewers = edge_ids(limit_edges)
+        missing_reviewers = set(limit_reviewers) - reviewer_set
+        missing_papers = set(limit_papers) - paper_set
 
         if missing_reviewers:
             logger.info(
@@ -251,7 +345,10 @@ if args.probability_limits:
                 "Papers with probability limits but missing in all score files: "
                 + ", ".join(missing_papers)
             )
-        
+        probability_limits = to_edge_arrays(
+            limit_edges, index_by_paper, index_by_reviewer
+        )
+
 perturbation = 0.0
 if args.perturbation:
     try:
@@ -288,6 +385,18 @@ match_data = {
     "num_alternates": num_alternates,
     "allow_zero_score_assignments": args.allow_zero_score_assignments,
     "attribute_constraints": attr_constraints,
+    "encoder_cache_dir": args.encoder_cache_dir,
+    "candidate_limit": args.candidate_limit,
+    "flow_backend": args.flow_backend,
+    "parallelism": args.parallelism,
+    "cost_scale": (
+        int(args.cost_scale)
+        if args.cost_scale and args.cost_scale != "auto"
+        else args.cost_scale
+    ),
+    "coarse_cost_scale": args.coarse_cost_scale,
+    "decompose": args.decompose,
+    "processes": args.processes,
     "assignments_output": "assignments.json",
     "alternates_output": "alternates.json",
     "logger": logger,
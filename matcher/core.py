@@ -3,6 +3,7 @@ import logging
 import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from .solvers import (
     SolverException,
@@ -11,9 +12,14 @@ from .solvers import (
     RandomizedSolver,
     FairSequence,
     FairIR,
-    PerturbedMaximizationSolver
+    PerturbedMaximizationSolver,
+    AuctionSolver,
+    DecomposedSolver,
 )
+from .solvers.artifacts import SolverArtifacts
+from .solvers.quantization import COST_SCALES
 from .encoder import Encoder
+from .encoder_cache import EncoderCache
 
 SOLVER_MAP = {
     "MinMax": MinMaxSolver,
@@ -21,7 +27,17 @@ SOLVER_MAP = {
     "Randomized": RandomizedSolver,
     "FairSequence": FairSequence,
     "FairIR": FairIR,
-    "PerturbedMaximization": PerturbedMaximizationSolver
+    "PerturbedMaximization": PerturbedMaximizationSolver,
+    "Auction": AuctionSolver,
+}
+
+# optional solver arguments, and the solvers that accept them
+SOLVER_OPTIONS = {
+    "candidate_limit": (MinMaxSolver, FairFlow),
+    "flow_backend": (MinMaxSolver, FairFlow, RandomizedSolver),
+    "parallelism": (AuctionSolver,),
+    "cost_scale": (MinMaxSolver,),
+    "coarse_cost_scale": (MinMaxSolver,),
 }
 
 
@@ -62,6 +78,16 @@ class KeywordDatasource:
         bad_match_thresholds=[],
         allow_zero_score_assignments=False,
         attribute_constraints=None,
+        sparse=False,
+        compact=False,
+        encoder_cache_dir=None,
+        candidate_limit=None,
+        flow_backend=None,
+        parallelism=None,
+        cost_scale=None,
+        coarse_cost_scale=None,
+        decompose=False,
+        processes=None,
         assignments_output="assignments.json",
         alternates_output="alternates.json",
         logger=logging.getLogger(__name__),
@@ -82,6 +108,16 @@ class KeywordDatasource:
         self.normalization_types = []
         self.perturbation = perturbation
         self.bad_match_thresholds = bad_match_thresholds
+        self.sparse = sparse
+        self.compact = compact
+        self.encoder_cache_dir = encoder_cache_dir
+        self.candidate_limit = candidate_limit
+        self.flow_backend = flow_backend
+        self.parallelism = parallelism
+        self.cost_scale = cost_scale
+        self.coarse_cost_scale = coarse_cost_scale
+        self.decompose = decompose
+        self.processes = processes
         self.assignments_output = assignments_output
         self.alternates_output = alternates_output
         self.logger = logger
@@ -104,6 +140,43 @@ class KeywordDatasource:
         )
 
 
+def _largest_cost_scale(datasource):
+    """return the largest cost scale the solver may use on the datasource"""
+    cost_scale = getattr(datasource, "cost_scale", None)
+    if cost_scale is None:
+        return 1
+    if cost_scale == "auto":
+        return max(COST_SCALES)
+    return int(cost_scale)
+
+
+def build_encoder(datasource, logger=logging.getLogger(__name__)):
+    """Encode the papers, reviewers, scores and constraints of a datasource."""
+    encoder_cache_dir = getattr(datasource, "encoder_cache_dir", None)
+    return Encoder(
+        reviewers=datasource.reviewers,
+        papers=datasource.papers,
+        constraints=datasource.constraints,
+        scores_by_type=datasource.scores_by_type,
+        weight_by_type=datasource.weight_by_type,
+        normalization_types=datasource.normalization_types,
+        probability_limits=datasource.probability_limits,
+        attribute_constraints=datasource.attribute_constraints,
+        perturbation=datasource.perturbation,
+        bad_match_thresholds=datasource.bad_match_thresholds,
+        sparse=getattr(datasource, "sparse", False),
+        compact=getattr(datasource, "compact", False),
+        cost_scale=_largest_cost_scale(datasource),
+        keep_score_matrices=False,
+        cache=(
+            EncoderCache(encoder_cache_dir, logger=logger)
+            if encoder_cache_dir
+            else None
+        ),
+        logger=logger,
+    )
+
+
 class Matcher:
     """Main class that coordinates an Encoder and a Solver."""
 
@@ -150,41 +223,62 @@ class Matcher:
         self.alternates = alternates
         self.datasource.set_alternates(alternates)
 
-    def run(self):
+    def run(self, encoder=None):
         """
         Compute a match of reviewers to papers and post it to the as assignment notes.
         The config note's status field will be set to reflect completion or errors.
+
+        An `encoder` of the datasource can be passed to skip the encoding.
         """
         try:
             self.set_status(MatcherStatus.RUNNING)
 
             self.logger.debug("Start encoding")
 
-            encoder = Encoder(
-                reviewers=self.datasource.reviewers,
-                papers=self.datasource.papers,
-                constraints=self.datasource.constraints,
-                scores_by_type=self.datasource.scores_by_type,
-                weight_by_type=self.datasource.weight_by_type,
-                normalization_types=self.datasource.normalization_types,
-                probability_limits=self.datasource.probability_limits,
-                attribute_constraints=self.datasource.attribute_constraints,
-                perturbation=self.datasource.perturbation,
-                bad_match_thresholds=self.datasource.bad_match_thresholds,
-                logger=self.logger,
-            )
+            if encoder is None:
+                encoder = build_encoder(self.datasource, logger=self.logger)
 
             self.logger.debug("Preparing solver")
 
             # solver
-            solver = self.solver_class(
-                self.datasource.minimums,
-                self.datasource.maximums,
-                self.datasource.demands,
-                encoder,
-                allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
-                logger=self.logger,
-            )
+            solver_options = {}
+            for option, solver_classes in SOLVER_OPTIONS.items():
+                value = getattr(self.datasource, option, None)
+                if value is None:
+                    continue
+                if self.solver_class not in solver_classes:
+                    raise MatcherError(
+                        "{} is not supported by {}".format(
+                            option, self.solver_class.__name__
+                        )
+                    )
+                solver_options[option] = value
+
+            if getattr(self.datasource, "decompose", False):
+                # solve the connected components of the problem separately
+                solver_options["processes"] = getattr(
+                    self.datasource, "processes", None
+                )
+                solver = DecomposedSolver(
+                    self.solver_class,
+                    self.datasource.minimums,
+                    self.datasource.maximums,
+                    self.datasource.demands,
+                    encoder,
+                    allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
+                    logger=self.logger,
+                    **solver_options
+                )
+            else:
+                solver = self.solver_class(
+                    self.datasource.minimums,
+                    self.datasource.maximums,
+                    self.datasource.demands,
+                    encoder,
+                    allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
+                    logger=self.logger,
+                    **solver_options
+                )
 
             solution = None
             start_time = time.time()
@@ -242,3 +336,107 @@ class Matcher:
         except Exception as error_handle:
             self.logger.debug("Error={}".format(error_handle))
             self.set_status(MatcherStatus.ERROR, message=str(error_handle))
+
+
+class SessionDatasource:
+    """
+    The datasource of one solver run of a MatcherSession.
+
+    Reads are passed through to the session's datasource, except for the
+    loads and demands, which are copied because solvers modify them. The
+    assignments, alternates and status are kept instead of written.
+    """
+
+    def __init__(self, datasource):
+        self.datasource = datasource
+        self.minimums = list(datasource.minimums)
+        self.maximums = list(datasource.maximums)
+        self.demands = list(datasource.demands)
+        self.assignments = None
+        self.alternates = None
+        self.status = None
+        self.message = None
+        self.additional_status_info = {}
+
+    def __getattr__(self, name):
+        return getattr(self.datasource, name)
+
+    def set_assignments(self, assignments):
+        self.assignments = assignments
+
+    def set_alternates(self, alternates):
+        self.alternates = alternates
+
+    def set_status(self, status, message, additional_status_info={}):
+        self.status = status
+        self.message = message
+        self.additional_status_info = additional_status_info
+
+
+class MatcherSession:
+    """
+    Runs several solvers on one encoding of a datasource.
+
+    The datasource is encoded once, and the solvers share the inputs that
+    they derive from the Encoder (see SolverArtifacts). Each solver runs in
+    its own Matcher, with a SessionDatasource that keeps its results.
+    """
+
+    def __init__(self, datasource, logger=logging.getLogger(__name__)):
+        if isinstance(datasource, dict):
+            self.datasource = KeywordDatasource(**datasource)
+        else:
+            self.datasource = datasource
+
+        self.logger = logger
+        self.encoder = None
+        self.matchers = {}
+
+    def encode(self):
+        """return the Encoder of the datasource, encoding it on first use"""
+        if self.encoder is None:
+            self.logger.debug("Start encoding")
+            encoder = build_encoder(self.datasource, logger=self.logger)
+            encoder.artifacts = SolverArtifacts(encoder)
+            self.encoder = encoder
+        return self.encoder
+
+    def run(self, solver_classes, concurrent=False):
+        """
+        Run a Matcher for each of the named `solver_classes`, one after the
+        other or, if `concurrent`, in threads.
+
+        return a dict of the Matchers by solver name; the results of a run
+        are in the `datasource` of its Matcher.
+        """
+        for solver_class in solver_classes:
+            if solver_class not in SOLVER_MAP:
+                raise MatcherError(
+                    "Unknown solver {}, choose from {}".format(
+                        solver_class, list(SOLVER_MAP)
+                    )
+                )
+        encoder = self.encode()
+
+        matchers = {
+            solver_class: Matcher(
+                SessionDatasource(self.datasource),
+                solver_class,
+                logger=self.logger,
+            )
+            for solver_class in solver_classes
+        }
+        if concurrent and len(matchers) > 1:
+            with ThreadPoolExecutor(len(matchers)) as executor:
+                list(
+                    executor.map(
+                        lambda matcher: matcher.run(encoder=encoder),
+                        matchers.values(),
+                    )
+                )
+        else:
+            for matcher in matchers.values():
+                matcher.run(encoder=encoder)
+
+        self.matchers.update(matchers)
+        return matchers
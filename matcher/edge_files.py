@@ -0,0 +1,306 @@
+"""
+Readers for the (paper, reviewer, value) edge files passed to the CLI.
+
+Each file is read into an IndexedEdges: the distinct paper and reviewer IDs of
+the file, and aligned arrays of indices into them plus the edge values. IDs are
+only handled once per distinct value, so the CLI can translate a whole file to
+Encoder indices with array operations instead of per-row Python objects.
+
+Supported formats, chosen by file extension:
+- .npz: arrays `paper_ids`, `reviewer_ids` (the distinct IDs),
+  `paper_indices`, `reviewer_indices` (positions in those arrays) and
+  `values`, all of equal length except the ID arrays. See `save_npz_edges`.
+- .parquet, .arrow, .feather: a table whose first three columns are the
+  paper IDs, reviewer IDs and values. Requires pyarrow.
+- anything else: CSV rows of paperID, userID, value.
+"""
+
+import concurrent.futures
+import csv
+import os
+from collections import namedtuple
+import numpy as np
+from .encoder import EdgeArrays
+
+IndexedEdges = namedtuple(
+    "IndexedEdges",
+    [
+        "paper_ids",
+        "reviewer_ids",
+        "paper_indices",
+        "reviewer_indices",
+        "values",
+    ],
+)
+
+NPZ_EXTENSIONS = (".npz",)
+ARROW_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+# bytes of a CSV file parsed by one task of read_edges_in_parallel
+CSV_CHUNK_SIZE = 64 * 2**20
+
+
+def read_edges(path, strip=True):
+    """
+    Read an edge file into an IndexedEdges.
+
+    `strip` removes surrounding whitespace from CSV fields.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in NPZ_EXTENSIONS:
+        return _read_npz_edges(path)
+    if extension in ARROW_EXTENSIONS:
+        return _read_arrow_edges(path, extension)
+    return _read_csv_edges(path, strip)
+
+
+def save_npz_edges(path, paper_ids, reviewer_ids, values):
+    """
+    Save aligned columns of paper IDs, reviewer IDs and values as an .npz edge file.
+    """
+    distinct_paper_ids, paper_indices = _factorize(paper_ids)
+    distinct_reviewer_ids, reviewer_indices = _factorize(reviewer_ids)
+    np.savez(
+        path,
+        paper_ids=np.array(distinct_paper_ids, dtype=str),
+        reviewer_ids=np.array(distinct_reviewer_ids, dtype=str),
+        paper_indices=paper_indices,
+        reviewer_indices=reviewer_indices,
+        values=np.asarray(values, dtype=float),
+    )
+
+
+def to_edge_arrays(edges, index_by_paper, index_by_reviewer):
+    """
+    Translate an IndexedEdges into an EdgeArrays indexed against the Encoder's
+    papers and reviewers, dropping edges with unknown IDs.
+    """
+    paper_positions = _positions(edges.paper_ids, index_by_paper)
+    reviewer_positions = _positions(edges.reviewer_ids, index_by_reviewer)
+
+    paper_indices = paper_positions[edges.paper_indices]
+    reviewer_indices = reviewer_positions[edges.reviewer_indices]
+    known = (paper_indices >= 0) & (reviewer_indices >= 0)
+    return EdgeArrays(
+        paper_indices[known],
+        reviewer_indices[known],
+        np.asarray(edges.values, dtype=float)[known],
+    )
+
+
+def edge_ids(edges):
+    """return the paper IDs and reviewer IDs used by at least one edge"""
+    return (
+        [edges.paper_ids[i] for i in np.unique(edges.paper_indices)],
+        [edges.reviewer_ids[i] for i in np.unique(edges.reviewer_indices)],
+    )
+
+
+def empty_edges():
+    return IndexedEdges(
+        [], [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), []
+    )
+
+
+def _positions(ids, index_by_id):
+    """return the index of each ID in `index_by_id`, or -1 if it is missing"""
+    return np.fromiter(
+        (index_by_id.get(id_, -1) for id_ in ids),
+        dtype=np.int64,
+        count=len(ids),
+    )
+
+
+def _factorize(ids):
+    """return the distinct IDs in order of appearance, and each ID's index among them"""
+    index_by_id = dict.fromkeys(ids)
+    index_by_id.update(zip(index_by_id, range(len(index_by_id))))
+    indices = np.fromiter(
+        map(index_by_id.__getitem__, ids), dtype=np.int64, count=len(ids)
+    )
+    return list(index_by_id), indices
+
+
+def read_edges_in_parallel(
+    paths, strip=True, processes=None, chunk_size=CSV_CHUNK_SIZE
+):
+    """
+    Read several edge files, parsing CSV files in parallel.
+
+    Each CSV file is split into byte ranges of about `chunk_size` bytes, and
+    the ranges of all files are parsed by a pool of `processes` worker
+    processes (by default one per CPU). Other formats are read directly.
+    Return a list of IndexedEdges in the order of `paths`.
+    """
+    chunks_by_path = {}
+    tasks = []
+    for path in paths:
+        if _is_csv(path):
+            ranges = _byte_ranges(path, chunk_size)
+            chunks_by_path[path] = len(ranges)
+            tasks.extend((path, start, end, strip) for start, end in ranges)
+
+    if processes == 1 or len(tasks) <= 1:
+        parsed = [_parse_csv_chunk(*task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            parsed = list(executor.map(_parse_csv_chunk, *zip(*tasks)))
+
+    edges = []
+    for path in paths:
+        if path in chunks_by_path:
+            edges.append(_merge_chunks(parsed[: chunks_by_path[path]]))
+            parsed = parsed[chunks_by_path[path] :]
+        else:
+            edges.append(read_edges(path, strip))
+    return edges
+
+
+def _is_csv(path):
+    extension = os.path.splitext(path)[1].lower()
+    return extension not in NPZ_EXTENSIONS + ARROW_EXTENSIONS
+
+
+def _byte_ranges(path, chunk_size):
+    size = os.path.getsize(path)
+    return [
+        (start, min(start + chunk_size, size))
+        for start in range(0, max(size, 1), chunk_size)
+    ]
+
+
+def _parse_csv_chunk(path, start, end, strip):
+    """
+    Parse the CSV rows that start within bytes [start, end) of `path`, and
+    return them as an IndexedEdges with float values.
+
+    Rows are split with str.split over the whole chunk rather than one row
+    at a time. Chunks with quoted fields or rows that don't have exactly
+    three fields are parsed with the csv module instead.
+    """
+    with open(path, "rb") as file_handle:
+        if start > 0:
+            # skip the row that started in the previous range
+            file_handle.seek(start - 1)
+            file_handle.readline()
+        position = file_handle.tell()
+        data = b""
+        if position < end:
+            data = file_handle.read(end - position)
+            if not data.endswith(b"\n"):
+                data += file_handle.readline()
+
+    text = data.decode("utf-8").replace("\r\n", "\n")
+    if text.endswith("\n"):
+        text = text[:-1]
+    num_rows = text.count("\n") + 1 if text else 0
+    fields = text.replace("\n", ",").split(",") if text else []
+
+    if '"' in text or len(fields) != 3 * num_rows:
+        fields = []
+        for row in csv.reader(filter(None, text.splitlines())):
+            if len(row) < 3:
+                raise ValueError(
+                    "Expected paperID, userID and value in {}, got {}".format(
+                        path, row
+                    )
+                )
+            fields.extend(row[:3])
+    if strip and any(space in text for space in " \t\r\f\v"):
+        fields = list(map(str.strip, fields))
+
+    paper_ids, paper_indices = _factorize(fields[0::3])
+    reviewer_ids, reviewer_indices = _factorize(fields[1::3])
+    return IndexedEdges(
+        paper_ids,
+        reviewer_ids,
+        paper_indices,
+        reviewer_indices,
+        np.array(fields[2::3], dtype=float),
+    )
+
+
+def _merge_chunks(chunks):
+    """combine the IndexedEdges of consecutive chunks of one file"""
+    paper_ids, paper_indices = _merge_factorized(
+        [(chunk.paper_ids, chunk.paper_indices) for chunk in chunks]
+    )
+    reviewer_ids, reviewer_indices = _merge_factorized(
+        [(chunk.reviewer_ids, chunk.reviewer_indices) for chunk in chunks]
+    )
+    return IndexedEdges(
+        paper_ids,
+        reviewer_ids,
+        paper_indices,
+        reviewer_indices,
+        np.concatenate([np.empty(0)] + [chunk.values for chunk in chunks]),
+    )
+
+
+def _merge_factorized(factorized):
+    """combine (distinct IDs, indices) pairs, keeping the order of appearance"""
+    index_by_id = {}
+    merged_indices = [np.empty(0, dtype=np.int64)]
+    for ids, indices in factorized:
+        positions = np.fromiter(
+            (index_by_id.setdefault(id_, len(index_by_id)) for id_ in ids),
+            dtype=np.int64,
+            count=len(ids),
+        )
+        merged_indices.append(positions[indices])
+    return list(index_by_id), np.concatenate(merged_indices)
+
+
+def _read_csv_edges(path, strip):
+    return _merge_chunks(
+        [_parse_csv_chunk(path, 0, os.path.getsize(path), strip)]
+    )
+
+
+def _read_npz_edges(path):
+    with np.load(path, allow_pickle=False) as data:
+        return IndexedEdges(
+            data["paper_ids"].tolist(),
+            data["reviewer_ids"].tolist(),
+            data["paper_indices"].astype(np.int64, copy=False),
+            data["reviewer_indices"].astype(np.int64, copy=False),
+            data["values"],
+        )
+
+
+def _read_arrow_edges(path, extension):
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "Reading {} files requires pyarrow, which is not installed".format(
+                extension
+            )
+        )
+
+    if extension == ".parquet":
+        table = pyarrow.parquet.read_table(path)
+    else:
+        table = pyarrow.feather.read_table(path)
+    table = table.unify_dictionaries()
+
+    def dictionary_encoded(column):
+        column = column.combine_chunks()
+        if not pyarrow.types.is_dictionary(column.type):
+            column = column.dictionary_encode()
+        return (
+            [str(id_) for id_ in column.dictionary.to_pylist()],
+            column.indices.to_numpy(zero_copy_only=False).astype(np.int64),
+        )
+
+    paper_ids, paper_indices = dictionary_encoded(table.column(0))
+    reviewer_ids, reviewer_indices = dictionary_encoded(table.column(1))
+    return IndexedEdges(
+        paper_ids,
+        reviewer_ids,
+        paper_indices,
+        reviewer_indices,
+        table.column(2).to_numpy(),
+    )
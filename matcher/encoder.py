@@ -8,6 +8,25 @@ from collections import defaultdict, namedtuple
 import numpy as np
 import json
 import logging
+from .sparse_matrix import DefaultSparseMatrix
+
+
+# Columnar representation of a list of (paper, reviewer, value) edges.
+# Each field is an array-like of equal length. Paper and reviewer indices refer
+# to positions in the `papers` and `reviewers` lists passed to the Encoder, so
+# callers that already know these positions can skip building Python tuples.
+EdgeArrays = namedtuple(
+    "EdgeArrays", ["paper_indices", "reviewer_indices", "values"]
+)
+
+
+# the matrices of an Encoder that solvers use, besides the per-type scores
+ENCODED_MATRICES = (
+    "aggregate_score_matrix",
+    "cost_matrix",
+    "constraint_matrix",
+    "prob_limit_matrix",
+)
 
 
 def _score_to_cost(score, scaling_factor=100):
@@ -19,6 +38,52 @@ def _score_to_cost(score, scaling_factor=100):
     return score * -scaling_factor
 
 
+def _downcast_cost(cost, dtype, cost_scale=1):
+    """
+    Convert a cost array to a lower precision `dtype`.
+
+    The flow-based solvers multiply costs by a `cost_scale` and truncate them
+    to integers, and rounding to a lower precision can carry a scaled cost
+    like -56.99999999999999 across an integer boundary. Such costs are moved
+    back toward the original cost, one step at a time, so they truncate to
+    the same integer as before. If the scaled costs are too large for `dtype`
+    to hold every integer, or a cost can't be moved back, the costs are
+    returned as float64.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    scaled = np.trunc(cost * cost_scale)
+    if np.any(np.abs(scaled) > 2 ** (np.finfo(dtype).nmant + 1)):
+        return cost
+
+    compact = cost.astype(dtype)
+    for _ in range(5):
+        # the lower precision costs are scaled like quantize_costs scales them
+        compact_scaled = np.trunc(compact * cost_scale)
+        crossed = compact_scaled != scaled
+        if not crossed.any():
+            return compact
+        toward = np.where(
+            np.abs(compact_scaled[crossed]) > np.abs(scaled[crossed]),
+            0,
+            np.copysign(np.inf, cost[crossed]),
+        ).astype(dtype)
+        compact[crossed] = np.nextafter(compact[crossed], toward)
+    return cost
+
+
+def _score_values(scores):
+    """
+    Return scores as a list of Python floats. A float32 score is given as the
+    shortest decimal that rounds to it (0.85, not 0.8500000238418579), which
+    agrees with the float64 score it was rounded from to about 7 significant
+    digits.
+    """
+    scores = np.asarray(scores)
+    if scores.dtype == np.float32:
+        return scores.astype(str).astype(float).tolist()
+    return scores.tolist()
+
+
 class EncoderError(Exception):
     """Exception wrapper class for errors related to Encoder"""
 
@@ -39,11 +104,14 @@ class Encoder:
      - `constraints`:
          a list of triples, formatted as follows:
          (<str paper_ID>, <str reviewer_ID>, <int [-1, 0, or 1]>)
+         OR an EdgeArrays of (paper index, reviewer index, constraint)
 
      - `scores_by_type`:
          a dict, keyed on string IDs representing score 'types',
-         where each value is a list of triples, formatted as follows:
+         where each value is a dict with an optional "default" score and
+         "edges", a list of triples, formatted as follows:
          (<str paper_ID>, <str reviewer_ID>, <float score>)
+         OR an EdgeArrays of (paper index, reviewer index, score)
 
     - `weight_by_type`:
          a dict, keyed on string IDs that match those in `scores_by_type`,
@@ -56,6 +124,7 @@ class Encoder:
      - `probability_limits`:
          a list of triples, formatted as follows:
          (<str paper_ID>, <str reviewer_ID>, <float limit>)
+         OR an EdgeArrays of (paper index, reviewer index, limit)
          OR a float, indicating the probability limit for all reviewer-paper pairs
 
      - `perturbation`:
@@ -64,6 +133,38 @@ class Encoder:
      - `bad_match_thresholds`:
          a list of floats, representing the thresholds in affinity score for 
          categorizing a paper-reviewer match, used by the Perturbed Maximization Solver.
+
+     - `sparse`:
+         a bool. If True, the score, aggregate, cost, constraint and probability
+         limit matrices are kept as DefaultSparseMatrix objects, which only store
+         explicitly set cells and report a default value everywhere else.
+
+     - `compact`:
+         a bool. If True, the score, aggregate and cost matrices are stored as
+         float32 and the constraint matrix as int8. Aggregation is still done
+         in float64, and costs are rounded so that the integer costs used by the
+         flow-based solvers at `cost_scale` are unchanged; costs too large for
+         float32 at that scale are kept as float64. The aggregate scores in the
+         decoded assignments and alternates are the float32 scores, written as
+         the shortest decimal that rounds to them, so they can differ from the
+         float64 scores after about 7 significant digits. Probability limits
+         keep full precision, since they are scaled up to integer capacities.
+
+     - `cost_scale`:
+         an int, the largest cost scale the flow-based solvers will multiply
+         compact costs by (see solvers.quantization). Only used if `compact`.
+
+     - `keep_score_matrices`:
+         a bool. If False, the unweighted matrix of each score type is dropped
+         once it has been added to the aggregate, and `score_matrices` is left
+         empty. Dense score types are then encoded and aggregated one at a time.
+
+     - `cache`:
+         an EncoderCache, or None. In dense mode, the aggregate score, cost,
+         constraint and probability limit matrices are loaded from the cache
+         when it holds an entry for the same inputs, and stored in it otherwise.
+         Cached matrices are read-only memory maps, and per-type score matrices
+         are not kept when a cache is used.
     """
 
     def __init__(
@@ -78,9 +179,19 @@ class Encoder:
         attribute_constraints=None,
         perturbation=0.0,
         bad_match_thresholds=[],
+        sparse=False,
+        compact=False,
+        cost_scale=1,
+        keep_score_matrices=True,
+        cache=None,
         logger=logging.getLogger(__name__),
     ):
         self.logger = logger
+        self.sparse = sparse
+        self.compact = compact
+        self.cost_scale = cost_scale
+        self.score_dtype = np.float32 if compact else np.float64
+        self.constraint_dtype = np.int8 if compact else int
 
         if len(reviewers) == 0:
             raise EncoderError("Reviewers List can not be empty.")
@@ -100,26 +211,15 @@ class Encoder:
 
         self.matrix_shape = (len(self.papers), len(self.reviewers))
 
-        self.logger.debug("Init score matrices")
-        self.score_matrices = {
-            score_type: self._encode_scores(scores)
+        # kept for incremental updates (see apply_delta)
+        self.weight_by_type = weight_by_type
+        self.normalization_types = normalization_types
+        self.score_defaults = {
+            score_type: scores.get("default", 0)
             for score_type, scores in scores_by_type.items()
         }
-
-        with_normalization_matrices = {}
-        without_normalization_matrices = {}
-
-        self.logger.debug("Init normalization matricies")
-        for score_type, scores in self.score_matrices.items():
-            if score_type in normalization_types:
-                with_normalization_matrices[score_type] = scores
-            else:
-                without_normalization_matrices[score_type] = scores
-
-        self.logger.debug("Init conflicts")
-        self.constraint_matrix = self._encode_constraints(constraints)
-        self.prob_limit_matrix = self._encode_probability_limits(
-            probability_limits
+        self.default_probability_limit = (
+            probability_limits if isinstance(probability_limits, float) else 1
         )
 
         self.perturbation = perturbation
@@ -151,95 +251,513 @@ class Encoder:
                 })
         self.attribute_constraints = constraints_list
 
-        # don't use numpy.sum() here. it will collapse the matrices into a single value.
-        self.aggregate_score_matrix = np.full(
-            self.matrix_shape, 0, dtype=float
+        cache_key = None
+        if cache is not None and not self.sparse:
+            cache_key = cache.fingerprint(
+                reviewers,
+                papers,
+                constraints,
+                scores_by_type,
+                weight_by_type,
+                normalization_types,
+                probability_limits,
+                compact,
+                cost_scale,
+            )
+            cached_matrices = cache.load(cache_key)
+            if cached_matrices is not None:
+                self.logger.debug("Use cached matrices")
+                self.score_matrices = {}
+                for name, matrix in cached_matrices.items():
+                    setattr(self, name, matrix)
+                return
+
+        self.logger.debug("Init conflicts")
+        self.constraint_matrix = self._encode_constraints(constraints)
+        self.prob_limit_matrix = self._encode_probability_limits(
+            probability_limits
+        )
+
+        self._encode_aggregate_scores(
+            scores_by_type,
+            weight_by_type,
+            normalization_types,
+            keep_score_matrices and cache_key is None,
         )
 
-        if without_normalization_matrices:
-            self.aggregate_score_matrix = sum(
-                [
-                    scores * weight_by_type[score_type]
-                    for score_type, scores in without_normalization_matrices.items()
-                ]
+        if cache_key is not None:
+            cache.store(
+                cache_key,
+                {
+                    "aggregate_score_matrix": self.aggregate_score_matrix,
+                    "cost_matrix": self.cost_matrix,
+                    "constraint_matrix": self.constraint_matrix,
+                    "prob_limit_matrix": self.prob_limit_matrix,
+                },
             )
 
-        if with_normalization_matrices:
-            self.aggregate_score_matrix += self._normalize(
-                weight_by_type, with_normalization_matrices
+    def _encode_aggregate_scores(
+        self,
+        scores_by_type,
+        weight_by_type,
+        normalization_types,
+        keep_score_matrices,
+    ):
+        """set the score, aggregate score and cost matrices."""
+        self.logger.debug("Init score matrices and aggregate scores")
+        self.score_matrices = {}
+        if self.sparse:
+            self.score_matrices = {
+                score_type: self._encode_scores(scores)
+                for score_type, scores in scores_by_type.items()
+            }
+            self.aggregate_score_matrix = self._aggregate_sparse(
+                weight_by_type, normalization_types
+            )
+            if not keep_score_matrices:
+                self.score_matrices = {}
+        else:
+            self.aggregate_score_matrix = self._aggregate(
+                self._iter_score_matrices(scores_by_type, keep_score_matrices),
+                weight_by_type,
+                normalization_types,
+                np.zeros(self.matrix_shape, dtype=float),
             )
 
         self.cost_matrix = _score_to_cost(self.aggregate_score_matrix)
 
-    def _normalize(self, weight_by_type, with_normalization_matrices):
+        if self.compact:
+            self._downcast_scores()
 
-        indicator = {
-            score_type: scores != 0.0
-            for score_type, scores in with_normalization_matrices.items()
+    def _downcast_scores(self):
+        """convert the score, aggregate and cost matrices to `score_dtype`."""
+        self.score_matrices = {
+            score_type: scores.astype(self.score_dtype)
+            for score_type, scores in self.score_matrices.items()
         }
-        sum_of_weights = sum(
-            [
-                indicator * weight_by_type[score_type]
-                for score_type, indicator in indicator.items()
-            ]
+        self.aggregate_score_matrix = self.aggregate_score_matrix.astype(
+            self.score_dtype
         )
-        normalizer = np.where(sum_of_weights == 0, 0, 1 / sum_of_weights)
 
-        return normalizer * sum(
-            [
-                scores * weight_by_type[score_type]
-                for score_type, scores in with_normalization_matrices.items()
-            ]
+        if self.sparse:
+            self.cost_matrix = self.cost_matrix.with_data(
+                _downcast_cost(
+                    self.cost_matrix.data, self.score_dtype, self.cost_scale
+                ),
+                _downcast_cost(
+                    self.cost_matrix.default, self.score_dtype, self.cost_scale
+                )[()],
+            )
+        else:
+            self.cost_matrix = _downcast_cost(
+                self.cost_matrix, self.score_dtype, self.cost_scale
+            )
+
+    def _iter_score_matrices(self, scores_by_type, keep_score_matrices):
+        """
+        yield (score type, score matrix) pairs, encoding one type at a time.
+
+        _aggregate overwrites the matrices it is given, so a kept matrix is
+        stored in `score_matrices` and a copy of it is yielded instead.
+        """
+        for score_type, scores in scores_by_type.items():
+            matrix = self._encode_scores(scores)
+            if keep_score_matrices:
+                self.score_matrices[score_type] = matrix
+                matrix = matrix.copy()
+            yield score_type, matrix
+
+    def _aggregate(
+        self, scores_by_type, weight_by_type, normalization_types, aggregate
+    ):
+        """
+        Add the weighted scores of each type into `aggregate` in place,
+        normalizing those in `normalization_types`, and return it.
+
+        `scores_by_type` yields (score type, scores) pairs, where the scores are
+        dense matrices, aligned arrays of values at the same cells, or 0-d
+        arrays. The scores are weighted in place, so they are overwritten.
+        """
+        normalized = None
+        sum_of_weights = None
+
+        for score_type, scores in scores_by_type:
+            weight = weight_by_type[score_type]
+
+            if score_type in normalization_types:
+                if normalized is None:
+                    normalized = np.zeros_like(aggregate)
+                    sum_of_weights = np.zeros_like(aggregate)
+                np.add(
+                    sum_of_weights,
+                    weight,
+                    out=sum_of_weights,
+                    where=scores != 0.0,
+                )
+                np.multiply(scores, weight, out=scores)
+                normalized += scores
+            else:
+                np.multiply(scores, weight, out=scores)
+                aggregate += scores
+
+        if normalized is not None:
+            # cells where no normalized type has a score keep a normalizer of 0
+            np.divide(
+                1,
+                sum_of_weights,
+                out=sum_of_weights,
+                where=sum_of_weights != 0,
+            )
+            normalized *= sum_of_weights
+            aggregate += normalized
+
+        return aggregate
+
+    def _aggregate_sparse(self, weight_by_type, normalization_types):
+        """
+        Aggregate sparse score matrices without densifying them.
+
+        Cells stored by at least one score type are combined value by value;
+        every other cell holds the defaults of all types, so it is combined once.
+        """
+        keys = np.unique(
+            np.concatenate(
+                [np.empty(0, dtype=np.int64)]
+                + [scores.keys() for scores in self.score_matrices.values()]
+            )
         )
 
+        data = self._aggregate(
+            (
+                (score_type, scores.values_at_keys(keys).astype(float))
+                for score_type, scores in self.score_matrices.items()
+            ),
+            weight_by_type,
+            normalization_types,
+            np.zeros(keys.size, dtype=float),
+        )
+        default = self._aggregate(
+            (
+                (score_type, np.array(scores.default, dtype=float))
+                for score_type, scores in self.score_matrices.items()
+            ),
+            weight_by_type,
+            normalization_types,
+            np.zeros((), dtype=float),
+        )
+
+        return DefaultSparseMatrix.from_keys(
+            self.matrix_shape, keys, data, float(default)
+        )
+
+    def _edge_arrays(self, edges):
+        """
+        Convert `edges` into aligned arrays of paper indices, reviewer indices and values.
+
+        `edges` is either a list of (<paper_ID>, <reviewer_ID>, <value>) triples,
+        whose IDs are translated to indices in one bulk pass, or an EdgeArrays,
+        whose indices are validated against the matrix shape and used as-is.
+        """
+        if isinstance(edges, EdgeArrays):
+            paper_indices = np.asarray(edges.paper_indices, dtype=np.intp)
+            reviewer_indices = np.asarray(
+                edges.reviewer_indices, dtype=np.intp
+            )
+            values = np.asarray(edges.values)
+
+            if not (
+                paper_indices.shape
+                == reviewer_indices.shape
+                == values.shape
+            ):
+                raise EncoderError(
+                    "paper_indices {}, reviewer_indices {} and values {} must be the same shape".format(
+                        paper_indices.shape,
+                        reviewer_indices.shape,
+                        values.shape,
+                    )
+                )
+
+            for indices, size, label in [
+                (paper_indices, self.matrix_shape[0], "paper"),
+                (reviewer_indices, self.matrix_shape[1], "reviewer"),
+            ]:
+                if indices.size and (
+                    indices.min() < 0 or indices.max() >= size
+                ):
+                    raise EncoderError(
+                        "{} indices must be in the range [0, {})".format(
+                            label, size
+                        )
+                    )
+
+            return paper_indices, reviewer_indices, values
+
+        if len(edges) == 0:
+            return (
+                np.empty(0, dtype=np.intp),
+                np.empty(0, dtype=np.intp),
+                np.empty(0),
+            )
+
+        forums, users, values = zip(*edges)
+        paper_indices = np.fromiter(
+            map(self.index_by_forum.__getitem__, forums),
+            dtype=np.intp,
+            count=len(forums),
+        )
+        reviewer_indices = np.fromiter(
+            map(self.index_by_user.__getitem__, users),
+            dtype=np.intp,
+            count=len(users),
+        )
+
+        return paper_indices, reviewer_indices, values
+
+    def _encode_matrix(self, edges, default, dtype):
+        """
+        return a matrix filled with `default` and the values of `edges`,
+        as a DefaultSparseMatrix in sparse mode or a numpy array otherwise.
+        """
+        paper_indices, reviewer_indices, values = self._edge_arrays(edges)
+
+        if self.sparse:
+            return DefaultSparseMatrix.from_edges(
+                self.matrix_shape,
+                paper_indices,
+                reviewer_indices,
+                values,
+                default=default,
+                dtype=dtype,
+            )
+
+        matrix = np.full(self.matrix_shape, default, dtype=dtype)
+        matrix[paper_indices, reviewer_indices] = np.asarray(
+            values, dtype=dtype
+        )
+        return matrix
+
     def _encode_scores(self, scores):
         """return a matrix containing unweighted scores."""
         default = scores.get("default", 0)
         edges = scores.get("edges", [])
-        score_matrix = np.full(self.matrix_shape, default, dtype=float)
 
-        for forum, user, score in edges:
-            coordinates = (
-                self.index_by_forum[forum],
-                self.index_by_user[user],
-            )
-            score_matrix[coordinates] = score
-
-        return score_matrix
+        return self._encode_matrix(edges, default, float)
 
     def _encode_constraints(self, constraints):
         """
         return a matrix containing constraint values. label should have no bearing on the outcome.
         """
-        constraint_matrix = np.full(self.matrix_shape, 0, dtype=int)
-        for forum, user, constraint in constraints:
-            coordinates = (
-                self.index_by_forum[forum],
-                self.index_by_user[user],
-            )
-            constraint_matrix[coordinates] = constraint
-
-        return constraint_matrix
+        return self._encode_matrix(constraints, 0, self.constraint_dtype)
 
     def _encode_probability_limits(self, probability_limits):
         """
         return a matrix containing probability limits
         """
         if isinstance(probability_limits, float):
-            prob_limit_matrix = np.full(
-                self.matrix_shape, probability_limits, dtype=float
+            return self._encode_matrix([], probability_limits, float)
+
+        # list of tuples or EdgeArrays, default to no limit
+        return self._encode_matrix(probability_limits, 1, float)
+
+    def apply_delta(
+        self,
+        removed_papers=[],
+        removed_reviewers=[],
+        added_papers=[],
+        added_reviewers=[],
+        scores_by_type=None,
+        constraints=[],
+        probability_limits=[],
+    ):
+        """
+        Update the encoding in place, instead of re-encoding all inputs.
+
+        Papers and reviewers are removed first, then added with default
+        scores, no constraints and the default probability limit. After that,
+        the edges in `scores_by_type` (a dict of score type -> edges),
+        `constraints` and `probability_limits` are written over the current
+        values. Edges are given in the same formats as to the constructor.
+
+        Only the aggregate scores and costs of changed cells are recomputed.
+        Changes to papers, reviewers or scores need the per-type score
+        matrices, so the Encoder must have been built with
+        `keep_score_matrices=True`. Sparse encodings can't be updated.
+        """
+        if self.sparse:
+            raise EncoderError("Sparse encodings can't be updated in place.")
+
+        if (added_papers or added_reviewers or scores_by_type) and (
+            self.score_matrices.keys() != self.score_defaults.keys()
+        ):
+            raise EncoderError(
+                "Adding papers, reviewers or scores requires the score "
+                "matrices. Use keep_score_matrices=True."
+            )
+
+        if len(removed_papers):
+            self._remove_papers(removed_papers)
+        if len(removed_reviewers):
+            self._remove_reviewers(removed_reviewers)
+        if len(added_papers):
+            self._add_papers(added_papers)
+        if len(added_reviewers):
+            self._add_reviewers(added_reviewers)
+
+        for score_type, edges in (scores_by_type or {}).items():
+            if score_type not in self.score_matrices:
+                raise EncoderError(
+                    "Unknown score type {}".format(score_type)
+                )
+            paper_indices, reviewer_indices, values = self._edge_arrays(edges)
+            self.score_matrices[score_type][
+                paper_indices, reviewer_indices
+            ] = values
+            self._update_aggregate((paper_indices, reviewer_indices))
+
+        for name, edges in [
+            ("constraint_matrix", constraints),
+            ("prob_limit_matrix", probability_limits),
+        ]:
+            paper_indices, reviewer_indices, values = self._edge_arrays(edges)
+            if len(values):
+                matrix = self._writable(name)
+                matrix[paper_indices, reviewer_indices] = values
+
+    def _writable(self, name):
+        """return the named matrix, copied first if it is read-only (cached)"""
+        matrix = getattr(self, name)
+        if not matrix.flags.writeable:
+            matrix = np.array(matrix)
+            setattr(self, name, matrix)
+        return matrix
+
+    def _update_aggregate(self, index):
+        """recompute the aggregate scores and costs at `index`"""
+        scores_by_type = (
+            (score_type, np.array(scores[index], dtype=float))
+            for score_type, scores in self.score_matrices.items()
+        )
+        aggregate = self._aggregate(
+            scores_by_type,
+            self.weight_by_type,
+            self.normalization_types,
+            np.zeros(np.shape(self.aggregate_score_matrix[index])),
+        )
+        cost = _score_to_cost(aggregate)
+        if self.compact:
+            cost = _downcast_cost(cost, self.score_dtype, self.cost_scale)
+            if cost.dtype != self.cost_matrix.dtype:
+                self.cost_matrix = self.cost_matrix.astype(cost.dtype)
+
+        self._writable("aggregate_score_matrix")[index] = aggregate
+        self._writable("cost_matrix")[index] = cost
+
+    def _delete(self, indices, axis):
+        """remove rows (axis 0) or columns (axis 1) from every matrix"""
+        self.score_matrices = {
+            score_type: np.delete(scores, indices, axis=axis)
+            for score_type, scores in self.score_matrices.items()
+        }
+        for name in ENCODED_MATRICES:
+            setattr(self, name, np.delete(getattr(self, name), indices, axis))
+
+    def _append(self, count, axis):
+        """
+        add `count` rows (axis 0) or columns (axis 1) of default values to
+        every matrix, and recompute the aggregate scores and costs there.
+        """
+        shape = list(self.matrix_shape)
+        shape[axis] = count
+        defaults = {
+            "aggregate_score_matrix": 0,
+            "cost_matrix": 0,
+            "constraint_matrix": 0,
+            "prob_limit_matrix": self.default_probability_limit,
+        }
+
+        def append(matrix, default):
+            return np.concatenate(
+                [matrix, np.full(shape, default, dtype=matrix.dtype)],
+                axis=axis,
             )
-        else:  # list of tuples
-            prob_limit_matrix = np.full(
-                self.matrix_shape, 1, dtype=float
-            )  # default to no limit
-            for forum, user, limit in probability_limits:
-                coordinates = (
-                    self.index_by_forum[forum],
-                    self.index_by_user[user],
+
+        self.score_matrices = {
+            score_type: append(scores, self.score_defaults[score_type])
+            for score_type, scores in self.score_matrices.items()
+        }
+        for name in ENCODED_MATRICES:
+            setattr(self, name, append(getattr(self, name), defaults[name]))
+
+        index = [slice(None), slice(None)]
+        index[axis] = slice(self.matrix_shape[axis], None)
+        self.matrix_shape = self.aggregate_score_matrix.shape
+        self._update_aggregate(tuple(index))
+
+    def _remove_papers(self, papers):
+        indices = [self.index_by_forum[paper] for paper in papers]
+        self._delete(indices, axis=0)
+
+        removed = set(papers)
+        self.papers = [paper for paper in self.papers if paper not in removed]
+        self.index_by_forum = {n: i for i, n in enumerate(self.papers)}
+        self.matrix_shape = (len(self.papers), len(self.reviewers))
+
+    def _remove_reviewers(self, reviewers):
+        indices = [self.index_by_user[reviewer] for reviewer in reviewers]
+        self._delete(indices, axis=1)
+
+        former_user_by_index = self.user_by_index
+        removed = set(reviewers)
+        self.reviewers = [
+            reviewer for reviewer in self.reviewers if reviewer not in removed
+        ]
+        self.index_by_user = {r: i for i, r in enumerate(self.reviewers)}
+        self.user_by_index = {v: k for k, v in self.index_by_user.items()}
+        self.matrix_shape = (len(self.papers), len(self.reviewers))
+
+        # attribute constraints refer to reviewers by index
+        for constraint in self.attribute_constraints or []:
+            constraint["members"] = [
+                self.index_by_user[former_user_by_index[member]]
+                for member in constraint["members"]
+                if former_user_by_index[member] not in removed
+            ]
+
+    def _add_papers(self, papers):
+        for paper in papers:
+            if paper in self.index_by_forum:
+                raise EncoderError("Paper {} is already encoded".format(paper))
+
+        self.papers = list(self.papers) + list(papers)
+        self.index_by_forum = {n: i for i, n in enumerate(self.papers)}
+        self._append(len(papers), axis=0)
+
+    def _add_reviewers(self, reviewers):
+        for reviewer in reviewers:
+            if reviewer in self.index_by_user:
+                raise EncoderError(
+                    "Reviewer {} is already encoded".format(reviewer)
                 )
-                prob_limit_matrix[coordinates] = limit
-        return prob_limit_matrix
+
+        self.reviewers = list(self.reviewers) + list(reviewers)
+        self.index_by_user = {r: i for i, r in enumerate(self.reviewers)}
+        self.user_by_index = {v: k for k, v in self.index_by_user.items()}
+        self._append(len(reviewers), axis=1)
+
+    def _aggregate_scores_at(self, paper_indices, reviewer_indices):
+        """return the aggregate scores at (paper, reviewer) coordinates"""
+        if self.sparse:
+            return self.aggregate_score_matrix.values_at(
+                paper_indices, reviewer_indices
+            )
+        return self.aggregate_score_matrix[paper_indices, reviewer_indices]
+
+    def _aggregate_score_rows(self, start, stop):
+        """return rows `start` to `stop` of the aggregate scores, densely"""
+        if self.sparse:
+            return self.aggregate_score_matrix.dense_rows(start, stop)
+        return np.asarray(self.aggregate_score_matrix[start:stop])
 
     def decode_assignments(self, flow_matrix):
         """
@@ -248,20 +766,21 @@ class Encoder:
         """
         assignments_by_forum = defaultdict(list)
 
-        for paper_index, paper_flows in enumerate(flow_matrix):
-            paper_id = self.papers[paper_index]
-            for reviewer_index, flow in enumerate(paper_flows):
-                reviewer = self.reviewers[reviewer_index]
-
-                if flow:
-                    coordinates = (paper_index, reviewer_index)
-                    paper_user_entry = {
-                        "aggregate_score": self.aggregate_score_matrix[
-                            coordinates
-                        ],
-                        "user": reviewer,
-                    }
-                    assignments_by_forum[paper_id].append(paper_user_entry)
+        paper_indices, reviewer_indices = np.nonzero(np.asarray(flow_matrix))
+        scores = self._aggregate_scores_at(paper_indices, reviewer_indices)
+
+        for paper_index, reviewer_index, score in zip(
+            paper_indices.tolist(),
+            reviewer_indices.tolist(),
+            _score_values(scores),
+        ):
+            paper_user_entry = {
+                "aggregate_score": score,
+                "user": self.reviewers[reviewer_index],
+            }
+            assignments_by_forum[self.papers[paper_index]].append(
+                paper_user_entry
+            )
 
         return dict(assignments_by_forum)
 
@@ -270,31 +789,53 @@ class Encoder:
         Return a dictionary, keyed on forum IDs, with lists containing dicts
         representing alternate suggested users.
 
+        The alternates of a paper are its `num_alternates` unassigned reviewers
+        with the highest aggregate scores, ties going to the lower reviewer
+        index. Papers are processed in blocks of rows, and each block keeps
+        only its top-k candidates (via numpy.argpartition) before sorting.
         """
-        alternates_by_forum = {}
-
-        for paper_index, paper_flows in enumerate(flow_matrix):
-            paper_id = self.papers[paper_index]
-            unassigned = []
-            for reviewer_index, flow in enumerate(paper_flows):
-                reviewer = self.reviewers[reviewer_index]
-
-                # alternates must not be assigned
-                if not flow:
-                    coordinates = (paper_index, reviewer_index)
-                    paper_user_entry = {
-                        "aggregate_score": self.aggregate_score_matrix[
-                            coordinates
-                        ],
-                        "user": reviewer,
-                    }
-                    unassigned.append(paper_user_entry)
-
-            unassigned.sort(
-                key=lambda entry: entry["aggregate_score"], reverse=True
+        flow_matrix = np.asarray(flow_matrix)
+        num_papers, num_reviewers = self.matrix_shape
+        k = min(max(num_alternates, 0), num_reviewers)
+        alternates_by_forum = {paper_id: [] for paper_id in self.papers}
+        if k == 0:
+            return alternates_by_forum
+
+        block_size = max(1, 2**22 // num_reviewers)
+        for start in range(0, num_papers, block_size):
+            stop = min(start + block_size, num_papers)
+            unassigned = flow_matrix[start:stop] == 0
+            scores = self._aggregate_score_rows(start, stop)
+            masked_scores = np.where(unassigned, scores, -np.inf)
+
+            # the k-th highest unassigned score of each paper. all higher
+            # scores are kept, and ties at the threshold are filled in
+            # reviewer order to match a stable sort.
+            top_k = np.argpartition(-masked_scores, k - 1, axis=1)[:, :k]
+            threshold = np.take_along_axis(masked_scores, top_k, axis=1).min(
+                axis=1, keepdims=True
             )
-
-            alternates_by_forum[paper_id] = unassigned[:num_alternates]
+            above = unassigned & (masked_scores > threshold)
+            tied = unassigned & (masked_scores == threshold)
+            open_slots = k - above.sum(axis=1, keepdims=True)
+            selected = above | (tied & (np.cumsum(tied, axis=1) <= open_slots))
+
+            rows, reviewer_indices = np.nonzero(selected)
+            selected_scores = scores[rows, reviewer_indices]
+            order = np.lexsort((reviewer_indices, -selected_scores, rows))
+
+            for row, reviewer_index, score in zip(
+                rows[order].tolist(),
+                reviewer_indices[order].tolist(),
+                _score_values(selected_scores[order]),
+            ):
+                paper_user_entry = {
+                    "aggregate_score": score,
+                    "user": self.reviewers[reviewer_index],
+                }
+                alternates_by_forum[self.papers[start + row]].append(
+                    paper_user_entry
+                )
 
         return alternates_by_forum
 
@@ -312,9 +853,11 @@ class Encoder:
             for reviewer_index in reviewer_indices:
                 reviewer_id = self.reviewers[reviewer_index]
                 entry = {
-                    "aggregate_score": self.aggregate_score_matrix[
-                        (paper_index, reviewer_index)
-                    ],
+                    "aggregate_score": _score_values(
+                        self.aggregate_score_matrix[
+                            (paper_index, reviewer_index)
+                        ]
+                    ),
                     "user": reviewer_id,
                 }
                 reviewer_list.append(entry)
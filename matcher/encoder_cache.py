@@ -0,0 +1,156 @@
+"""
+An on-disk cache of encoded matrices, keyed by a fingerprint of the Encoder inputs.
+
+Rerunning a match with the same reviewers, papers, scores, weights and
+constraints (e.g. with another solver or other load bounds) produces the same
+aggregate score, cost, constraint and probability limit matrices. The cache
+stores them as .npy files, and reopens them as read-only memory maps on a hit,
+so encoding is skipped and the pages are shared between worker processes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+from .encoder import EdgeArrays, ENCODED_MATRICES
+
+# bump when the encoding changes, so that stale entries are never reused
+CACHE_FORMAT_VERSION = 1
+
+CACHED_MATRICES = ENCODED_MATRICES
+
+
+class EncoderCache:
+    """
+    Stores encoded matrices under `directory`, one subdirectory per fingerprint.
+    """
+
+    def __init__(self, directory, logger=logging.getLogger(__name__)):
+        self.directory = directory
+        self.logger = logger
+
+    def fingerprint(
+        self,
+        reviewers,
+        papers,
+        constraints,
+        scores_by_type,
+        weight_by_type,
+        normalization_types,
+        probability_limits,
+        compact=False,
+        cost_scale=1,
+    ):
+        """return a hex digest identifying the matrices encoded from these inputs"""
+        digest = hashlib.sha256()
+        options = {
+            "version": CACHE_FORMAT_VERSION,
+            "compact": bool(compact),
+            # compact costs are rounded for the cost scale
+            "cost_scale": int(cost_scale) if compact else 1,
+            "score_types": [
+                [str(score_type), float(weight_by_type[score_type])]
+                for score_type in scores_by_type
+            ],
+            "normalization_types": sorted(map(str, normalization_types)),
+        }
+        _update_with_bytes(digest, json.dumps(options).encode())
+        _update_with_ids(digest, reviewers)
+        _update_with_ids(digest, papers)
+
+        for scores in scores_by_type.values():
+            _update_with_bytes(
+                digest, repr(float(scores.get("default", 0))).encode()
+            )
+            _update_with_edges(digest, scores.get("edges", []), float)
+
+        _update_with_edges(digest, constraints, int)
+        if isinstance(probability_limits, float):
+            _update_with_bytes(digest, repr(probability_limits).encode())
+        else:
+            _update_with_edges(digest, probability_limits, float)
+
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """
+        return a dict of read-only memory-mapped matrices stored under `key`,
+        or None if there is no such entry.
+        """
+        path = self._path(key)
+        if not os.path.isdir(path):
+            self.logger.debug("Encoder cache miss for {}".format(key))
+            return None
+
+        self.logger.debug("Encoder cache hit for {}".format(key))
+        return {
+            name: np.load(
+                os.path.join(path, name + ".npy"), mmap_mode="r"
+            )
+            for name in CACHED_MATRICES
+        }
+
+    def store(self, key, matrices):
+        """
+        Save the dense `matrices` (keyed on the names in CACHED_MATRICES) under `key`.
+
+        The files are written to a temporary directory that is then renamed,
+        so concurrent readers never see a partially written entry.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = tempfile.mkdtemp(dir=self.directory)
+        try:
+            for name in CACHED_MATRICES:
+                np.save(
+                    os.path.join(temporary_path, name + ".npy"),
+                    np.asarray(matrices[name]),
+                )
+            os.rename(temporary_path, self._path(key))
+            self.logger.debug("Stored encoded matrices for {}".format(key))
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            if not os.path.isdir(self._path(key)):
+                raise
+
+
+def _update_with_bytes(digest, data):
+    """update `digest` with length-prefixed `data`, so fields can't run together"""
+    digest.update(len(data).to_bytes(8, "little"))
+    digest.update(data)
+
+
+def _update_with_ids(digest, ids):
+    _update_with_bytes(digest, "\0".join(map(str, ids)).encode())
+
+
+def _update_with_array(digest, values, dtype):
+    values = np.ascontiguousarray(values, dtype=dtype)
+    _update_with_bytes(digest, values.dtype.str.encode())
+    _update_with_bytes(digest, values.tobytes())
+
+
+def _update_with_edges(digest, edges, dtype):
+    """update `digest` with a list of (paper, reviewer, value) triples or an EdgeArrays"""
+    if isinstance(edges, EdgeArrays):
+        _update_with_bytes(digest, b"indices")
+        _update_with_array(digest, edges.paper_indices, np.int64)
+        _update_with_array(digest, edges.reviewer_indices, np.int64)
+        _update_with_array(digest, edges.values, dtype)
+        return
+
+    _update_with_bytes(digest, b"ids")
+    if len(edges) == 0:
+        _update_with_bytes(digest, b"")
+        return
+
+    forums, users, values = zip(*edges)
+    _update_with_ids(digest, forums)
+    _update_with_ids(digest, users)
+    _update_with_array(digest, values, dtype)
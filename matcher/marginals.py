@@ -0,0 +1,309 @@
+"""
+Empirical verification of the marginals of the randomized solvers.
+
+RandomizedSolver and PerturbedMaximizationSolver find a fractional assignment
+whose entries are the probabilities of the paper-reviewer pairs, and sample
+deterministic assignments from it. This module draws many samples in one
+batch (see sample_assignments), estimates the empirical marginals, and checks
+them against the fractional assignment and the probability limits. It also
+reports the sampling throughput and memory.
+
+Every pair of a sample is a Bernoulli draw with the fractional assignment as
+mean, so by Hoeffding's inequality and a union bound over the fractional
+entries, all empirical marginals are within
+
+    sqrt(log(2 * entries / (1 - confidence)) / (2 * samples))
+
+of the fractional assignment with probability `confidence`. Entries that are
+0 or 1 have to match exactly.
+
+Run as a script to verify the solvers on synthetic venues:
+
+    python -m matcher.marginals --solvers Randomized PerturbedMaximization \\
+        --papers 10 --reviewers 15 --samples 1000
+
+PerturbedMaximizationSolver uses Gurobi, whose size-limited license only
+solves venues with a few hundred paper-reviewer pairs.
+"""
+
+import argparse
+import logging
+import math
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+from .encoder import _score_to_cost
+from .solvers import RandomizedSolver, PerturbedMaximizationSolver
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+RANDOMIZED_SOLVERS = {
+    "Randomized": RandomizedSolver,
+    "PerturbedMaximization": PerturbedMaximizationSolver,
+}
+
+# the sampler rounds the fractional assignment to integers
+ROUNDING_TOLERANCE = 1e-5
+
+SyntheticEncoder = namedtuple(
+    "SyntheticEncoder",
+    [
+        "cost_matrix",
+        "constraint_matrix",
+        "prob_limit_matrix",
+        "perturbation",
+        "bad_match_thresholds",
+    ],
+)
+
+MarginalReport = namedtuple(
+    "MarginalReport",
+    [
+        "num_samples",
+        "bound",
+        "max_deviation",
+        "deviations",
+        "limit_violations",
+        "samples_per_second",
+        "sample_bytes",
+        "peak_memory_mb",
+    ],
+)
+
+
+def synthetic_venue(
+    num_papers,
+    num_reviewers,
+    demand=3,
+    max_load=None,
+    prob_limit=0.5,
+    perturbation=0.5,
+    conflict_rate=0.01,
+    seed=0,
+):
+    """
+    return the minimums, maximums, demands and encoder of a random venue, in
+    which every paper needs `demand` reviewers, and no pair has a higher
+    probability than `prob_limit`.
+    """
+    rng = np.random.default_rng(seed)
+    if max_load is None:
+        max_load = math.ceil(2 * num_papers * demand / num_reviewers)
+    scores = np.round(rng.random((num_papers, num_reviewers)), 2)
+    constraint_matrix = np.where(
+        rng.random((num_papers, num_reviewers)) < conflict_rate, -1, 0
+    )
+    encoder = SyntheticEncoder(
+        cost_matrix=_score_to_cost(scores),
+        constraint_matrix=constraint_matrix,
+        prob_limit_matrix=np.full((num_papers, num_reviewers), prob_limit),
+        perturbation=perturbation,
+        bad_match_thresholds=[],
+    )
+    return (
+        [0] * num_reviewers,
+        [max_load] * num_reviewers,
+        [demand] * num_papers,
+        encoder,
+    )
+
+
+def empirical_marginals(pairs, num_papers, num_reviewers):
+    """
+    return the fraction of the samples (samples x pairs x 2, see
+    sample_assignments) that assign each paper-reviewer pair
+    """
+    num_samples = len(pairs)
+    pairs = pairs.reshape(-1, 2)
+    pairs = pairs[pairs[:, 0] >= 0]  # padding
+    counts = np.bincount(
+        pairs[:, 0] * num_reviewers + pairs[:, 1],
+        minlength=num_papers * num_reviewers,
+    )
+    return counts.reshape(num_papers, num_reviewers) / max(num_samples, 1)
+
+
+def hoeffding_bound(num_entries, num_samples, confidence):
+    """
+    return the deviation that no empirical marginal of `num_entries`
+    fractional entries exceeds, with probability `confidence`
+    """
+    if num_entries == 0:
+        return 0.0
+    return math.sqrt(
+        math.log(2 * num_entries / (1 - confidence)) / (2 * num_samples)
+    )
+
+
+def verify_marginals(
+    solver, num_samples, seeds=None, threads=None, confidence=0.999
+):
+    """
+    Draw `num_samples` samples from a solved randomized solver, and compare
+    their empirical marginals with its fractional assignment and probability
+    limits.
+
+    return a MarginalReport; `deviations` and `limit_violations` count the
+    entries that are further than `bound` from the fractional assignment or
+    above the probability limits.
+    """
+    start_time = time.time()
+    pairs = solver.sample_assignments(
+        num_samples, seeds=seeds, threads=threads
+    )
+    samples_per_second = num_samples / max(time.time() - start_time, 1e-9)
+
+    num_papers, num_reviewers = solver.num_paps, solver.num_revs
+    marginals = empirical_marginals(pairs, num_papers, num_reviewers)
+    fractional = np.asarray(solver.fractional_assignment_matrix)
+
+    deterministic = (fractional <= ROUNDING_TOLERANCE) | (
+        fractional >= 1 - ROUNDING_TOLERANCE
+    )
+    bound = hoeffding_bound(
+        np.count_nonzero(~deterministic), num_samples, confidence
+    )
+    allowed = np.where(deterministic, 0, bound) + ROUNDING_TOLERANCE
+    deviation = np.abs(marginals - fractional)
+    limits = np.asarray(solver.prob_limit_matrix)
+
+    return MarginalReport(
+        num_samples=num_samples,
+        bound=bound,
+        max_deviation=float(deviation.max(initial=0)),
+        deviations=int(np.count_nonzero(deviation > allowed)),
+        limit_violations=int(np.count_nonzero(marginals > limits + allowed)),
+        samples_per_second=samples_per_second,
+        sample_bytes=pairs.nbytes,
+        peak_memory_mb=_peak_memory_mb(),
+    )
+
+
+def _peak_memory_mb():
+    """return the peak resident memory of the process in MB, if known"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    if sys.platform == "darwin":
+        return max_rss / 2**20
+    return max_rss / 2**10
+
+
+def benchmark(
+    solver_class,
+    num_papers,
+    num_reviewers,
+    num_samples,
+    seed=0,
+    threads=None,
+    confidence=0.999,
+    logger=logging.getLogger(__name__),
+    **venue_options
+):
+    """
+    Solve a synthetic venue (see synthetic_venue) with one of the
+    RANDOMIZED_SOLVERS, and verify the marginals of `num_samples` samples.
+
+    return the MarginalReport, or None if the venue has no solution
+    """
+    minimums, maximums, demands, encoder = synthetic_venue(
+        num_papers, num_reviewers, seed=seed, **venue_options
+    )
+    solver = RANDOMIZED_SOLVERS[solver_class](
+        minimums, maximums, demands, encoder, logger=logger
+    )
+    solver.solve()
+    if not solver.solved:
+        return None
+    seeds = np.random.default_rng(seed).integers(0, 2**63, size=num_samples)
+    return verify_marginals(
+        solver,
+        num_samples,
+        seeds=seeds.tolist(),
+        threads=threads,
+        confidence=confidence,
+    )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m matcher.marginals",
+        description="Verify the marginals of the randomized solvers on "
+        "synthetic venues, and report the sampling throughput",
+    )
+    parser.add_argument(
+        "--solvers",
+        nargs="+",
+        choices=list(RANDOMIZED_SOLVERS),
+        default=list(RANDOMIZED_SOLVERS),
+    )
+    parser.add_argument("--papers", default=10, type=int)
+    parser.add_argument("--reviewers", default=15, type=int)
+    parser.add_argument("--demand", default=3, type=int)
+    parser.add_argument("--max_load", type=int)
+    parser.add_argument("--prob_limit", default=0.5, type=float)
+    parser.add_argument("--perturbation", default=0.5, type=float)
+    parser.add_argument("--samples", default=1000, type=int)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Threads that draw the samples (default: one per CPU)",
+    )
+    parser.add_argument("--confidence", default=0.999, type=float)
+    parser.add_argument("--seed", default=0, type=int)
+    args = parser.parse_args(args)
+
+    failed = False
+    for solver_class in args.solvers:
+        try:
+            report = benchmark(
+                solver_class,
+                args.papers,
+                args.reviewers,
+                args.samples,
+                seed=args.seed,
+                threads=args.threads,
+                confidence=args.confidence,
+                demand=args.demand,
+                max_load=args.max_load,
+                prob_limit=args.prob_limit,
+                perturbation=args.perturbation,
+            )
+        except Exception as error_handle:
+            print("{}: error: {}".format(solver_class, error_handle))
+            failed = True
+            continue
+        if report is None:
+            print("{}: no solution".format(solver_class))
+            failed = True
+            continue
+        passed = report.deviations == 0 and report.limit_violations == 0
+        failed = failed or not passed
+        print(
+            "{}: {} samples, {:.1f} samples/s, max deviation {:.4f} "
+            "(bound {:.4f}), {} deviations, {} limit violations, "
+            "samples {:.1f} MB, peak memory {} MB: {}".format(
+                solver_class,
+                report.num_samples,
+                report.samples_per_second,
+                report.max_deviation,
+                report.bound,
+                report.deviations,
+                report.limit_violations,
+                report.sample_bytes / 2**20,
+                "{:.0f}".format(report.peak_memory_mb)
+                if report.peak_memory_mb is not None
+                else "unknown",
+                "passed" if passed else "FAILED",
+            )
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
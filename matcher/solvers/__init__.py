@@ -7,4 +7,6 @@ from .randomized_solver import RandomizedSolver
 from .fairflow import FairFlow
 from .fairsequence import FairSequence
 from .fairir import FairIR
-from .perturbed_maximization_solver import PerturbedMaximizationSolver
\ No newline at end of file
+from .perturbed_maximization_solver import PerturbedMaximizationSolver
+from .auction_solver import AuctionSolver
+from .components import DecomposedSolver
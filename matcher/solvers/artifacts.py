@@ -0,0 +1,149 @@
+"""
+Precomputed inputs that several solvers derive from the same Encoder.
+
+Solvers look for a SolverArtifacts in the `artifacts` attribute of their
+encoder (see MatcherSession), and compute the inputs themselves if there is
+none. Every artifact is computed on first use, and then shared by all the
+solvers that run on the encoder, also from several threads. Artifacts must
+not be modified.
+"""
+
+import threading
+import numpy as np
+from ..sparse_matrix import DefaultSparseMatrix
+
+
+def get_artifacts(encoder):
+    """return the SolverArtifacts of `encoder`, or None"""
+    return getattr(encoder, "artifacts", None)
+
+
+def bad_affinity_reviewers(cost_matrix, constraint_matrix):
+    """return the indices of reviewers with no non-zero, unconstrained cost"""
+    if (
+        isinstance(cost_matrix, DefaultSparseMatrix)
+        and cost_matrix.default == 0
+    ):
+        # only stored cells can have a non-zero cost
+        paper_indices, reviewer_indices, costs = cost_matrix.coo()
+        if isinstance(constraint_matrix, DefaultSparseMatrix):
+            constraints = constraint_matrix.values_at(
+                paper_indices, reviewer_indices
+            )
+        else:
+            constraints = constraint_matrix[paper_indices, reviewer_indices]
+        known = (costs != 0) & (constraints == 0)
+        has_affinity = np.zeros(cost_matrix.shape[1], dtype=bool)
+        has_affinity[reviewer_indices[known]] = True
+        return np.where(~has_affinity)[0]
+
+    cost_matrix = np.asarray(cost_matrix)
+    constraint_matrix = np.asarray(constraint_matrix)
+    return np.where(
+        np.all(
+            (cost_matrix * (constraint_matrix == 0)) == 0,
+            axis=0,
+        )
+    )[0]
+
+
+class SolverArtifacts:
+    """Lazily computed, shared solver inputs of an Encoder."""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self._lock = threading.RLock()
+        self._artifacts = {}
+
+    def _get(self, name, compute):
+        with self._lock:
+            if name not in self._artifacts:
+                self._artifacts[name] = compute()
+            return self._artifacts[name]
+
+    @property
+    def cost_matrix(self):
+        """the dense cost matrix (papers x reviewers)"""
+        return self._get(
+            "cost_matrix", lambda: np.asarray(self.encoder.cost_matrix)
+        )
+
+    @property
+    def constraint_matrix(self):
+        """the dense constraint matrix (papers x reviewers)"""
+        return self._get(
+            "constraint_matrix",
+            lambda: np.asarray(self.encoder.constraint_matrix),
+        )
+
+    @property
+    def has_scores(self):
+        """
+        whether any pair has a non-zero score; if not, the solvers replace
+        the scores with random ones
+        """
+        return self._get(
+            "has_scores", lambda: bool(self.encoder.cost_matrix.any())
+        )
+
+    @property
+    def affinity_matrix(self):
+        """the dense aggregate score matrix (papers x reviewers)"""
+        return self._get(
+            "affinity_matrix",
+            lambda: np.asarray(self.encoder.aggregate_score_matrix),
+        )
+
+    @property
+    def transposed_affinity_matrix(self):
+        """
+        the aggregate scores as a float64 matrix of reviewers x papers, as
+        FairSequence uses it
+        """
+        return self._get(
+            "transposed_affinity_matrix",
+            lambda: np.ascontiguousarray(
+                self.affinity_matrix.T, dtype=np.float64
+            ),
+        )
+
+    @property
+    def transposed_constraint_matrix(self):
+        """the constraint matrix of reviewers x papers"""
+        return self._get(
+            "transposed_constraint_matrix",
+            lambda: np.ascontiguousarray(self.constraint_matrix.T),
+        )
+
+    @property
+    def best_revs(self):
+        """
+        for each paper (column), the reviewers in order of decreasing
+        affinity, or None if the scores are all zero
+        """
+        return self._get(
+            "best_revs",
+            lambda: (
+                np.argsort(-1 * self.transposed_affinity_matrix, axis=0)
+                if self.has_scores
+                else None
+            ),
+        )
+
+    @property
+    def bad_affinity_reviewers(self):
+        """
+        the indices of the reviewers with no non-zero, unconstrained score.
+        With all-zero (so random) scores, these are the reviewers who are
+        constrained with every paper.
+        """
+
+        def compute():
+            if self.has_scores:
+                return bad_affinity_reviewers(
+                    self.encoder.cost_matrix, self.encoder.constraint_matrix
+                )
+            unconstrained = self.constraint_matrix == 0
+            return np.flatnonzero(~np.any(unconstrained, axis=0))
+
+        return self._get("bad_affinity_reviewers", compute)
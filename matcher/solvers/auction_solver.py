@@ -0,0 +1,456 @@
+"""
+A paper-reviewer assignment solver based on the epsilon-scaling auction algorithm
+(Bertsekas, "The auction algorithm for assignment and other network flow problems").
+
+It has the same objective and the same two phases as MinMaxSolver: first every
+reviewer is assigned its minimum load, then the remaining paper demands are
+assigned within the reviewers' maximum loads. In each phase, the entities that
+must be fully assigned (reviewers in the first phase, papers in the second)
+bid for the others, which accept the highest bids up to their capacity.
+
+Bids of all unassigned bidders are computed together with NumPy (Jacobi
+bidding). A bidder with u open slots bids on its u best objects at once, by
+how much they beat its (u+1)-th best object, plus epsilon. The final epsilon is
+below 1 / (number of slots + 1); since the integer costs are the same as
+SimpleSolver's, the assignment of each phase is then optimal. Epsilon scaling
+(starting from a large epsilon, and reusing the prices of each scaling phase
+in the next one) is only applied when the capacity of the objects matches the
+demand of the bidders exactly, the only case where it keeps the result optimal.
+
+The auction is dense: the benefits, bids and assignment are papers x reviewers
+arrays, and a sparse Encoder's matrices are converted to dense ones. It needs
+several dense arrays of 8 bytes per pair (about 10 GB for 10,000 papers and
+20,000 reviewers). For larger venues, use MinMaxSolver, which builds its graph
+from the stored pairs of a sparse Encoder.
+
+Arguments are the same as MinMaxSolver, plus:
+
+    "epsilon_factor":
+        the factor by which epsilon is reduced after each scaling phase.
+
+    "epsilon":
+        the final epsilon. By default it is small enough for the result to be
+        optimal; with a larger epsilon the auction ends sooner, and the cost
+        of each phase is at most (number of slots) * epsilon above optimal.
+
+    "parallelism":
+        the number of threads that compute the bids of the bidders, each for
+        a batch of them. NumPy releases the GIL while it computes, so the
+        batches are bid on at the same time; the bids are then resolved for
+        each object together.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .core import SolverException
+from .minmax_solver import MinMaxSolver
+from .artifacts import get_artifacts
+
+
+class AuctionSolver:
+    """Implements a min/max assignment solver with the auction algorithm."""
+
+    def __init__(
+        self,
+        minimums,
+        maximums,
+        demands,
+        encoder,
+        allow_zero_score_assignments=False,
+        logger=logging.getLogger(__name__),
+        epsilon_factor=4,
+        epsilon=None,
+        parallelism=1,
+    ):
+        self.minimums = np.array(minimums, dtype=np.int64)
+        self.maximums = np.array(maximums, dtype=np.int64)
+        self.demands = np.array(demands, dtype=np.int64)
+        self.encoder = encoder
+        self.allow_zero_score_assignments = allow_zero_score_assignments
+        self.logger = logger
+        self.epsilon_factor = epsilon_factor
+        self.epsilon = epsilon
+        self.parallelism = parallelism
+
+        artifacts = get_artifacts(encoder)
+        if artifacts is not None:
+            self.cost_matrix = artifacts.cost_matrix
+            self.constraint_matrix = artifacts.constraint_matrix
+        else:
+            self.cost_matrix = np.asarray(encoder.cost_matrix)
+            self.constraint_matrix = np.asarray(encoder.constraint_matrix)
+        self.num_papers, self.num_reviewers = self.cost_matrix.shape
+
+        self.benefit_matrix = self._benefit_matrix()
+
+        if not self.allow_zero_score_assignments:
+            # Find reviewers with no known cost edges (non-zero) after constraints are applied and remove their load_lb
+            if artifacts is not None:
+                bad_affinity_reviewers = artifacts.bad_affinity_reviewers
+            elif not self.cost_matrix.any():
+                # without any scores, as with MinMaxSolver's random costs,
+                # only the reviewers constrained with every paper
+                bad_affinity_reviewers = np.flatnonzero(
+                    np.all(self.constraint_matrix != 0, axis=0)
+                )
+            else:
+                bad_affinity_reviewers = np.where(
+                    np.all(
+                        (self.cost_matrix * (self.constraint_matrix == 0))
+                        == 0,
+                        axis=0,
+                    )
+                )[0]
+            self.logger.debug(
+                "Setting minimum load for {} reviewers to 0 because "
+                "they do not have known affinity with any paper".format(
+                    len(bad_affinity_reviewers)
+                )
+            )
+            self.minimums[bad_affinity_reviewers] = 0
+
+        self.solved = False
+        self.flow_matrix = None
+        self.optimal_cost = None
+        self.cost = None
+
+    def _benefit_matrix(self):
+        """
+        Negated integer costs of the pairs SimpleSolver would connect with an
+        edge, and -inf for all other pairs.
+        """
+        costs = self.cost_matrix.astype(np.int64)
+        unconstrained = self.constraint_matrix == 0
+        if not self.allow_zero_score_assignments:
+            unconstrained &= costs != 0
+        forced = self.constraint_matrix == 1
+        if forced.any():
+            costs[forced] = int(self.cost_matrix.min() - 1)
+
+        return np.where(unconstrained | forced, -costs.astype(float), -np.inf)
+
+    def _validate_input_range(self):
+        """Validate if demand is in the range of min supply and max supply"""
+        self.logger.debug("Checking if demand is in range")
+
+        min_supply = np.sum(self.minimums)
+        max_supply = np.sum(self.maximums)
+        demand = np.sum(self.demands)
+
+        if demand > max_supply or demand < min_supply:
+            raise SolverException(
+                "Review demand ({}) must be between the min review supply is ({}) and max review supply is ({}).".format(
+                    demand, min_supply, max_supply
+                ) + " Try (1) decreasing min papers (2) increasing max papers or (3) finding more reviewers"
+            )
+
+    def solve(self):
+        """Computes the assignment in two auctions"""
+        self._validate_input_range()
+
+        start_time = time.time()
+        # reviewers bid for papers to fill their minimum loads
+        minimum_result = auction(
+            self.benefit_matrix.T,
+            self.minimums,
+            self.demands,
+            epsilon_factor=self.epsilon_factor,
+            epsilon=self.epsilon,
+            parallelism=self.parallelism,
+            logger=self.logger,
+        )
+        if minimum_result is None:
+            self.logger.debug("Minimum load auction has no solution")
+            self.solved = False
+            return self.flow_matrix
+        minimum_result = minimum_result.T
+
+        # papers bid for reviewers to fill their remaining demands
+        residual_benefit_matrix = np.where(
+            minimum_result, -np.inf, self.benefit_matrix
+        )
+        maximum_result = auction(
+            residual_benefit_matrix,
+            self.demands - np.sum(minimum_result, axis=1),
+            self.maximums - np.sum(minimum_result, axis=0),
+            epsilon_factor=self.epsilon_factor,
+            epsilon=self.epsilon,
+            parallelism=self.parallelism,
+            logger=self.logger,
+        )
+        self.logger.debug(
+            "Auctions took {} seconds".format(time.time() - start_time)
+        )
+        if maximum_result is None:
+            self.logger.debug("Maximum load auction has no solution")
+            self.solved = False
+            return self.flow_matrix
+
+        self.flow_matrix = (minimum_result | maximum_result).astype(float)
+        self.solved = True
+        self.optimal_cost = int(
+            -np.sum(self.benefit_matrix[self.flow_matrix == 1])
+        )
+        self.cost = np.sum(self.flow_matrix * self.cost_matrix)
+        return self.flow_matrix
+
+    def optimality_gap(self):
+        """
+        Solve the same problem with MinMaxSolver, and return the relative
+        difference between the integer costs of the two solutions (0 if the
+        auction found an optimal solution).
+        """
+        if not self.solved:
+            raise SolverException("The auction has not found a solution")
+
+        minmax_solver = MinMaxSolver(
+            self.minimums.copy(),
+            self.maximums,
+            self.demands,
+            self.encoder,
+            allow_zero_score_assignments=self.allow_zero_score_assignments,
+            logger=self.logger,
+        )
+        minmax_solver.solve()
+        if not minmax_solver.solved:
+            raise SolverException("MinMaxSolver did not find a solution")
+
+        gap = (self.optimal_cost - minmax_solver.optimal_cost) / max(
+            abs(minmax_solver.optimal_cost), 1
+        )
+        self.logger.debug(
+            "Auction cost {}, MinMax cost {}, optimality gap {}".format(
+                self.optimal_cost, minmax_solver.optimal_cost, gap
+            )
+        )
+        return gap
+
+
+def auction(
+    benefit_matrix,
+    demands,
+    capacities,
+    epsilon_factor=4,
+    epsilon=None,
+    parallelism=1,
+    logger=None,
+):
+    """
+    Assign each row i of `benefit_matrix` to `demands[i]` distinct columns,
+    with column j assigned to at most `capacities[j]` rows, maximizing the
+    total benefit. Pairs with a benefit of -inf are never assigned.
+
+    The total benefit is optimal unless a final `epsilon` of at least
+    1 / (sum of demands) is given, in which case it is at most
+    (sum of demands) * epsilon below optimal. Bids are computed by
+    `parallelism` threads.
+
+    return a boolean matrix of the assignment, or None if there is none.
+    """
+    logger = logger or logging.getLogger(__name__)
+    demands = np.maximum(np.asarray(demands, dtype=np.int64), 0)
+    capacities = np.maximum(np.asarray(capacities, dtype=np.int64), 0)
+    num_rows, num_columns = benefit_matrix.shape
+    num_slots = int(np.sum(demands))
+
+    if num_slots == 0:
+        return np.zeros((num_rows, num_columns), dtype=bool)
+
+    benefit_matrix = np.where(capacities > 0, benefit_matrix, -np.inf)
+    finite = benefit_matrix[np.isfinite(benefit_matrix)]
+    if len(finite) == 0:
+        return None
+    benefit_range = max(float(finite.max() - finite.min()), 1.0)
+    # prices beyond this bound mean that rows compete for too few columns
+    max_price = (num_slots + 1) * (benefit_range + 1)
+    prices = np.zeros(num_columns)
+
+    final_epsilon = epsilon or 1.0 / (num_slots + 1)
+
+    executor = ThreadPoolExecutor(parallelism) if parallelism > 1 else None
+
+    def run_round(epsilon):
+        assigned = _auction_round(
+            benefit_matrix,
+            demands,
+            capacities,
+            prices,
+            epsilon,
+            benefit_range,
+            max_price,
+            executor,
+            parallelism,
+        )
+        logger.debug("Auction round with epsilon {} finished".format(epsilon))
+        return assigned
+
+    try:
+        if np.sum(capacities) > num_slots:
+            # Not every column is full in the end, and a column that isn't
+            # must have no price for the assignment to be optimal. Prices
+            # from an earlier scaling phase could break that, so run the
+            # final phase from zero prices: a column's price only rises once
+            # it is full.
+            return run_round(final_epsilon)
+
+        epsilon = benefit_range / epsilon_factor
+        while epsilon > final_epsilon:
+            if run_round(epsilon) is None:
+                return None
+            epsilon /= epsilon_factor
+        return run_round(final_epsilon)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _auction_round(
+    benefit_matrix,
+    demands,
+    capacities,
+    prices,
+    epsilon,
+    benefit_range,
+    max_price,
+    executor=None,
+    parallelism=1,
+):
+    """
+    Run the auction from an empty assignment until every row is fully
+    assigned. `prices` are the starting prices of the columns, and are
+    updated in place: a column keeps its starting price until it is full,
+    and then costs the lowest bid it accepted. If an `executor` is given,
+    the rows bid in `parallelism` batches, in the executor's threads.
+
+    return the assignment, or None if there is no complete assignment.
+    """
+    num_rows, num_columns = benefit_matrix.shape
+    reserve_prices = prices.copy()
+    assigned = np.zeros((num_rows, num_columns), dtype=bool)
+    bids = np.zeros((num_rows, num_columns))
+    open_slots = demands.copy()
+
+    def bid(batch_rows):
+        return _bids(
+            benefit_matrix,
+            prices,
+            assigned,
+            batch_rows,
+            open_slots[batch_rows],
+            epsilon,
+            benefit_range,
+        )
+
+    while open_slots.any():
+        rows = np.nonzero(open_slots)[0]
+        if executor is not None and len(rows) >= parallelism:
+            batch_bids = list(
+                executor.map(bid, np.array_split(rows, parallelism))
+            )
+        else:
+            batch_bids = [bid(rows)]
+        if any(batch is None for batch in batch_bids):
+            # a row has fewer allowed columns than open slots
+            return None
+        bid_rows, bid_columns, bid_values = (
+            np.concatenate(arrays) for arrays in zip(*batch_bids)
+        )
+
+        # each column keeps its highest bids, among new and held ones
+        columns = np.unique(bid_columns)
+        held_rows, held_column_positions = np.nonzero(assigned[:, columns])
+        held_columns = columns[held_column_positions]
+        candidate_rows = np.concatenate([held_rows, bid_rows])
+        candidate_columns = np.concatenate([held_columns, bid_columns])
+        candidate_bids = np.concatenate(
+            [bids[held_rows, held_columns], bid_values]
+        )
+
+        order = np.lexsort((-candidate_bids, candidate_columns))
+        candidate_rows = candidate_rows[order]
+        candidate_columns = candidate_columns[order]
+        candidate_bids = candidate_bids[order]
+        ranks = np.arange(len(order)) - np.searchsorted(
+            candidate_columns, candidate_columns
+        )
+        accepted = ranks < capacities[candidate_columns]
+
+        assigned[held_rows, held_columns] = False
+        assigned[candidate_rows[accepted], candidate_columns[accepted]] = True
+        bids[candidate_rows[accepted], candidate_columns[accepted]] = (
+            candidate_bids[accepted]
+        )
+        open_slots += np.bincount(held_rows, minlength=num_rows)
+        open_slots -= np.bincount(
+            candidate_rows[accepted], minlength=num_rows
+        )
+
+        # a full column costs its lowest accepted bid
+        full = (
+            np.bincount(candidate_columns[accepted], minlength=num_columns)[
+                columns
+            ]
+            >= capacities[columns]
+        )
+        lowest_bids = np.full(num_columns, np.inf)
+        np.minimum.at(
+            lowest_bids,
+            candidate_columns[accepted],
+            candidate_bids[accepted],
+        )
+        prices[columns] = np.where(
+            full, lowest_bids[columns], reserve_prices[columns]
+        )
+        if (prices[columns] - reserve_prices[columns]).max() > max_price:
+            return None
+
+    return assigned
+
+
+def _bids(benefit_matrix, prices, assigned, rows, slots, epsilon, benefit_range):
+    """
+    Bids of the given rows, which have `slots` open slots each, on their best
+    columns they are not assigned to.
+
+    return the rows, columns and values of the bids, or None if a row has
+    fewer allowed columns than open slots.
+    """
+    num_columns = benefit_matrix.shape[1]
+    values = benefit_matrix[rows] - prices
+    values[assigned[rows]] = -np.inf
+
+    # the best `slots + 1` columns of each row, best first
+    width = min(int(slots.max()) + 1, num_columns)
+    best_columns = np.argpartition(-values, width - 1, axis=1)[:, :width]
+    best_values = np.take_along_axis(values, best_columns, axis=1)
+    order = np.argsort(-best_values, axis=1, kind="stable")
+    best_columns = np.take_along_axis(best_columns, order, axis=1)
+    best_values = np.take_along_axis(best_values, order, axis=1)
+
+    bidding = np.arange(width) < slots[:, np.newaxis]
+    if np.isneginf(best_values[bidding]).any() or (slots > width).any():
+        return None
+
+    # the value of the best column a row doesn't bid on; if there is
+    # none, bid as if it were worth a benefit range less than the last
+    row_indices = np.arange(len(rows))
+    next_values = np.full(len(rows), -np.inf)
+    has_next = slots < width
+    next_values[has_next] = best_values[row_indices[has_next], slots[has_next]]
+    last_values = best_values[row_indices, np.minimum(slots, width) - 1]
+    next_values = np.where(
+        np.isfinite(next_values),
+        next_values,
+        last_values - benefit_range,
+    )
+
+    bid_rows = np.broadcast_to(rows[:, np.newaxis], bidding.shape)[bidding]
+    bid_columns = best_columns[bidding]
+    bid_values = (
+        benefit_matrix[bid_rows, bid_columns]
+        - np.broadcast_to(next_values[:, np.newaxis], bidding.shape)[bidding]
+        + epsilon
+    )
+    return bid_rows, bid_columns, bid_values
@@ -1,6 +1,229 @@
 """
 A C extension that implements a sampling algorithm based on the Birkhoff-von Neumann
 theorem, used in randomized_solver.
+
+The sampler keeps no global state and CFFI releases the GIL while it runs, so
+several threads can sample at the same time. A sample is determined by its
+seed; without one, a seed is drawn from NumPy's global random state.
+sample_bvn_batch draws many samples of one fractional assignment in a pool of
+threads inside the extension.
 """
 
-from _bvn_extension.lib import run_bvn
+import os
+import numpy as np
+from _bvn_extension import ffi
+from _bvn_extension.lib import run_bvn, run_bvn_sparse, run_bvn_batch
+
+
+def _seed(seed):
+    """return the seed to pass to the C code"""
+    if seed is None:
+        return int(np.random.randint(0, 2**63, dtype=np.int64))
+    seed = int(seed)
+    if not 0 <= seed < 2**64:
+        raise ValueError("seed must be an integer in [0, 2**64)")
+    return seed
+
+
+def _entries(paper_indices, reviewer_indices, flows, num_paps, num_revs):
+    """
+    Check the nonzero entries of a fractional assignment before they are
+    passed to the C code, which does not check them: the paper and reviewer
+    indices must be in range and name each pair at most once, and the flows
+    must be non-negative integers, one per entry.
+
+    return the indices and flows as contiguous np.intc arrays
+    """
+    paper_indices = np.asarray(paper_indices)
+    reviewer_indices = np.asarray(reviewer_indices)
+    flows = np.asarray(flows)
+    for array in [paper_indices, reviewer_indices, flows]:
+        if array.ndim != 1 or not (
+            array.size == 0 or np.issubdtype(array.dtype, np.integer)
+        ):
+            raise ValueError(
+                "the index and flow arrays must be 1-d arrays of integers"
+            )
+    if not paper_indices.shape == reviewer_indices.shape == flows.shape:
+        raise ValueError("the index and flow arrays must have the same size")
+    if np.any((paper_indices < 0) | (paper_indices >= num_paps)):
+        raise ValueError("paper indices must be in [0, num_paps)")
+    if np.any((reviewer_indices < 0) | (reviewer_indices >= num_revs)):
+        raise ValueError("reviewer indices must be in [0, num_revs)")
+    if np.any((flows < 0) | (flows > np.iinfo(np.intc).max)):
+        raise ValueError("flows must be non-negative C ints")
+    keys = paper_indices.astype(np.int64) * num_revs + reviewer_indices
+    if len(np.unique(keys)) != len(keys):
+        raise ValueError("each paper-reviewer pair must be given once")
+
+    return (
+        np.ascontiguousarray(paper_indices, dtype=np.intc),
+        np.ascontiguousarray(reviewer_indices, dtype=np.intc),
+        np.ascontiguousarray(flows, dtype=np.intc),
+    )
+
+
+def _subsets(subsets, num_revs):
+    """return the subset ID of each reviewer as a contiguous np.intc array"""
+    if subsets is None:
+        return np.ones(num_revs, dtype=np.intc)
+    subsets = np.ascontiguousarray(subsets, dtype=np.intc)
+    if subsets.shape != (num_revs,):
+        raise ValueError("subsets must have one entry per reviewer")
+    return subsets
+
+
+def sample_bvn(flows, one, subsets=None, seed=None):
+    """
+    Sample a deterministic assignment from a fractional assignment, in place.
+
+    `flows` is a writeable, C-contiguous np.intc matrix (papers x reviewers)
+    of the fractional assignment scaled by `one`. The C code reads and
+    overwrites its buffer, so that it holds the sampled 0/1 assignment.
+    `subsets` optionally gives a strictly positive subset ID per reviewer
+    (see run_bvn in bvn.c); by default all reviewers are in one subset.
+    `seed` seeds the random number generator of the sampler.
+
+    return `flows`
+    """
+    if (
+        not isinstance(flows, np.ndarray)
+        or flows.dtype != np.intc
+        or flows.ndim != 2
+        or not flows.flags.c_contiguous
+        or not flows.flags.writeable
+    ):
+        raise ValueError(
+            "flows must be a writeable, C-contiguous 2-d array of np.intc"
+        )
+    num_paps, num_revs = flows.shape
+    subsets = _subsets(subsets, num_revs)
+
+    status = run_bvn(
+        ffi.from_buffer("int[]", flows, require_writable=True),
+        ffi.from_buffer("int[]", subsets),
+        num_paps,
+        num_revs,
+        one,
+        _seed(seed),
+    )
+    if status < 0:
+        raise MemoryError("The BVN sampler could not allocate its state")
+    return flows
+
+
+def sample_bvn_sparse(
+    paper_indices,
+    reviewer_indices,
+    flows,
+    num_paps,
+    num_revs,
+    one,
+    subsets=None,
+    seed=None,
+):
+    """
+    Sample a deterministic assignment from a fractional assignment given by
+    its nonzero entries: the paper and reviewer indices of each entry, and
+    its flow scaled by `one`. Memory use scales with the number of entries.
+    `subsets` and `seed` are as in sample_bvn. Raises ValueError if an index
+    is out of range, a pair is given twice, or a flow is not an integer.
+
+    return the paper and reviewer indices of the assigned pairs
+    """
+    paper_indices, reviewer_indices, flows = _entries(
+        paper_indices, reviewer_indices, flows, num_paps, num_revs
+    )
+    num_edges = len(flows)
+    subsets = _subsets(subsets, num_revs)
+
+    assigned_papers = np.empty(num_edges, dtype=np.intc)
+    assigned_reviewers = np.empty(num_edges, dtype=np.intc)
+    num_assigned = run_bvn_sparse(
+        ffi.from_buffer("int[]", paper_indices),
+        ffi.from_buffer("int[]", reviewer_indices),
+        ffi.from_buffer("int[]", flows),
+        num_edges,
+        ffi.from_buffer("int[]", subsets),
+        num_paps,
+        num_revs,
+        one,
+        _seed(seed),
+        ffi.from_buffer("int[]", assigned_papers, require_writable=True),
+        ffi.from_buffer("int[]", assigned_reviewers, require_writable=True),
+    )
+    if num_assigned < 0:
+        raise MemoryError("The BVN sampler could not allocate its state")
+    return assigned_papers[:num_assigned], assigned_reviewers[:num_assigned]
+
+
+def sample_bvn_batch(
+    paper_indices,
+    reviewer_indices,
+    flows,
+    num_paps,
+    num_revs,
+    one,
+    num_samples,
+    seeds=None,
+    subsets=None,
+    threads=None,
+):
+    """
+    Draw `num_samples` independent samples from a fractional assignment,
+    given as in sample_bvn_sparse. The flow graph is built once, and copies
+    of it are sampled by `threads` threads (by default, one per CPU).
+    `seeds` gives the seed of each sample; by default, they are drawn from
+    NumPy's global random state.
+
+    return an array (samples x pairs x 2) of the paper and reviewer indices
+    of the assigned pairs of each sample, and the number of pairs of each
+    sample. Samples with fewer pairs than others are padded with -1.
+    Invalid entries raise ValueError, as in sample_bvn_sparse.
+    """
+    paper_indices, reviewer_indices, flows = _entries(
+        paper_indices, reviewer_indices, flows, num_paps, num_revs
+    )
+    num_edges = len(flows)
+    subsets = _subsets(subsets, num_revs)
+    if seeds is None:
+        seeds = [_seed(None) for _ in range(num_samples)]
+    elif len(seeds) != num_samples:
+        raise ValueError("seeds must have one entry per sample")
+    seeds = np.array([_seed(seed) for seed in seeds], dtype=np.uint64)
+    if threads is None:
+        threads = os.cpu_count() or 1
+
+    # a sample assigns each paper at most its load, rounded up
+    paper_loads = np.bincount(
+        paper_indices, weights=flows, minlength=num_paps
+    ).astype(np.int64)
+    cap = int(np.sum(-(-paper_loads // one)))
+
+    assigned_papers = np.full(num_samples * cap, -1, dtype=np.intc)
+    assigned_reviewers = np.full(num_samples * cap, -1, dtype=np.intc)
+    counts = np.zeros(num_samples, dtype=np.intc)
+    status = run_bvn_batch(
+        ffi.from_buffer("int[]", paper_indices),
+        ffi.from_buffer("int[]", reviewer_indices),
+        ffi.from_buffer("int[]", flows),
+        num_edges,
+        ffi.from_buffer("int[]", subsets),
+        num_paps,
+        num_revs,
+        one,
+        ffi.from_buffer("unsigned long long[]", seeds),
+        num_samples,
+        threads,
+        cap,
+        ffi.from_buffer("int[]", assigned_papers, require_writable=True),
+        ffi.from_buffer("int[]", assigned_reviewers, require_writable=True),
+        ffi.from_buffer("int[]", counts, require_writable=True),
+    )
+    if status == -1:
+        raise MemoryError("The BVN sampler could not allocate its state")
+    if status < 0:
+        raise ValueError("A sample assigned more pairs than the paper loads")
+
+    pairs = np.stack([assigned_papers, assigned_reviewers], axis=-1)
+    return pairs.reshape(num_samples, cap, 2), counts
@@ -10,62 +10,96 @@
  * push flow. This continues until all edges are integral, representing
  * a deterministic assignment which is returned. The algorithm is further
  * detailed in Jecmen et al 2020.
+ *
+ * All the state of a sampling run, including its random number generator,
+ * lives in a bvn_state, so that the entry points are reentrant: several
+ * threads can sample at the same time (CFFI releases the GIL during the
+ * calls), and a run is reproducible from its seed. run_bvn_batch builds the
+ * flow graph once, and samples copies of it in a pool of threads.
  */
 
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
-#include <time.h>
+#include <stdint.h>
+#include <pthread.h>
 #include <math.h>
 #include <assert.h>
 
 #define debug 0
 
-int one;
+/* STATE */
+
+typedef struct
+{
+    int one; // scale of flows
 
-/* STATE VARIABLES */
+    // flow tracking
+    int *f, *c, *ci; // f: current flow on an edge, c: total load of a vertex (positive for reviewers, negative for papers), ci: total load of a paper-instution pair
+    int fw, bw; // (fw, bw): maximum amount of flow that can be added in the forward / backward direction on current path / cycle
+    int m; // m: number of remaining (fractional) edges
 
-// flow tracking
-int *f, *c, *ci; // f: current flow on an edge, c: total load of a vertex (positive for reviewers, negative for papers), ci: total load of a paper-instution pair
-int fw, bw; // (fw, bw): maximum amount of flow that can be added in the forward / backward direction on current path / cycle
-int m; // m: number of remaining (fractional) edges
+    // (simulated) linked lists of adjacent edges
+    int *h, *u, *v, *l, *se; // h: heads, (u, v): starting and ending points of an edge, l: pointer to next edge, se: whether edge has been visited
+    int tot; // tot: total number of edges ever added
+    int *s, *ri; // s: whether vertex has been visited, ri: instituion a reviewer belongs to
 
-// (simulated) linked lists of adjacent edges
-int *h, *u, *v, *l, *se; // h: heads, (u, v): starting and ending points of an edge, l: pointer to next edge, se: whether edge has been visited
-int tot; // tot: total number of edges ever added
-int *s, *ri; // s: whether vertex has been visited, ri: instituion a reviewer belongs to
+    // (simulated) linked lists of adjacent institutions
+    int *hi, *vi, *li, *si; // hi: heads, vi: name / number of insitution, li: pointer to next institution, si: whether an institution has been visited at this paper
+    int ti; // ti: total number of paper-institution pairs ever added
 
-// (simulated) linked lists of adjacent institutions
-int *hi, *vi, *li, *si; // hi: heads, vi: name / number of insitution, li: pointer to next institution, si: whether an institution has been visited at this paper
-int ti; // ti: total number of paper-institution pairs ever added
+    // stack for tracking path / cycle to clear
+    int *st; // st: stack of pointers
+    int top, btm; // top: top, btm: where path / cycle starts
 
-// stack for tracking path / cycle to clear
-int *st; // st: stack of pointers
-int top, btm; // top: top, btm: where path / cycle starts
+    // random number generator (xoshiro256**)
+    uint64_t rng[4];
+
+    int vsize, esize; // sizes of the vertex and edge arrays
+} bvn_state;
+
+// the samples of a batch that one thread draws
+typedef struct
+{
+    const bvn_state* graph; // the flow graph to sample from
+    int n, nrevs;
+    const unsigned long long* seeds;
+    int first, step, nsamples; // samples first, first + step, ... below nsamples
+    int cap; // space for assigned pairs per sample
+    int *out_paps, *out_revs, *out_counts;
+    int status;
+} bvn_job;
 
 
 /* FUNCTION PROTOTYPES */
 
-int go(int x, int y, int p);
+int go(bvn_state* b, int x, int y, int p);
+void add_flow(bvn_state* b, int x, int y, int z);
+void sample_flows(bvn_state* b, int n);
+void* run_job(void* arg);
+
+void ae(bvn_state* b, int x, int y, int z);
+int fi(bvn_state* b, int p, int i);
+void ai(bvn_state* b, int p, int i, int w);
+void re(bvn_state* b, int x);
+int tr(bvn_state* b, int x, int i);
+void cnr(bvn_state* b, int x);
+void upd(bvn_state* b, int x, int y);
 
-void ae(int x, int y, int z);
-int fi(int p, int i);
-void ai(int p, int i, int w);
-void re(int x);
-int tr(int x, int i);
-void cnr(int x);
-void upd(int x, int y);
+void seed_rng(bvn_state* b, uint64_t seed);
+double next_double(bvn_state* b);
 
 int idx_to_rev(int i, int npaps, int nrevs);
 int idx_to_pap(int i, int npaps, int nrevs);
 int pap_rev_to_idx(int p, int r, int npaps, int nrevs);
 int min(int a, int b);
-int fl(int x);
-int ce(int x);
-int in(int x);
-void initialize_state(int vsize, int esize);
+int fl(bvn_state* b, int x);
+int ce(bvn_state* b, int x);
+int in(bvn_state* b, int x);
+int initialize_state(bvn_state* b, int vsize, int esize, int one_, uint64_t seed);
+int copy_state(bvn_state* b, const bvn_state* graph, uint64_t seed);
 int* alloc_int(int size);
-void free_buffers(void);
+void free_buffers(bvn_state* b);
 
 
 /* ALGORITHM LOGIC FUNCTIONS */
@@ -83,256 +117,443 @@ void free_buffers(void);
  * - npaps: Number of papers.
  * - nrevs: Number of reviewers.
  * - one_: Scale of flows.
+ * - seed: Seed of the random number generator.
+ * Returns 0, or -1 if memory could not be allocated.
  */
-int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_)
+int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_, unsigned long long seed)
 {
-    srand(clock()); // set random seed to current clock time
-    rand(); // throw away first random number
-
+    bvn_state state;
+    bvn_state* b = &state;
     int n = npaps + nrevs;
-	one = one_;
 
-	// allocate space for n vertices, and 2*p*r maximum edges
-	initialize_state(n + 1, (2 * npaps * nrevs) + 1);
+    int nedges = 0; // only nonzero flows become edges
+    for(int i = 0; i < npaps*nrevs; i++)
+        if(flows[i] != 0) nedges++;
+
+    // allocate space for n vertices, and an edge and co-edge per nonzero flow
+    if(initialize_state(b, n + 1, (2 * nedges) + 2, one_, seed)) return -1;
 
-    for(int i = 1; i <= nrevs; i++) ri[i] = subsets[i-1];
+    for(int i = 1; i <= nrevs; i++) b->ri[i] = subsets[i-1];
 
     for(int i = 0; i < npaps*nrevs; i++)
     {
-		int x = idx_to_rev(i, npaps, nrevs);
-		int y = idx_to_pap(i, npaps, nrevs);
-		int z = flows[i];//round(flows[i] * one);
+        if(flows[i] != 0)
+            add_flow(b, idx_to_rev(i, npaps, nrevs), idx_to_pap(i, npaps, nrevs), flows[i]);
+    }
+
+    sample_flows(b, n);
+
+    // set all flows to 0 for output
+    for(int i = 0; i < npaps * nrevs; i++)
+    {
+        flows[i] = 0;
+    }
 
-        c[x] += z; // update load counters at vertices
-        c[y] -= z;
-        if(z != 0) // if flow is nonzero, add edge
+    for(int i = 2; i <= b->tot; i++)
+    {
+        if(b->u[i] < b->v[i] && b->f[i] == b->one) // output all edges whose final flow is one -- these constitute the integral matching
         {
-            ae(x, y, z);
-            ae(y, x, one - z);
+            int idx = pap_rev_to_idx(b->v[i], b->u[i], npaps, nrevs);
+            flows[idx] = 1;
+        }
+    }
+
+    free_buffers(b);
+    return 0;
+}
+
+/*
+ * The sparse counterpart of run_bvn, whose memory use scales with the number
+ * of nonzero flows rather than with npaps * nrevs.
+ * Arguments:
+ * - paps, revs, flows: Arrays of size nedges with the (0-based) paper and
+ *   reviewer of each nonzero entry of the fractional assignment, and its flow
+ *   scaled up by one_. Each paper-reviewer pair appears at most once.
+ * - nedges: Number of nonzero entries.
+ * - subsets, npaps, nrevs, one_, seed: As in run_bvn.
+ * - out_paps, out_revs: Arrays of size nedges, which receive the paper and
+ *   reviewer of each pair in the sampled assignment.
+ * Returns the number of pairs in the sampled assignment, or -1 if memory
+ * could not be allocated.
+ */
+int run_bvn_sparse(int* paps, int* revs, int* flows, int nedges, int* subsets, int npaps, int nrevs, int one_, unsigned long long seed, int* out_paps, int* out_revs)
+{
+    bvn_state state;
+    bvn_state* b = &state;
+    int n = npaps + nrevs;
 
-            ai(y, ri[x], z); // and update flow counter for paper-institution pair
+    // allocate space for n vertices, and an edge and co-edge per nonzero flow
+    if(initialize_state(b, n + 1, (2 * nedges) + 2, one_, seed)) return -1;
 
-            cnr(tot); // remove edge if flow is already integral
+    for(int i = 1; i <= nrevs; i++) b->ri[i] = subsets[i-1];
+
+    for(int i = 0; i < nedges; i++)
+    {
+        if(flows[i] != 0)
+            add_flow(b, revs[i] + 1, paps[i] + nrevs + 1, flows[i]);
+    }
+
+    sample_flows(b, n);
+
+    int assigned = 0;
+    for(int i = 2; i <= b->tot; i++)
+    {
+        if(b->u[i] < b->v[i] && b->f[i] == b->one) // output all edges whose final flow is one -- these constitute the integral matching
+        {
+            out_paps[assigned] = b->v[i] - nrevs - 1;
+            out_revs[assigned] = b->u[i] - 1;
+            assigned++;
         }
+    }
+
+    free_buffers(b);
+    return assigned;
+}
 
+/*
+ * Draws nsamples independent samples from one fractional assignment, given as
+ * in run_bvn_sparse. The flow graph is built once, and the samples are drawn
+ * from copies of it by nthreads threads.
+ * Arguments:
+ * - paps, revs, flows, nedges, subsets, npaps, nrevs, one_: As in run_bvn_sparse.
+ * - seeds: An array of size nsamples with the seed of each sample.
+ * - nsamples: Number of samples.
+ * - nthreads: Number of threads.
+ * - cap: Space for the assigned pairs of each sample.
+ * - out_paps, out_revs: Arrays of size nsamples * cap, which receive the paper
+ *   and reviewer of each pair in sample k from index k * cap on.
+ * - out_counts: An array of size nsamples, which receives the number of pairs
+ *   in each sample.
+ * Returns 0, -1 if memory could not be allocated, or -2 if a sample has more
+ * than cap pairs.
+ */
+int run_bvn_batch(int* paps, int* revs, int* flows, int nedges, int* subsets, int npaps, int nrevs, int one_, unsigned long long* seeds, int nsamples, int nthreads, int cap, int* out_paps, int* out_revs, int* out_counts)
+{
+    bvn_state graph;
+    bvn_state* b = &graph;
+    int n = npaps + nrevs;
+    int status = 0;
+
+    if(nsamples <= 0) return 0;
+    if(nthreads < 1) nthreads = 1;
+    if(nthreads > nsamples) nthreads = nsamples;
+
+    // build the flow graph once
+    if(initialize_state(b, n + 1, (2 * nedges) + 2, one_, 0)) return -1;
+
+    for(int i = 1; i <= nrevs; i++) b->ri[i] = subsets[i-1];
+
+    for(int i = 0; i < nedges; i++)
+    {
+        if(flows[i] != 0)
+            add_flow(b, revs[i] + 1, paps[i] + nrevs + 1, flows[i]);
     }
 
-    while(m) // while there are still fractional edges left
+    bvn_job* jobs = (bvn_job*) calloc(nthreads, sizeof(bvn_job));
+    pthread_t* threads = (pthread_t*) calloc(nthreads, sizeof(pthread_t));
+    int* started = alloc_int(nthreads);
+    if(!(jobs && threads && started))
     {
-        if(debug) printf("%d\n", m);
-        memset(s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
+        free(jobs);
+        free(threads);
+        free(started);
+        free_buffers(b);
+        return -1;
+    }
+
+    for(int t = 0; t < nthreads; t++)
+    {
+        jobs[t].graph = b;
+        jobs[t].n = n;
+        jobs[t].nrevs = nrevs;
+        jobs[t].seeds = seeds;
+        jobs[t].first = t;
+        jobs[t].step = nthreads;
+        jobs[t].nsamples = nsamples;
+        jobs[t].cap = cap;
+        jobs[t].out_paps = out_paps;
+        jobs[t].out_revs = out_revs;
+        jobs[t].out_counts = out_counts;
+        jobs[t].status = 0;
+        // the calling thread takes the first job, and any job a thread cannot be started for
+        if(t > 0) started[t] = !pthread_create(&threads[t], NULL, run_job, &jobs[t]);
+    }
+    run_job(&jobs[0]);
+    for(int t = 1; t < nthreads; t++)
+    {
+        if(started[t])
+            pthread_join(threads[t], NULL);
+        else
+            run_job(&jobs[t]);
+    }
+
+    for(int t = 0; t < nthreads; t++)
+        if(jobs[t].status < status) status = jobs[t].status;
+
+    free(jobs);
+    free(threads);
+    free(started);
+    free_buffers(b);
+    return status;
+}
+
+// draw the samples of a bvn_job
+void* run_job(void* arg)
+{
+    bvn_job* job = (bvn_job*) arg;
+    for(int k = job->first; k < job->nsamples; k += job->step)
+    {
+        bvn_state state;
+        bvn_state* b = &state;
+        if(copy_state(b, job->graph, job->seeds[k]))
+        {
+            job->status = -1;
+            return NULL;
+        }
+
+        sample_flows(b, job->n);
+
+        int assigned = 0;
+        size_t offset = (size_t) k * job->cap;
+        for(int i = 2; i <= b->tot; i++)
+        {
+            if(b->u[i] < b->v[i] && b->f[i] == b->one) // output all edges whose final flow is one -- these constitute the integral matching
+            {
+                if(assigned < job->cap)
+                {
+                    job->out_paps[offset + assigned] = b->v[i] - job->nrevs - 1;
+                    job->out_revs[offset + assigned] = b->u[i] - 1;
+                }
+                assigned++;
+            }
+        }
+        if(assigned > job->cap)
+        {
+            assigned = job->cap;
+            job->status = -2;
+        }
+        job->out_counts[k] = assigned;
+
+        free_buffers(b);
+    }
+    return NULL;
+}
+
+// add the nonzero flow z from reviewer x to paper y to the flow graph
+void add_flow(bvn_state* b, int x, int y, int z)
+{
+    b->c[x] += z; // update load counters at vertices
+    b->c[y] -= z;
+
+    ae(b, x, y, z);
+    ae(b, y, x, b->one - z);
+
+    ai(b, y, b->ri[x], z); // and update flow counter for paper-institution pair
+
+    cnr(b, b->tot); // remove edge if flow is already integral
+}
+
+// push flow around paths / cycles of fractional edges until all edges are integral
+void sample_flows(bvn_state* b, int n)
+{
+    while(b->m) // while there are still fractional edges left
+    {
+        if(debug) printf("%d\n", b->m);
+        memset(b->s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
         for(int i = 1; i <= n; i++) // try to find paths / cycles starting from vertices with fractional load
-            if(!in(c[i]))
+            if(!in(b, b->c[i]))
             {
-                top = 0;
-                if(go(i, 0, 1)) break;
+                b->top = 0;
+                if(go(b, i, 0, 1)) break;
             }
 
-        memset(s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
+        memset(b->s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
         for(int i = 1; i <= n; i++) // now try to find cycles only starting from all vertices
         {
-            top = 0;
-            if(go(i, 0, 0)) break;
+            b->top = 0;
+            if(go(b, i, 0, 0)) break;
         }
     }
-
-	// set all flows to 0 for output
-    for(int i = 0; i < npaps * nrevs; i++)
-    {
-		flows[i] = 0;
-	}
-
-    for(int i = 2; i <= tot; i++)
-	{
-        if(u[i] < v[i] && f[i] == one) // output all edges whose final flow is one -- these constitute the integral matching
-		{
-			int idx = pap_rev_to_idx(v[i], u[i], npaps, nrevs);
-			flows[idx] = 1;
-		}
-	}
-
-	free_buffers();
-    return 0;
 }
 
 // main algorithm logic, searches for a path/cycle and pushes flow when found
-int go(int x, int y, int p) // x: current vertex, y: previous edge, p: whether finding a path
+int go(bvn_state* b, int x, int y, int p) // x: current vertex, y: previous edge, p: whether finding a path
 {
-    if(debug) printf("%d %d %d %d\n", x, y, p, top);
-    if(y) st[++top] = y; // push incoming edge into stack
+    if(debug) printf("%d %d %d %d\n", x, y, p, b->top);
+    if(y) b->st[++b->top] = y; // push incoming edge into stack
     int ret = 0, t = 0, yi = 0, zi = 0;
 
-    if(!hi[x]) // x is a reviewer
+    if(!b->hi[x]) // x is a reviewer
     {
-        if(debug) printf("c: %d\n", c[x]);
-        if(s[x]) // found a cycle
+        if(debug) printf("c: %d\n", b->c[x]);
+        if(b->s[x]) // found a cycle
         {
-            fw = bw = one;
-            btm = 0;
+            b->fw = b->bw = b->one;
+            b->btm = 0;
 
-            for(int i = 1; i <= top; i++) // cycle starts from previous edge leaving x
-                if(u[st[i]] == x)
+            for(int i = 1; i <= b->top; i++) // cycle starts from previous edge leaving x
+                if(b->u[b->st[i]] == x)
                 {
-                    btm = i;
+                    b->btm = i;
                     break;
                 }
 
-            if(debug) printf("r cycle: %d\n", btm);
+            if(debug) printf("r cycle: %d\n", b->btm);
 
             return 1;
         }
 
-        if(y && p && (!in(c[x]))) // found a path
+        if(y && p && (!in(b, b->c[x]))) // found a path
         {
-            fw = ce(c[x]) - c[x];
-            bw = c[x] - fl(c[x]);
-            btm = 1; // path always starts from first edge
-            if(debug) printf("r path: %d\n", btm);
+            b->fw = ce(b, b->c[x]) - b->c[x];
+            b->bw = b->c[x] - fl(b, b->c[x]);
+            b->btm = 1; // path always starts from first edge
+            if(debug) printf("r path: %d\n", b->btm);
             return 1;
         }
 
-        s[x] = 1; // mark reviewer visited
-        t = tr(x, 0);
+        b->s[x] = 1; // mark reviewer visited
+        t = tr(b, x, 0);
 
         if(!t) // for some reason no fractional edge is available (should only happen when y = 0)
         {
             if(debug && y) printf("r dead end\n");
-            fw = bw = 0;
+            b->fw = b->bw = 0;
             return 0;
         }
-        if(debug) printf("f[t]: %d\n", f[t]);
-        se[t] = se[t ^ 1] = 1; // mark outgoing edge visited
-        ret = go(v[t], t, p); // go to next vertex (which should be a paper)
-        se[t] = se[t ^ 1] = 0; // and then unmark
-        fw = min(fw, f[t]);
-        bw = min(bw, f[t ^ 1]);
+        if(debug) printf("f[t]: %d\n", b->f[t]);
+        b->se[t] = b->se[t ^ 1] = 1; // mark outgoing edge visited
+        ret = go(b, b->v[t], t, p); // go to next vertex (which should be a paper)
+        b->se[t] = b->se[t ^ 1] = 0; // and then unmark
+        b->fw = min(b->fw, b->f[t]);
+        b->bw = min(b->bw, b->f[t ^ 1]);
     }
     else // x is a paper
     {
-        yi = fi(x, ri[u[y]]); // set yi to institution of incoming edge
+        yi = fi(b, x, b->ri[b->u[y]]); // set yi to institution of incoming edge
 
-        if(debug) printf("c: %d, ci: %d\n", c[x], ci[yi]);
+        if(debug) printf("c: %d, ci: %d\n", b->c[x], b->ci[yi]);
 
-        if(si[yi]) // found an ``even'' cycle (never happens when y = yi = 0)
+        if(b->si[yi]) // found an ``even'' cycle (never happens when y = yi = 0)
         {
-            fw = bw = one;
-            btm = 0;
+            b->fw = b->bw = b->one;
+            b->btm = 0;
 
-            for(int i = 1; i <= top; i++)
-                if(u[st[i]] == x && ri[v[st[i]]] == vi[yi]) // find first edge in stack (1) leaving x and (2) going to institution of incoming edge -- cycle starts there
+            for(int i = 1; i <= b->top; i++)
+                if(b->u[b->st[i]] == x && b->ri[b->v[b->st[i]]] == b->vi[yi]) // find first edge in stack (1) leaving x and (2) going to institution of incoming edge -- cycle starts there
                 {
-                    btm = i;
+                    b->btm = i;
                     break;
                 }
 
-            if(debug) printf("p even cycle: %d\n", btm);
+            if(debug) printf("p even cycle: %d\n", b->btm);
 
             return 1;
         }
 
-        if(s[x] && !in(ci[yi])) // found an ``odd'' cycle
+        if(b->s[x] && !in(b, b->ci[yi])) // found an ``odd'' cycle
         {
-            fw = ci[yi] - fl(ci[yi]);
-            bw = ce(ci[yi]) - ci[yi];
-            btm = 0;
+            b->fw = b->ci[yi] - fl(b, b->ci[yi]);
+            b->bw = ce(b, b->ci[yi]) - b->ci[yi];
+            b->btm = 0;
 
             int wi = 0;
 
-            for(int i = 1; i <= top; i++) // cycle starts from first edge leaving x which belongs to a fractional institution
-                if(u[st[i]] == x)
+            for(int i = 1; i <= b->top; i++) // cycle starts from first edge leaving x which belongs to a fractional institution
+                if(b->u[b->st[i]] == x)
                 {
-                    wi = fi(x, ri[v[st[i]]]);
-                    if(!in(ci[wi]))
+                    wi = fi(b, x, b->ri[b->v[b->st[i]]]);
+                    if(!in(b, b->ci[wi]))
                     {
-                        btm = i;
+                        b->btm = i;
                         break;
                     }
                 }
 
-            fw = min(fw, ce(ci[wi]) - ci[wi]);
-            bw = min(bw, ci[wi] - fl(ci[wi]));
+            b->fw = min(b->fw, ce(b, b->ci[wi]) - b->ci[wi]);
+            b->bw = min(b->bw, b->ci[wi] - fl(b, b->ci[wi]));
 
-            if(debug) printf("p odd cycle: %d\n", btm);
+            if(debug) printf("p odd cycle: %d\n", b->btm);
 
             return 1;
         }
 
-        if(y && p && (!in(c[x])) && (!in(ci[yi]))) // found a path
+        if(y && p && (!in(b, b->c[x])) && (!in(b, b->ci[yi]))) // found a path
         {
-            fw = ce(c[x]) - c[x];
-            bw = c[x] - fl(c[x]);
-            fw = min(fw, ci[yi] - fl(ci[yi]));
-            bw = min(bw, ce(ci[yi]) - ci[yi]);
-            btm = 1; // path always starts from first edge
-            if(debug) printf("p path: %d\n", btm);
+            b->fw = ce(b, b->c[x]) - b->c[x];
+            b->bw = b->c[x] - fl(b, b->c[x]);
+            b->fw = min(b->fw, b->ci[yi] - fl(b, b->ci[yi]));
+            b->bw = min(b->bw, ce(b, b->ci[yi]) - b->ci[yi]);
+            b->btm = 1; // path always starts from first edge
+            if(debug) printf("p path: %d\n", b->btm);
             return 1;
         }
 
-        if(in(ci[yi])) // integral institution load -- leave through the same institution (equivalent to the other case when y = yi = 0)
-            t = tr(x, vi[yi]);
+        if(in(b, b->ci[yi])) // integral institution load -- leave through the same institution (equivalent to the other case when y = yi = 0)
+            t = tr(b, x, b->vi[yi]);
         else // leave through any fractional institution
-            t = tr(x, 0);
+            t = tr(b, x, 0);
 
         if(!t) // should only happen when y = 0
         {
-            fw = bw = 0;
+            b->fw = b->bw = 0;
             if(debug && y) printf("p dead end\n");
             return 0;
         }
 
-        if(debug) printf("f[t]: %d\n", f[t]);
+        if(debug) printf("f[t]: %d\n", b->f[t]);
 
-        zi = fi(x, ri[v[t]]); // set zi to instituion of outgoing edge
-        si[zi] = 1; // mark paper-instution pair visited
-        se[t] = se[t ^ 1] = 1; // mark edge visited
-        if(!in(ci[zi])) s[x] = 1; // and if leaving through a fractional instituion -- mark vertex visited
+        zi = fi(b, x, b->ri[b->v[t]]); // set zi to instituion of outgoing edge
+        b->si[zi] = 1; // mark paper-instution pair visited
+        b->se[t] = b->se[t ^ 1] = 1; // mark edge visited
+        if(!in(b, b->ci[zi])) b->s[x] = 1; // and if leaving through a fractional instituion -- mark vertex visited
 
-        ret = go(v[t], t, p); // go to next vertex (which should be a reviewer)
+        ret = go(b, b->v[t], t, p); // go to next vertex (which should be a reviewer)
 
-        si[zi] = 0; // unmark institution
-        se[t] = se[t ^ 1] = 0; // and unmark edge
+        b->si[zi] = 0; // unmark institution
+        b->se[t] = b->se[t ^ 1] = 0; // and unmark edge
 
-        fw = min(fw, f[t]);
-        bw = min(bw, f[t ^ 1]);
+        b->fw = min(b->fw, b->f[t]);
+        b->bw = min(b->bw, b->f[t ^ 1]);
     }
 
-    if(t == st[btm] && fw + bw != 0) // if path / cycle starts from current edge, clear path / cycle
+    if(t == b->st[b->btm] && b->fw + b->bw != 0) // if path / cycle starts from current edge, clear path / cycle
     {
         if((!y) && p) // it's a path
         {
-            fw = min(fw, c[x] - fl(c[x]));
-            bw = min(bw, ce(c[x]) - c[x]);
-            if(hi[x]) // need to consider load of paper-insitution pair of outgoing edge too
+            b->fw = min(b->fw, b->c[x] - fl(b, b->c[x]));
+            b->bw = min(b->bw, ce(b, b->c[x]) - b->c[x]);
+            if(b->hi[x]) // need to consider load of paper-insitution pair of outgoing edge too
             {
-                int yi = fi(x, ri[v[t]]);
-                fw = min(fw, ce(ci[yi]) - ci[yi]);
-                bw = min(bw, ci[yi] - fl(ci[yi]));
+                int yi = fi(b, x, b->ri[b->v[t]]);
+                b->fw = min(b->fw, ce(b, b->ci[yi]) - b->ci[yi]);
+                b->bw = min(b->bw, b->ci[yi] - fl(b, b->ci[yi]));
             }
         }
-        if(debug) printf("clearing a path/cycle: %d %d\n", fw, bw);
+        if(debug) printf("clearing a path/cycle: %d %d\n", b->fw, b->bw);
         int r, d;
-        if(((double)rand()) / RAND_MAX < ((double)bw) / (fw + bw)) // update forward wp bw / (fw + bw), etc
+        if(next_double(b) < ((double)b->bw) / (b->fw + b->bw)) // update forward wp bw / (fw + bw), etc
         {
             d = 1;
-            r = fw;
+            r = b->fw;
         }
         else
         {
             d = -1;
-            r = bw;
+            r = b->bw;
         }
 
-        for(int i = btm; i <= top; i++) upd(st[i], r * d); // update every edge on path / cycle
-        fw = bw = 0;
+        for(int i = b->btm; i <= b->top; i++) upd(b, b->st[i], r * d); // update every edge on path / cycle
+        b->fw = b->bw = 0;
     }
 
-    if(hi[x] && yi != zi) // this part of update must happen after clearing cycle / path
+    if(b->hi[x] && yi != zi) // this part of update must happen after clearing cycle / path
     {
-        fw = min(fw, ce(ci[zi]) - ci[zi]);
-        bw = min(bw, ci[zi] - fl(ci[zi]));
+        b->fw = min(b->fw, ce(b, b->ci[zi]) - b->ci[zi]);
+        b->bw = min(b->bw, b->ci[zi] - fl(b, b->ci[zi]));
 
-        fw = min(fw, ci[yi] - fl(ci[yi]));
-        bw = min(bw, ce(ci[yi]) - ci[yi]);
+        b->fw = min(b->fw, b->ci[yi] - fl(b, b->ci[yi]));
+        b->bw = min(b->bw, ce(b, b->ci[yi]) - b->ci[yi]);
     }
 
     return ret;
@@ -341,96 +562,131 @@ int go(int x, int y, int p) // x: current vertex, y: previous edge, p: whether f
 
 /* FLOW GRAPH MODIFICATION FUNCTIONS */
 
-void ae(int x, int y, int z) // add an edge from x to y with flow z (and implicitly with capacity 1); also add a co-edge from y to x; note that co-edge of an edge with pointer p has pointer p ^ 1
+void ae(bvn_state* b, int x, int y, int z) // add an edge from x to y with flow z (and implicitly with capacity 1); also add a co-edge from y to x; note that co-edge of an edge with pointer p has pointer p ^ 1
 {
-    ++m;
-    u[++tot] = x;
-    v[tot] = y;
-    f[tot] = z;
-    l[tot] = h[x];
-    h[x] = tot;
+    ++b->m;
+    b->u[++b->tot] = x;
+    b->v[b->tot] = y;
+    b->f[b->tot] = z;
+    b->l[b->tot] = b->h[x];
+    b->h[x] = b->tot;
 }
 
-int fi(int p, int i) // find the pointer at paper p for instution i
+int fi(bvn_state* b, int p, int i) // find the pointer at paper p for instution i
 {
-    for(int j = hi[p]; j; j = li[j])
-        if(vi[j] == i) return j;
+    for(int j = b->hi[p]; j; j = b->li[j])
+        if(b->vi[j] == i) return j;
     return 0;
 }
 
-void ai(int p, int i, int w) // add an amount of load, w, to a paper-instution pair (p, i)
+void ai(bvn_state* b, int p, int i, int w) // add an amount of load, w, to a paper-instution pair (p, i)
 {
-    int j = fi(p, i);
+    int j = fi(b, p, i);
     if(j)
-        ci[j] += w;
+        b->ci[j] += w;
     else
     {
-        vi[++ti] = i;
-        li[ti] = hi[p];
-        ci[ti] = w;
-        hi[p] = ti;
+        b->vi[++b->ti] = i;
+        b->li[b->ti] = b->hi[p];
+        b->ci[b->ti] = w;
+        b->hi[p] = b->ti;
     }
 }
 
-void re(int x) // remove edge with pointer x
+void re(bvn_state* b, int x) // remove edge with pointer x
 {
-    --m;
-    int t = u[x];
-    if(x == h[t])
+    --b->m;
+    int t = b->u[x];
+    if(x == b->h[t])
     {
-        h[t] = l[x];
+        b->h[t] = b->l[x];
         return;
     }
-    int i = h[t];
-    while(l[i] != x)
-        i = l[i];
-    l[i] = l[x];
+    int i = b->h[t];
+    while(b->l[i] != x)
+        i = b->l[i];
+    b->l[i] = b->l[x];
 }
 
-int tr(int x, int i) // find a fractional edge adjacent to x not visited yet belonging to institution i (or any insitution with fractional paper-instituion load when i = 0)
+int tr(bvn_state* b, int x, int i) // find a fractional edge adjacent to x not visited yet belonging to institution i (or any insitution with fractional paper-instituion load when i = 0)
 {
-    if(!hi[x])
+    if(!b->hi[x])
     {
-        for(int j = h[x]; j; j = l[j])
-            if(!se[j]) return j;
+        for(int j = b->h[x]; j; j = b->l[j])
+            if(!b->se[j]) return j;
     }
     else if(!i)
     {
-        for(int j = hi[x]; j; j = li[j])
-            if(!in(ci[j]))
+        for(int j = b->hi[x]; j; j = b->li[j])
+            if(!in(b, b->ci[j]))
             {
-                int t = tr(x, vi[j]);
+                int t = tr(b, x, b->vi[j]);
                 if(t) return t;
             }
     }
     else
-        for(int j = h[x]; j; j = l[j])
-            if(ri[v[j]] == i && !se[j]) return j;
+        for(int j = b->h[x]; j; j = b->l[j])
+            if(b->ri[b->v[j]] == i && !b->se[j]) return j;
     return 0;
 }
 
-void cnr(int x) // if edge with pointer x has flow 0 or 1, then remove it and its co-edge
+void cnr(bvn_state* b, int x) // if edge with pointer x has flow 0 or 1, then remove it and its co-edge
 {
-    if(f[x] == 0 || f[x] == one)
+    if(b->f[x] == 0 || b->f[x] == b->one)
     {
-        re(x);
-        re(x ^ 1);
+        re(b, x);
+        re(b, x ^ 1);
     }
 }
 
-void upd(int x, int y) // add flow y to edge with pointer x; update all load counters associated with the edge
+void upd(bvn_state* b, int x, int y) // add flow y to edge with pointer x; update all load counters associated with the edge
 {
-    f[x] -= y;
-    f[x ^ 1] += y;
-    c[u[x]] -= y;
-    c[v[x]] += y;
+    b->f[x] -= y;
+    b->f[x ^ 1] += y;
+    b->c[b->u[x]] -= y;
+    b->c[b->v[x]] += y;
 
-    if(hi[v[x]])
-        ai(v[x], ri[u[x]], -y);
+    if(b->hi[b->v[x]])
+        ai(b, b->v[x], b->ri[b->u[x]], -y);
     else
-        ai(u[x], ri[v[x]], y);
+        ai(b, b->u[x], b->ri[b->v[x]], y);
 
-    cnr(x);
+    cnr(b, x);
+}
+
+
+/* RANDOM NUMBER GENERATION */
+
+uint64_t rotl(uint64_t x, int k)
+{
+    return (x << k) | (x >> (64 - k));
+}
+
+void seed_rng(bvn_state* b, uint64_t seed) // fill the xoshiro256** state with splitmix64 outputs of the seed
+{
+    for(int i = 0; i < 4; i++)
+    {
+        uint64_t z = (seed += 0x9e3779b97f4a7c15ULL);
+        z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+        z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+        b->rng[i] = z ^ (z >> 31);
+    }
+}
+
+double next_double(bvn_state* b) // uniform random number in [0, 1) from xoshiro256**
+{
+    uint64_t* r = b->rng;
+    uint64_t result = rotl(r[1] * 5, 7) * 9;
+    uint64_t t = r[1] << 17;
+
+    r[2] ^= r[0];
+    r[3] ^= r[1];
+    r[1] ^= r[2];
+    r[0] ^= r[3];
+    r[2] ^= t;
+    r[3] = rotl(r[3], 45);
+
+    return (result >> 11) * 0x1.0p-53;
 }
 
 
@@ -438,85 +694,121 @@ void upd(int x, int y) // add flow y to edge with pointer x; update all load cou
 
 int idx_to_rev(int i, int npaps, int nrevs) // flat idx -> reviewer number, which starts at 1
 {
-	return (i % nrevs) + 1;
+    return (i % nrevs) + 1;
 }
 
 int idx_to_pap(int i, int npaps, int nrevs) // flat idx -> paper number, which starts at nrevs + 1
 {
-	return ((int) (i / nrevs)) + nrevs + 1;
+    return ((int) (i / nrevs)) + nrevs + 1;
 }
 
 int pap_rev_to_idx(int p, int r, int npaps, int nrevs) // (pap, rev) -> flat idx, which starts at 0
 {
-	return ((p - nrevs - 1) * nrevs) + (r - 1);
+    return ((p - nrevs - 1) * nrevs) + (r - 1);
 }
 
 int min(int a, int b)
 {
-	return (a <= b) ? a : b;
+    return (a <= b) ? a : b;
 }
 
-int fl(int x) // floor
+int fl(bvn_state* b, int x) // floor
 {
-    return floor(((double)x) / one) * one;
+    return floor(((double)x) / b->one) * b->one;
 }
 
-int ce(int x) // ceiling
+int ce(bvn_state* b, int x) // ceiling
 {
-    return ceil(((double)x) / one) * one;
+    return ceil(((double)x) / b->one) * b->one;
 }
 
-int in(int x) // whether a number is ``integral''
+int in(bvn_state* b, int x) // whether a number is ``integral''
 {
-    return x == fl(x) || x == ce(x);
+    return x == fl(b, x) || x == ce(b, x);
 }
 
-void initialize_state(int vsize, int esize)
+int initialize_state(bvn_state* b, int vsize, int esize, int one_, uint64_t seed) // returns nonzero if memory could not be allocated
 {
-	h = alloc_int(vsize);
-	u = alloc_int(esize);
-	v = alloc_int(esize);
-	l = alloc_int(esize);
-	se = alloc_int(esize);
-	s = alloc_int(vsize);
-	ri = alloc_int(vsize);
-	hi = alloc_int(vsize);
-	vi = alloc_int(esize);
-	li = alloc_int(esize);
-	si = alloc_int(esize);
-	st = alloc_int(esize);
-	f = alloc_int(esize);
-	c = alloc_int(vsize);
-	ci = alloc_int(esize);
-	fw = 0;
-	bw = 0;
-	m = 0;
-	ti = 0;
-	top = 0;
-	btm = 0;
-	tot = 1;
+    memset(b, 0, sizeof(bvn_state));
+    b->one = one_;
+    b->vsize = vsize;
+    b->esize = esize;
+    seed_rng(b, seed);
+    b->h = alloc_int(vsize);
+    b->u = alloc_int(esize);
+    b->v = alloc_int(esize);
+    b->l = alloc_int(esize);
+    b->se = alloc_int(esize);
+    b->s = alloc_int(vsize);
+    b->ri = alloc_int(vsize);
+    b->hi = alloc_int(vsize);
+    b->vi = alloc_int(esize);
+    b->li = alloc_int(esize);
+    b->si = alloc_int(esize);
+    b->st = alloc_int(esize);
+    b->f = alloc_int(esize);
+    b->c = alloc_int(vsize);
+    b->ci = alloc_int(esize);
+    b->tot = 1;
+    if(!(b->h && b->u && b->v && b->l && b->se && b->s && b->ri && b->hi && b->vi && b->li && b->si && b->st && b->f && b->c && b->ci))
+    {
+        free_buffers(b);
+        return 1;
+    }
+    return 0;
+}
+
+int copy_state(bvn_state* b, const bvn_state* graph, uint64_t seed) // make b a copy of graph with a newly seeded generator; returns nonzero if memory could not be allocated
+{
+    if(initialize_state(b, graph->vsize, graph->esize, graph->one, seed)) return 1;
+
+    size_t vbytes = graph->vsize * sizeof(int);
+    size_t ebytes = graph->esize * sizeof(int);
+    memcpy(b->h, graph->h, vbytes);
+    memcpy(b->u, graph->u, ebytes);
+    memcpy(b->v, graph->v, ebytes);
+    memcpy(b->l, graph->l, ebytes);
+    memcpy(b->se, graph->se, ebytes);
+    memcpy(b->s, graph->s, vbytes);
+    memcpy(b->ri, graph->ri, vbytes);
+    memcpy(b->hi, graph->hi, vbytes);
+    memcpy(b->vi, graph->vi, ebytes);
+    memcpy(b->li, graph->li, ebytes);
+    memcpy(b->si, graph->si, ebytes);
+    memcpy(b->st, graph->st, ebytes);
+    memcpy(b->f, graph->f, ebytes);
+    memcpy(b->c, graph->c, vbytes);
+    memcpy(b->ci, graph->ci, ebytes);
+    b->fw = graph->fw;
+    b->bw = graph->bw;
+    b->m = graph->m;
+    b->tot = graph->tot;
+    b->ti = graph->ti;
+    b->top = graph->top;
+    b->btm = graph->btm;
+    return 0;
 }
 
 int* alloc_int(int size)
 {
-	return (int*) calloc(size, sizeof(int));
+    return (int*) calloc(size, sizeof(int));
 }
 
-void free_buffers(void)
+void free_buffers(bvn_state* b)
 {
-	free(h);
-	free(u);
-	free(v);
-	free(l);
-	free(se);
-	free(s);
-	free(ri);
-	free(hi);
-	free(vi);
-	free(li);
-	free(si);
-	free(st);
-	free(f);
-	free(c);
-	free(ci);
+    free(b->h);
+    free(b->u);
+    free(b->v);
+    free(b->l);
+    free(b->se);
+    free(b->s);
+    free(b->ri);
+    free(b->hi);
+    free(b->vi);
+    free(b->li);
+    free(b->si);
+    free(b->st);
+    free(b->f);
+    free(b->c);
+    free(b->ci);
 }
@@ -7,13 +7,21 @@ from cffi import FFI
 ffibuilder = FFI()
 
 header = (
-    "int run_bvn(int* flows, int* subsets, int nrevs, int npaps, int one_);"
+    "int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_, "
+    "unsigned long long seed);\n"
+    "int run_bvn_sparse(int* paps, int* revs, int* flows, int nedges, "
+    "int* subsets, int npaps, int nrevs, int one_, unsigned long long seed, "
+    "int* out_paps, int* out_revs);\n"
+    "int run_bvn_batch(int* paps, int* revs, int* flows, int nedges, "
+    "int* subsets, int npaps, int nrevs, int one_, "
+    "unsigned long long* seeds, int nsamples, int nthreads, int cap, "
+    "int* out_paps, int* out_revs, int* out_counts);"
 )
 ffibuilder.cdef(header)
 ffibuilder.set_source(
     "_bvn_extension",  # extension name
     header,
     sources=["matcher/solvers/bvn_extension/bvn.c"],
-    libraries=["m"],
-)  # link with the math library
+    libraries=["m", "pthread"],
+)  # link with the math and threads libraries
 ffibuilder.compile(verbose=True)
@@ -0,0 +1,49 @@
+"""
+Candidate pruning for the flow-based solvers.
+
+Only a paper's best few reviewers can realistically be assigned to it, so the
+reviewer-paper arcs of a flow network can be restricted to each paper's
+`candidate_limit` cheapest arcs. To keep the load bounds satisfiable, each
+reviewer also keeps its cheapest arcs, as many as the reviews it must (or
+may) be assigned. The solvers widen the limit and rebuild the network when
+the pruned problem turns out to be infeasible.
+"""
+
+import numpy as np
+
+
+def select_candidates(
+    paper_indices,
+    reviewer_indices,
+    costs,
+    candidate_limit,
+    demands,
+    reviewer_loads,
+):
+    """
+    return a mask over the given arcs that keeps, for every paper, its
+    `max(candidate_limit, demand)` cheapest arcs and, for every reviewer, its
+    `reviewer_load` cheapest arcs. Ties are broken by arc position.
+    """
+    paper_limits = np.maximum(
+        np.asarray(demands, dtype=np.int64), candidate_limit
+    )
+    keep = _cheapest_per_group(paper_indices, costs, paper_limits)
+    keep |= _cheapest_per_group(
+        reviewer_indices, costs, np.asarray(reviewer_loads, dtype=np.int64)
+    )
+    return keep
+
+
+def _cheapest_per_group(group_indices, costs, limits):
+    """mask of the `limits[g]` cheapest arcs of each group g"""
+    # lexsort is stable, so equal costs stay in arc order
+    order = np.lexsort((costs, group_indices))
+    sorted_groups = group_indices[order]
+    ranks = np.arange(len(order)) - np.searchsorted(
+        sorted_groups, sorted_groups
+    )
+
+    keep = np.zeros(len(order), dtype=bool)
+    keep[order] = ranks < limits[sorted_groups]
+    return keep
@@ -0,0 +1,271 @@
+"""
+Connected-component decomposition of assignment problems.
+
+A reviewer can only be assigned to the papers it has an allowed pair with:
+a pair is disallowed by a conflict constraint, or (unless zero scores are
+allowed) by a zero cost. The graph of allowed pairs often falls apart into
+independent components, such as tracks or subcommittees, and the
+assignment of one component does not affect the others.
+
+DecomposedSolver finds these components, solves each one with the given
+solver class in a pool of worker processes, and puts the solutions back
+together. Only solvers whose objective adds up over components, and whose
+solution is just the flow matrix, can be decomposed (DECOMPOSABLE_SOLVERS).
+"""
+
+import concurrent.futures
+import logging
+import time
+from collections import namedtuple
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+from .artifacts import bad_affinity_reviewers
+from .core import SolverException
+from .minmax_solver import MinMaxSolver
+from .fairflow import FairFlow
+from .auction_solver import AuctionSolver
+
+DECOMPOSABLE_SOLVERS = (MinMaxSolver, FairFlow, AuctionSolver)
+
+# the matrices of an Encoder that the decomposable solvers use
+ComponentEncoder = namedtuple(
+    "ComponentEncoder",
+    ["cost_matrix", "constraint_matrix", "aggregate_score_matrix"],
+)
+
+
+def allowed_pairs(cost_matrix, constraint_matrix, allow_zero_score_assignments):
+    """
+    return a boolean matrix (papers x reviewers) of the pairs that a solver
+    may assign.
+    """
+    cost_matrix = np.asarray(cost_matrix)
+    constraint_matrix = np.asarray(constraint_matrix)
+    allowed = constraint_matrix == 0
+    # solvers replace all-zero costs with random ones
+    if not allow_zero_score_assignments and cost_matrix.any():
+        allowed &= cost_matrix != 0
+    return allowed | (constraint_matrix == 1)
+
+
+def connected_components(allowed):
+    """
+    Label the connected components of the bipartite graph of allowed pairs.
+
+    return the number of components, and arrays of the component of each
+    paper and of each reviewer.
+    """
+    num_papers, num_reviewers = allowed.shape
+    paper_indices, reviewer_indices = np.nonzero(allowed)
+    graph = scipy.sparse.coo_matrix(
+        (
+            np.ones(len(paper_indices), dtype=bool),
+            (paper_indices, num_papers + reviewer_indices),
+        ),
+        shape=(num_papers + num_reviewers, num_papers + num_reviewers),
+    )
+    num_components, labels = scipy.sparse.csgraph.connected_components(
+        graph, directed=False
+    )
+    return num_components, labels[:num_papers], labels[num_papers:]
+
+
+class DecomposedSolver:
+    """Solves the connected components of an assignment problem separately."""
+
+    def __init__(
+        self,
+        solver_class,
+        minimums,
+        maximums,
+        demands,
+        encoder,
+        allow_zero_score_assignments=False,
+        logger=logging.getLogger(__name__),
+        processes=None,
+        **solver_options
+    ):
+        if solver_class not in DECOMPOSABLE_SOLVERS:
+            raise SolverException(
+                "{} can not be decomposed, choose from {}".format(
+                    solver_class.__name__,
+                    [solver.__name__ for solver in DECOMPOSABLE_SOLVERS],
+                )
+            )
+        self.solver_class = solver_class
+        self.minimums = np.array(minimums)
+        self.maximums = np.array(maximums)
+        self.demands = np.array(demands)
+        self.allow_zero_score_assignments = allow_zero_score_assignments
+        self.logger = logger
+        self.processes = processes
+        self.solver_options = solver_options
+
+        self.cost_matrix = np.asarray(encoder.cost_matrix)
+        self.constraint_matrix = np.asarray(encoder.constraint_matrix)
+        self.aggregate_score_matrix = np.asarray(
+            encoder.aggregate_score_matrix
+        )
+        self.num_papers, self.num_reviewers = self.cost_matrix.shape
+
+        self.solved = False
+        self.flow_matrix = None
+        self.cost = None
+
+    def components(self):
+        """
+        return the paper and reviewer indices of each component with papers,
+        and the indices of the reviewers in none of them.
+        """
+        _, paper_labels, reviewer_labels = connected_components(
+            allowed_pairs(
+                self.cost_matrix,
+                self.constraint_matrix,
+                self.allow_zero_score_assignments,
+            )
+        )
+        components = []
+        for label in np.unique(paper_labels):
+            components.append(
+                (
+                    np.flatnonzero(paper_labels == label),
+                    np.flatnonzero(reviewer_labels == label),
+                )
+            )
+        isolated_reviewers = np.flatnonzero(
+            ~np.isin(reviewer_labels, paper_labels)
+        )
+        return components, isolated_reviewers
+
+    def _validate_input_range(self):
+        """
+        Validate if demand is in the range of min supply and max supply of
+        the whole problem, as the solver does, after dropping the minimums
+        of the reviewers without known affinities.
+        """
+        if not self.allow_zero_score_assignments:
+            if self.cost_matrix.any():
+                bad_reviewers = bad_affinity_reviewers(
+                    self.cost_matrix, self.constraint_matrix
+                )
+            else:
+                # the solver replaces all-zero costs with random ones
+                bad_reviewers = np.flatnonzero(
+                    np.all(self.constraint_matrix != 0, axis=0)
+                )
+            self.minimums[bad_reviewers] = 0
+
+        min_supply = np.sum(self.minimums)
+        max_supply = np.sum(self.maximums)
+        demand = np.sum(self.demands)
+
+        if demand > max_supply or demand < min_supply:
+            raise SolverException(
+                "Review demand ({}) must be between the min review supply is ({}) and max review supply is ({}).".format(
+                    demand, min_supply, max_supply
+                ) + " Try (1) decreasing min papers (2) increasing max papers or (3) finding more reviewers"
+            )
+
+    def _subproblem(self, papers, reviewers):
+        pairs = np.ix_(papers, reviewers)
+        return (
+            self.solver_class,
+            self.minimums[reviewers].tolist(),
+            self.maximums[reviewers].tolist(),
+            self.demands[papers].tolist(),
+            ComponentEncoder(
+                self.cost_matrix[pairs],
+                self.constraint_matrix[pairs],
+                self.aggregate_score_matrix[pairs],
+            ),
+            self.allow_zero_score_assignments,
+            self.solver_options,
+        )
+
+    def solve(self):
+        self._validate_input_range()
+        components, isolated_reviewers = self.components()
+        self.flow_matrix = np.zeros((self.num_papers, self.num_reviewers))
+        if self.allow_zero_score_assignments and np.any(
+            self.minimums[isolated_reviewers] > 0
+        ):
+            # otherwise, the solvers drop the minimums of reviewers without
+            # known affinities
+            self.logger.debug(
+                "Reviewers with a minimum load have no allowed papers"
+            )
+            self.solved = False
+            return self.flow_matrix
+
+        self.logger.debug(
+            "Solving {} connected components, the largest with {} papers "
+            "and {} reviewers".format(
+                len(components),
+                max((len(papers) for papers, _ in components), default=0),
+                max(
+                    (len(reviewers) for _, reviewers in components), default=0
+                ),
+            )
+        )
+        subproblems = [
+            self._subproblem(papers, reviewers)
+            for papers, reviewers in components
+        ]
+
+        start_time = time.time()
+        if self.processes == 1 or len(subproblems) <= 1:
+            results = [_solve_component(*problem) for problem in subproblems]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                self.processes
+            ) as executor:
+                results = list(
+                    executor.map(_solve_component, *zip(*subproblems))
+                )
+        self.logger.debug(
+            "Solving the components took {} seconds".format(
+                time.time() - start_time
+            )
+        )
+
+        self.solved = all(result is not None for result in results)
+        if not self.solved:
+            self.logger.debug("A component has no solution")
+            return self.flow_matrix
+
+        for (papers, reviewers), result in zip(components, results):
+            self.flow_matrix[np.ix_(papers, reviewers)] = result
+        self.cost = np.sum(self.flow_matrix * self.cost_matrix)
+        return self.flow_matrix
+
+
+def _solve_component(
+    solver_class,
+    minimums,
+    maximums,
+    demands,
+    encoder,
+    allow_zero_score_assignments,
+    solver_options,
+):
+    """return the flow matrix of a component, or None if it has no solution"""
+    if not maximums:
+        # papers without any allowed reviewer
+        return None if any(demands) else np.zeros((len(demands), 0))
+
+    solver = solver_class(
+        minimums,
+        maximums,
+        demands,
+        encoder,
+        allow_zero_score_assignments=allow_zero_score_assignments,
+        **solver_options
+    )
+    try:
+        result = solver.solve()
+    except SolverException:
+        # the supply of the whole problem covers its demand, so this
+        # component just has no solution
+        return None
+    return np.asarray(result) if solver.solved else None
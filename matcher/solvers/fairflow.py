@@ -1,9 +1,11 @@
 from collections import defaultdict
-from ortools.graph.python import min_cost_flow
 import numpy as np
 import uuid
 import time
 from .core import SolverException
+from .artifacts import get_artifacts
+from .candidates import select_candidates
+from .flow_backends import make_min_cost_flow
 import logging
 
 
@@ -39,6 +41,8 @@ class FairFlow(object):
         allow_zero_score_assignments=False,
         solution=None,
         logger=logging.getLogger(__name__),
+        candidate_limit=None,
+        flow_backend="ortools",
     ):
         """
         Initialize a makespan flow matcher
@@ -50,14 +54,27 @@ class FairFlow(object):
         :param allow_zero_score_assignments: bool to allow pairs with zero affinity in the solution.
             unknown matching scores default to 0. set to True to allow zero (unknown) affinity in solution.
         :param solution: a matrix of assignments (same shape as encoder.affinity_matrix)
+        :param candidate_limit: if set, the flow networks that assign reviewers only consider
+            each paper's `candidate_limit` best reviewers (see solvers.candidates), widening
+            the limit when that has no solution.
+        :param flow_backend: name of the min-cost flow implementation (see solvers.flow_backends).
 
         :return: initialized makespan matcher.
         """
         self.logger = logger
         self.allow_zero_score_assignments = allow_zero_score_assignments
+        self.candidate_limit = candidate_limit
+        self.flow_backend = flow_backend
         self.logger.debug("Init FairFlow")
-        self.constraint_matrix = encoder.constraint_matrix
-        affinity_matrix = encoder.aggregate_score_matrix.transpose()
+        artifacts = get_artifacts(encoder)
+        if artifacts is not None:
+            self.constraint_matrix = artifacts.constraint_matrix
+            affinity_matrix = artifacts.affinity_matrix.transpose()
+        else:
+            self.constraint_matrix = np.asarray(encoder.constraint_matrix)
+            affinity_matrix = np.asarray(
+                encoder.aggregate_score_matrix
+            ).transpose()
 
         self.maximums = maximums
         self.minimums = minimums
@@ -74,13 +91,19 @@ class FairFlow(object):
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no non-zero affinity edges after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.affinity_matrix * (self.constraint_matrix == 0).T)
-                    == 0,
-                    axis=1,
-                )
-            )[0]
+            if artifacts is not None:
+                bad_affinity_reviewers = artifacts.bad_affinity_reviewers
+            else:
+                bad_affinity_reviewers = np.where(
+                    np.all(
+                        (
+                            self.affinity_matrix
+                            * (self.constraint_matrix == 0).T
+                        )
+                        == 0,
+                        axis=1,
+                    )
+                )[0]
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 "
                 "because they do not have known affinity with any paper".format(
@@ -111,7 +134,7 @@ class FairFlow(object):
         self.big_c = 10000
         self.bigger_c = self.big_c**2
 
-        self.min_cost_flow = min_cost_flow.SimpleMinCostFlow()
+        self.min_cost_flow = make_min_cost_flow(self.flow_backend)
         self.start_inds = []
         self.end_inds = []
         self.caps = []
@@ -150,7 +173,7 @@ class FairFlow(object):
 
     def _refresh_internal_vars(self):
         """Set start, end, caps, costs to be empty."""
-        self.min_cost_flow = min_cost_flow.SimpleMinCostFlow()
+        self.min_cost_flow = make_min_cost_flow(self.flow_backend)
         self.start_inds = []
         self.end_inds = []
         self.caps = []
@@ -571,63 +594,98 @@ class FairFlow(object):
         """
         source = n_rev + n_pap
         sink = n_rev + n_pap + 1
-
-        mcf = min_cost_flow.SimpleMinCostFlow()
+        _caps = np.asarray(_caps).astype(np.int64)
+        _covs = np.asarray(_covs).astype(np.int64)
 
         # edges from source to reviewers.
-        for i in range(n_rev):
-            if int(_caps[i]) > 0:
-                mcf.add_arcs_with_capacity_and_unit_cost(source, i, int(_caps[i]), 0)
+        source_reviewers = np.nonzero(_caps > 0)[0]
 
         # edges from reviewers to papers.
-        for i in range(n_rev):
-            for j in range(n_pap):
-                arc_cap = 1
-                if self.solution[i, j] == 1:
-                    continue
-
-                edge_constraint = self.constraint_matrix[(j, i)]
-
-                # a constraint of 0 means there's no constraint, so apply the cost as normal, so add an arc normally
-                # a constraint of 1 means that this user was explicitly assigned to this paper. We do not support positive constraints right now, so, do not add an arc
-                # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
-                if edge_constraint == 0 and (
-                    self.allow_zero_score_assignments or ws[i, j] != 0
-                ):
-                    # Costs must be integers. Also, we have affinities so make the "costs" negative affinities.
-                    mcf.add_arcs_with_capacity_and_unit_cost(
-                        i,
-                        n_rev + j,
-                        int(arc_cap),
-                        int(-1.0 - self.big_c * ws[i, j]),
-                    )
+        # a constraint of 0 means there's no constraint, so apply the cost as normal, so add an arc normally
+        # a constraint of 1 means that this user was explicitly assigned to this paper. We do not support positive constraints right now, so, do not add an arc
+        # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
+        arc_mask = (self.solution != 1) & (self.constraint_matrix.T == 0)
+        if not self.allow_zero_score_assignments:
+            arc_mask &= ws != 0
+        revs, paps = np.nonzero(arc_mask)
+        # Costs must be integers. Also, we have affinities so make the "costs" negative affinities.
+        arc_costs = (-1.0 - self.big_c * ws[revs, paps]).astype(np.int64)
 
         # edges from papers to sink.
-        for j in range(n_pap):
-            if int(_covs[j]) > 0:
-                mcf.add_arcs_with_capacity_and_unit_cost(
-                    n_rev + j, sink, int(_covs[j]), 0
-                )
+        sink_papers = np.nonzero(_covs > 0)[0]
 
-        supplies = np.zeros(n_rev + n_pap + 2)
+        supplies = np.zeros(n_rev + n_pap + 2, dtype=np.int64)
         supplies[source] = int(flow)
         supplies[sink] = int(-flow)
 
-        # set Node supply for this MCF.
-        for i in range(len(supplies)):
-            mcf.set_nodes_supplies(i, int(supplies[i]))
+        candidate_limit = self.candidate_limit
+        while True:
+            selected = np.ones(len(revs), dtype=bool)
+            if candidate_limit is not None:
+                selected = select_candidates(
+                    paps, revs, arc_costs, candidate_limit, _covs, _caps
+                )
+            pruned = not selected.all()
+
+            mcf = make_min_cost_flow(self.flow_backend)
+            mcf.add_arcs_with_capacity_and_unit_cost(
+                np.concatenate(
+                    [
+                        np.full(len(source_reviewers), source),
+                        revs[selected],
+                        n_rev + sink_papers,
+                    ]
+                ).astype(np.int32),
+                np.concatenate(
+                    [
+                        source_reviewers,
+                        n_rev + paps[selected],
+                        np.full(len(sink_papers), sink),
+                    ]
+                ).astype(np.int32),
+                np.concatenate(
+                    [
+                        _caps[source_reviewers],
+                        np.ones(np.count_nonzero(selected), dtype=np.int64),
+                        _covs[sink_papers],
+                    ]
+                ),
+                np.concatenate(
+                    [
+                        np.zeros(len(source_reviewers), dtype=np.int64),
+                        arc_costs[selected],
+                        np.zeros(len(sink_papers), dtype=np.int64),
+                    ]
+                ),
+            )
+
+            # set Node supply for this MCF.
+            mcf.set_nodes_supplies(
+                np.arange(len(supplies), dtype=np.int32), supplies
+            )
+
+            # Solve.
+            solver_status = mcf.solve()
+            if solver_status == mcf.OPTIMAL or not pruned:
+                break
+            # the best candidates can't route the flow, so consider more
+            candidate_limit *= 2
+            self.logger.debug(
+                "Solver status: {}, widening candidate limit to {}".format(
+                    solver_status, candidate_limit
+                )
+            )
 
-        # Solve.
-        solver_status = mcf.solve()
         if solver_status == mcf.OPTIMAL:
-            for arc in range(mcf.num_arcs()):
-                # Can ignore arcs leading out of source or into sink.
-                if mcf.tail(arc) != source and mcf.head(arc) != sink:
-                    if mcf.flow(arc) > 0:
-                        rev = mcf.tail(arc)
-                        pap = mcf.head(arc) - n_rev
-                        assert self.solution[rev, pap] == 0.0
-                        self.solution[rev, pap] = 1.0
+            # Can ignore arcs leading out of source or into sink.
+            reviewer_paper_arcs = len(source_reviewers) + np.arange(
+                np.count_nonzero(selected), dtype=np.int32
+            )
+            used = mcf.flows(reviewer_paper_arcs) > 0
+            rev = revs[selected][used]
+            pap = paps[selected][used]
+            assert np.all(self.solution[rev, pap] == 0.0)
+            self.solution[rev, pap] = 1.0
             self.solved = True
         else:
             raise SolverException(
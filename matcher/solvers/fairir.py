@@ -48,9 +48,12 @@ class FairIR(Basic):
         # TODO: To allow zero score assignment, add small epsilon to all zero valued entries to avoid loss of data
         #     : during sparsification
 
-        conflict_sims = encoder.constraint_matrix.T * (encoder.constraint_matrix <= -1).T ## -1 where constraints are -1, 0 else
-        forced_matrix = (encoder.constraint_matrix >= 1).T ## 1 where constraints are 1, 0 else
-        allowed_sims = encoder.aggregate_score_matrix.transpose() * (encoder.constraint_matrix >= 0).T ## unconstrained sims
+        constraint_matrix = np.asarray(encoder.constraint_matrix)
+        aggregate_score_matrix = np.asarray(encoder.aggregate_score_matrix)
+
+        conflict_sims = constraint_matrix.T * (constraint_matrix <= -1).T ## -1 where constraints are -1, 0 else
+        forced_matrix = (constraint_matrix >= 1).T ## 1 where constraints are 1, 0 else
+        allowed_sims = aggregate_score_matrix.transpose() * (constraint_matrix >= 0).T ## unconstrained sims
         #weights = conflict_sims + allowed_sims ## R x P ## TODO: sparsify weights, build set of sparse tuples? group by paper?
         weights = allowed_sims
 
@@ -113,7 +116,7 @@ class FairIR(Basic):
             # Find reviewers with no non-zero affinity edges after constraints are applied and remove their load_lb
             bad_affinity_reviewers = np.where(
                 np.all(
-                    (encoder.aggregate_score_matrix.T * (encoder.constraint_matrix == 0).T)
+                    (aggregate_score_matrix.T * (constraint_matrix == 0).T)
                     == 0,
                     axis=1,
                 )
@@ -4,6 +4,7 @@ from sortedcontainers import SortedList
 import time
 import uuid
 from .core import SolverException
+from .artifacts import get_artifacts
 import logging
 
 
@@ -58,10 +59,19 @@ class FairSequence(object):
         self.logger = logger
         self.allow_zero_score_assignments = allow_zero_score_assignments
         self.logger.debug("Init FairSequence")
-        self.constraint_matrix = encoder.constraint_matrix.transpose()
-        affinity_matrix = encoder.aggregate_score_matrix.transpose().astype(
-            np.float64
-        )
+        artifacts = get_artifacts(encoder)
+        if artifacts is not None:
+            self.constraint_matrix = artifacts.transposed_constraint_matrix
+            affinity_matrix = artifacts.transposed_affinity_matrix
+        else:
+            self.constraint_matrix = np.asarray(
+                encoder.constraint_matrix
+            ).transpose()
+            affinity_matrix = (
+                np.asarray(encoder.aggregate_score_matrix)
+                .transpose()
+                .astype(np.float64)
+            )
 
         self.maximums = np.array(maximums)
         self.minimums = np.array(minimums)
@@ -78,13 +88,16 @@ class FairSequence(object):
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no non-zero affinity edges after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.affinity_matrix * (self.constraint_matrix == 0))
-                    == 0,
-                    axis=1,
-                )
-            )[0]
+            if artifacts is not None:
+                bad_affinity_reviewers = artifacts.bad_affinity_reviewers
+            else:
+                bad_affinity_reviewers = np.where(
+                    np.all(
+                        (self.affinity_matrix * (self.constraint_matrix == 0))
+                        == 0,
+                        axis=1,
+                    )
+                )[0]
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 "
                 "because they do not have known affinity with any paper".format(
@@ -108,7 +121,10 @@ class FairSequence(object):
                 )
             )
 
-        self.best_revs = np.argsort(-1 * self.affinity_matrix, axis=0)
+        if artifacts is not None and artifacts.best_revs is not None:
+            self.best_revs = artifacts.best_revs
+        else:
+            self.best_revs = np.argsort(-1 * self.affinity_matrix, axis=0)
         self.max_affinity = np.max(self.affinity_matrix)
         self.safe_mode = True
 
@@ -0,0 +1,273 @@
+"""
+Min-cost flow backends for the flow-based solvers.
+
+A backend is a class with the part of the OR-Tools SimpleMinCostFlow
+interface that the solvers use: arcs and node supplies are added with
+array arguments, `solve` returns one of the class's status codes, and the
+solution is read back with `flows` and `optimal_cost`.
+
+Backends, chosen by name with make_min_cost_flow:
+
+    "ortools" (default):
+        OR-Tools' cost-scaling SimpleMinCostFlow.
+
+    "highs":
+        the network flow linear program, solved with the dual simplex method
+        of HiGHS (through scipy.optimize.linprog). The constraint matrix of a
+        flow network is totally unimodular, so the basic solution returned
+        by the simplex method is integral. Transportation networks with unit
+        capacities (a source, arcs of capacity 1 to one side, arcs between
+        the sides, and arcs of capacity 1 from the other side to a sink, with
+        a supply that fills the smaller side) are assignment problems, and
+        are solved with scipy.optimize.linear_sum_assignment instead, which
+        is faster than OR-Tools on them. Other networks are slower to solve
+        than with OR-Tools.
+"""
+
+import numpy as np
+import scipy.optimize
+import scipy.sparse
+from ortools.graph.python import min_cost_flow
+from .core import SolverException
+
+
+class LinearProgramMinCostFlow:
+    """Solves a min-cost flow problem as a linear program with HiGHS."""
+
+    OPTIMAL = min_cost_flow.SimpleMinCostFlow.OPTIMAL
+    INFEASIBLE = min_cost_flow.SimpleMinCostFlow.INFEASIBLE
+    UNBALANCED = min_cost_flow.SimpleMinCostFlow.UNBALANCED
+    BAD_RESULT = min_cost_flow.SimpleMinCostFlow.BAD_RESULT
+
+    def __init__(self):
+        # arcs and supplies are kept in the chunks they are added in, and
+        # concatenated when they are needed
+        self._arc_chunks = []
+        self._arc_arrays = None
+        self._num_arcs = 0
+        self._supply_chunks = []
+        self._flows = None
+        self._optimal_cost = 0
+
+    def add_arcs_with_capacity_and_unit_cost(
+        self, tails, heads, capacities, unit_costs
+    ):
+        chunk = tuple(
+            np.atleast_1d(values).astype(np.int64)
+            for values in [tails, heads, capacities, unit_costs]
+        )
+        self._arc_chunks.append(chunk)
+        self._num_arcs += len(chunk[0])
+        return np.arange(self._num_arcs - len(chunk[0]), self._num_arcs)
+
+    def set_nodes_supplies(self, nodes, supplies):
+        self._supply_chunks.append(
+            (
+                np.atleast_1d(nodes).astype(np.int64),
+                np.atleast_1d(supplies).astype(np.int64),
+            )
+        )
+
+    def set_arc_capacities(self, arcs, capacities):
+        self._arcs()[2][np.atleast_1d(arcs)] = capacities
+
+    def _arcs(self):
+        """return arrays of the tails, heads, capacities and unit costs"""
+        if self._arc_chunks:
+            chunks = self._arc_chunks
+            if self._arc_arrays is not None:
+                chunks = [self._arc_arrays] + chunks
+            self._arc_arrays = tuple(
+                np.concatenate(column) for column in zip(*chunks)
+            )
+            self._arc_chunks = []
+        if self._arc_arrays is None:
+            self._arc_arrays = tuple(
+                np.zeros(0, dtype=np.int64) for _ in range(4)
+            )
+        return self._arc_arrays
+
+    def _supplies(self, num_nodes):
+        """return the supply of each node; the last one set for it counts"""
+        supplies = np.zeros(num_nodes, dtype=np.int64)
+        for nodes, values in self._supply_chunks:
+            supplies[nodes] = values
+        return supplies
+
+    def num_arcs(self):
+        return self._num_arcs
+
+    def num_nodes(self):
+        tails, heads, _, _ = self._arcs()
+        return 1 + max(
+            [-1]
+            + [int(nodes.max()) for nodes in [tails, heads] if len(nodes)]
+            + [int(nodes.max()) for nodes, _ in self._supply_chunks if len(nodes)]
+        )
+
+    def solve(self):
+        self._flows = None
+        self._optimal_cost = 0
+        tails, heads, capacities, unit_costs = self._arcs()
+        supplies = self._supplies(self.num_nodes())
+        if supplies.sum() != 0:
+            return self.UNBALANCED
+
+        if not supplies.any() and np.all(tails < heads):
+            # the graph has no cycles, so nothing can flow
+            self._flows = np.zeros(len(tails), dtype=np.int64)
+            return self.OPTIMAL
+        if len(tails) == 0:
+            return self.INFEASIBLE
+
+        assignment = self._solve_assignment(supplies)
+        if assignment is not None:
+            status, self._flows = assignment
+        else:
+            status, self._flows = self._solve_linear_program(supplies)
+        if status == self.OPTIMAL:
+            self._optimal_cost = int(np.dot(self._flows, unit_costs))
+        return status
+
+    def _solve_linear_program(self, supplies):
+        """return the status and the arc flows of the flow linear program"""
+        tails, heads, capacities, unit_costs = self._arcs()
+        num_arcs = len(tails)
+        # flow out of a node minus flow into it equals its supply: the
+        # column of an arc holds +1 at its tail and -1 at its head
+        incidence_matrix = scipy.sparse.csc_matrix(
+            (
+                np.tile([1.0, -1.0], num_arcs),
+                np.column_stack([tails, heads]).ravel(),
+                np.arange(0, 2 * num_arcs + 1, 2),
+            ),
+            shape=(len(supplies), num_arcs),
+        )
+        result = scipy.optimize.linprog(
+            unit_costs.astype(float),
+            A_eq=incidence_matrix,
+            b_eq=supplies.astype(float),
+            bounds=np.column_stack(
+                [np.zeros(num_arcs), capacities.astype(float)]
+            ),
+            method="highs-ds",
+        )
+        if result.status == 2:
+            return self.INFEASIBLE, None
+        if result.status != 0:
+            return self.BAD_RESULT, None
+        return self.OPTIMAL, np.rint(result.x).astype(np.int64)
+
+    def _solve_assignment(self, supplies):
+        """
+        Solve a transportation network with unit capacities, in which the
+        supply fills the smaller side, with linear_sum_assignment.
+
+        return the status and the arc flows, or None if the network does not
+        have that structure
+        """
+        tails, heads, capacities, unit_costs = self._arcs()
+        sources = np.flatnonzero(supplies > 0)
+        sinks = np.flatnonzero(supplies < 0)
+        if np.any(capacities > 1) or len(sources) != 1 or len(sinks) != 1:
+            return None
+        source, sink = sources[0], sinks[0]
+
+        usable = np.flatnonzero(capacities > 0)
+        from_source = tails[usable] == source
+        to_sink = heads[usable] == sink
+        if np.any(from_source & to_sink):
+            return None
+        source_arcs = usable[from_source]
+        sink_arcs = usable[to_sink]
+        middle_arcs = usable[~from_source & ~to_sink]
+
+        # the rows are the heads of the source arcs, the columns the tails
+        # of the sink arcs, each with one arc
+        rows, columns = heads[source_arcs], tails[sink_arcs]
+        if (
+            len(np.unique(rows)) != len(rows)
+            or len(np.unique(columns)) != len(columns)
+            or supplies[source] != min(len(rows), len(columns))
+        ):
+            return None
+        row_of_node = np.full(len(supplies), -1)
+        row_of_node[rows] = np.arange(len(rows))
+        column_of_node = np.full(len(supplies), -1)
+        column_of_node[columns] = np.arange(len(columns))
+        middle_rows = row_of_node[tails[middle_arcs]]
+        middle_columns = column_of_node[heads[middle_arcs]]
+        if np.any(middle_rows < 0) or np.any(middle_columns < 0):
+            return None
+        if np.any(row_of_node[columns] >= 0):
+            return None
+        keys = middle_rows * len(columns) + middle_columns
+        order = np.argsort(keys, kind="stable")
+        if np.any(np.diff(keys[order]) == 0):
+            return None
+
+        cost_matrix = np.full((len(rows), len(columns)), np.inf)
+        cost_matrix[middle_rows, middle_columns] = (
+            unit_costs[middle_arcs]
+            + unit_costs[source_arcs][middle_rows]
+            + unit_costs[sink_arcs][middle_columns]
+        )
+        try:
+            matched_rows, matched_columns = (
+                scipy.optimize.linear_sum_assignment(cost_matrix)
+            )
+        except ValueError:
+            # no assignment fills the smaller side
+            return self.INFEASIBLE, None
+
+        matched_arcs = middle_arcs[
+            order[
+                np.searchsorted(
+                    keys[order],
+                    matched_rows * len(columns) + matched_columns,
+                )
+            ]
+        ]
+        flows = np.zeros(len(tails), dtype=np.int64)
+        flows[matched_arcs] = 1
+        flows[source_arcs[matched_rows]] = 1
+        flows[sink_arcs[matched_columns]] = 1
+        return self.OPTIMAL, flows
+
+    def optimal_cost(self):
+        return self._optimal_cost
+
+    def flows(self, arcs):
+        return self._flows[arcs]
+
+    def flow(self, arc):
+        return int(self._flows[arc])
+
+    def tail(self, arc):
+        return int(self._arcs()[0][arc])
+
+    def head(self, arc):
+        return int(self._arcs()[1][arc])
+
+    def capacity(self, arc):
+        return int(self._arcs()[2][arc])
+
+    def unit_cost(self, arc):
+        return int(self._arcs()[3][arc])
+
+
+FLOW_BACKENDS = {
+    "ortools": min_cost_flow.SimpleMinCostFlow,
+    "highs": LinearProgramMinCostFlow,
+}
+
+
+def make_min_cost_flow(backend="ortools"):
+    """return a new, empty min-cost flow solver of the named backend"""
+    if backend not in FLOW_BACKENDS:
+        raise SolverException(
+            "Unknown min-cost flow backend {}, choose from {}".format(
+                backend, list(FLOW_BACKENDS)
+            )
+        )
+    return FLOW_BACKENDS[backend]()
@@ -3,6 +3,7 @@ A paper-reviewer assignment solver that ensures a minimum paper load per reviewe
 
 First calls an iteration of SimpleSolver with minimum reviewer loads,
 then calls a second iteration, accounting for the results from the first iteration.
+The second iteration reuses the graph of the first (see SimpleSolver.set_residual).
 
 Arguments are the same as SimpleSolver,
 except that the "num_reviews" argument is replaced by "minimums" and "maximums".
@@ -12,11 +13,24 @@ except that the "num_reviews" argument is replaced by "minimums" and "maximums".
         integer representing the minimum/maximum number of reviews a reviewer
         should be assigned.
 
+    "candidate_limit", "flow_backend" & "coarse_cost_scale":
+        passed on to SimpleSolver.
+
+    "cost_scale":
+        None (default), an integer passed on to SimpleSolver, or "auto" to
+        choose the smallest scale with a rank-order loss of at most
+        "max_rank_order_loss" (default 0.01, see quantization). Unless it is
+        None, the rank-order loss of the scale is logged and kept in
+        `rank_order_loss`.
+
 """
 import numpy as np
 import logging
 from .simple_solver import SimpleSolver
+from .quantization import choose_cost_scale, rank_order_loss
+from .artifacts import bad_affinity_reviewers, get_artifacts
 from .core import SolverException
+from ..sparse_matrix import DefaultSparseMatrix
 import time
 
 
@@ -32,11 +46,23 @@ class MinMaxSolver:
         allow_zero_score_assignments=False,
         logger=logging.getLogger(__name__),
         limit_matrix=None,
+        candidate_limit=None,
+        flow_backend="ortools",
+        cost_scale=None,
+        coarse_cost_scale=None,
+        max_rank_order_loss=0.01,
     ):
 
         self.minimums = minimums
         self.maximums = maximums
         self.demands = demands
+        self.candidate_limit = candidate_limit
+        self.flow_backend = flow_backend
+        self.cost_scale = cost_scale
+        self.coarse_cost_scale = coarse_cost_scale
+        self.max_rank_order_loss = max_rank_order_loss
+        self.rank_order_loss = None
+        self.artifacts = get_artifacts(encoder)
         self.cost_matrix = encoder.cost_matrix
         self.allow_zero_score_assignments = allow_zero_score_assignments
         if limit_matrix is None:
@@ -53,12 +79,7 @@ class MinMaxSolver:
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no known cost edges (non-zero) after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.cost_matrix * (self.constraint_matrix == 0)) == 0,
-                    axis=0,
-                )
-            )[0]
+            bad_affinity_reviewers = self._bad_affinity_reviewers()
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 because "
                 "they do not have known affinity with any paper".format(
@@ -74,6 +95,63 @@ class MinMaxSolver:
         self.cost = None
         self.logger = logger
 
+    def _bad_affinity_reviewers(self):
+        """Return the indices of reviewers with no non-zero, unconstrained cost."""
+        if self.artifacts is not None:
+            return self.artifacts.bad_affinity_reviewers
+
+        return bad_affinity_reviewers(self.cost_matrix, self.constraint_matrix)
+
+    def _paper_costs(self):
+        """
+        Return the paper indices and costs of the unconstrained pairs that
+        SimpleSolver turns into edges.
+        """
+        if (
+            isinstance(self.cost_matrix, DefaultSparseMatrix)
+            and self.cost_matrix.default == 0
+            and not self.allow_zero_score_assignments
+        ):
+            paper_indices, reviewer_indices, costs = self.cost_matrix.coo()
+            if isinstance(self.constraint_matrix, DefaultSparseMatrix):
+                constraints = self.constraint_matrix.values_at(
+                    paper_indices, reviewer_indices
+                )
+            else:
+                constraints = self.constraint_matrix[
+                    paper_indices, reviewer_indices
+                ]
+            unconstrained = constraints == 0
+            return paper_indices[unconstrained], costs[unconstrained]
+
+        cost_matrix = np.asarray(self.cost_matrix)
+        unconstrained = np.asarray(self.constraint_matrix) == 0
+        if not self.allow_zero_score_assignments:
+            unconstrained &= cost_matrix.astype(np.int64) != 0
+        paper_indices, _ = np.nonzero(unconstrained)
+        return paper_indices, cost_matrix[unconstrained]
+
+    def _quantize(self):
+        """Choose the cost scale if needed, and log its rank-order loss."""
+        if self.cost_scale is None:
+            return 1
+
+        paper_indices, costs = self._paper_costs()
+        if self.cost_scale == "auto":
+            cost_scale, loss = choose_cost_scale(
+                paper_indices, costs, self.max_rank_order_loss
+            )
+        else:
+            cost_scale = self.cost_scale
+            loss = rank_order_loss(paper_indices, costs, cost_scale)
+        self.rank_order_loss = loss
+        self.logger.debug(
+            "Using cost scale {}, with a rank-order loss of {:.4f}".format(
+                cost_scale, loss
+            )
+        )
+        return cost_scale
+
     def _validate_input_range(self):
         """Validate if demand is in the range of min supply and max supply"""
         self.logger.debug("Checking if demand is in range")
@@ -100,10 +178,11 @@ class MinMaxSolver:
     def solve(self):
         """Computes combined solution of two SimpleSolvers"""
         self._validate_input_range()
+        cost_scale = self._quantize()
 
         start_time = time.time()
         self.logger.debug("Min Solver started at={}".format(start_time))
-        minimum_solver = SimpleSolver(
+        solver = SimpleSolver(
             self.minimums,
             self.demands,
             self.cost_matrix,
@@ -112,8 +191,14 @@ class MinMaxSolver:
             logger=self.logger,
             strict=False,
             limit_matrix=self.limit_matrix,
+            candidate_limit=self.candidate_limit,
+            flow_backend=self.flow_backend,
+            cost_scale=cost_scale,
+            coarse_cost_scale=self.coarse_cost_scale,
         )  # strict=False prevents errors from being thrown for supply/demand mismatch
-        minimum_result = minimum_solver.solve()
+        minimum_result = solver.solve()
+        minimum_solved = solver.solved
+        minimum_optimal_cost = solver.min_cost_flow.optimal_cost()
         stop_time = time.time()
         self.logger.debug(
             "Min Solver finished at {} and took {} seconds".format(
@@ -121,28 +206,16 @@ class MinMaxSolver:
             )
         )
 
-        adjusted_constraints = self.constraint_matrix
-        adjusted_limits = self.limit_matrix - minimum_solver.flow_matrix
-        adjusted_maximums = self.maximums - np.sum(
-            minimum_solver.flow_matrix, axis=0
-        )
-        adjusted_demands = self.demands - np.sum(
-            minimum_solver.flow_matrix, axis=1
-        )
+        adjusted_maximums = self.maximums - np.sum(minimum_result, axis=0)
+        adjusted_demands = self.demands - np.sum(minimum_result, axis=1)
 
         start_time = time.time()
         self.logger.debug("Max Solver started at={}".format(start_time))
-        maximum_solver = SimpleSolver(
-            adjusted_maximums,
-            adjusted_demands,
-            self.cost_matrix,
-            adjusted_constraints,
-            allow_zero_score_assignments=self.allow_zero_score_assignments,
-            logger=self.logger,
-            limit_matrix=adjusted_limits,
-        )
+        # the second phase reuses the graph of the first one, with the
+        # assigned flow removed from the edge capacities
+        solver.set_residual(adjusted_maximums, adjusted_demands)
 
-        maximum_result = maximum_solver.solve()
+        maximum_result = solver.solve()
         stop_time = time.time()
         self.logger.debug(
             "Max Solver finished at {} and took {} seconds".format(
@@ -150,14 +223,20 @@ class MinMaxSolver:
             )
         )
 
-        self.solved = minimum_solver.solved and maximum_solver.solved
+        self.solved = minimum_solved and solver.solved
 
         self.optimal_cost = (
-            minimum_solver.min_cost_flow.optimal_cost()
-            + maximum_solver.min_cost_flow.optimal_cost()
+            minimum_optimal_cost + solver.min_cost_flow.optimal_cost()
         )
 
         self.flow_matrix = minimum_result + maximum_result
-        self.cost = np.sum(self.flow_matrix * self.cost_matrix)
+        if isinstance(self.cost_matrix, DefaultSparseMatrix):
+            paper_indices, reviewer_indices = np.nonzero(self.flow_matrix)
+            self.cost = np.sum(
+                self.flow_matrix[paper_indices, reviewer_indices]
+                * self.cost_matrix.values_at(paper_indices, reviewer_indices)
+            )
+        else:
+            self.cost = np.sum(self.flow_matrix * self.cost_matrix)
 
         return self.flow_matrix
@@ -11,9 +11,8 @@ a sampling program written in C.
 import logging
 import numpy as np
 import gurobipy as gp
-from cffi import FFI
 from .core import SolverException
-from .bvn_extension import run_bvn
+from .bvn_extension import sample_bvn_sparse, sample_bvn_batch
 from .minmax_solver import MinMaxSolver
 
 class PerturbedMaximizationSolver:
@@ -41,9 +40,10 @@ class PerturbedMaximizationSolver:
         self.minimums = minimums
         self.maximums = maximums
         self.demands = demands
-        self.cost_matrix = encoder.cost_matrix
-        self.constraint_matrix = encoder.constraint_matrix
-        self.prob_limit_matrix = encoder.prob_limit_matrix
+        self.cost_matrix = np.asarray(encoder.cost_matrix)
+        # copied, since conflicts are added to it below
+        self.constraint_matrix = np.array(encoder.constraint_matrix)
+        self.prob_limit_matrix = np.asarray(encoder.prob_limit_matrix)
         self.perturbation = encoder.perturbation
         self.bad_match_thresholds = encoder.bad_match_thresholds
 
@@ -354,9 +354,54 @@ class PerturbedMaximizationSolver:
 
         self.logger.debug("[PerturbedMaximization]: Finished checking inputs")
 
-    def sample_assignment(self):
+    def _rounded_entries(self):
+        """
+        Round the fractional assignment matrix to integers to a certain precision
+        in order to use the sampling program in C. See also the RandomizedSolver.
+
+        Return the paper and reviewer indices and the rounded values of the
+        nonzero entries.
+        """
+        self.precision = 1000000
+        self.rounded_assignment_matrix = np.round(
+            np.asarray(self.fractional_assignment_matrix) * self.precision
+        ).astype(int)
+        paper_indices, reviewer_indices = np.nonzero(
+            self.rounded_assignment_matrix
+        )
+        flows = self.rounded_assignment_matrix[paper_indices, reviewer_indices]
+        return paper_indices, reviewer_indices, flows
+
+    def sample_assignments(self, num_samples, seeds=None, threads=None):
+        """
+        Sample `num_samples` independent assignments from the fractional
+        assignment matrix, with one seed per sample in `seeds`. The samples
+        are drawn by `threads` threads (by default, one per CPU).
+
+        Return an array (samples x pairs x 2) of the paper and reviewer
+        indices of the assigned pairs of each sample.
+        """
+        if not self.solved:
+            self.logger.debug(
+                "[PerturbedMaximization]: ERROR: Fractional solver not solved yet"
+            )
+            raise SolverException("Fractional solver not solved yet")
+
+        pairs, _ = sample_bvn_batch(
+            *self._rounded_entries(),
+            self.num_paps,
+            self.num_revs,
+            self.precision,
+            num_samples,
+            seeds=seeds,
+            threads=threads,
+        )
+        return pairs
+
+    def sample_assignment(self, seed=None):
         """
         Sample an assignment from the fractional assignment matrix.
+        `seed` makes the sample reproducible.
         """
 
         self.logger.debug("[PerturbedMaximization]: Sampling assignment ...")
@@ -368,34 +413,20 @@ class PerturbedMaximizationSolver:
             )
             raise SolverException("Fractional solver not solved yet")
     
-        # Round the fractional assignment matrix to integers to a certain precision
-        # in order to use the sampling program in C. See also the RandomizedSolver.
-        self.precision = 1000000
-        self.rounded_assignment_matrix = np.zeros(
-            (self.num_paps, self.num_revs), dtype=int
+        # Use the sampling extension in C on the nonzero entries
+        assigned = sample_bvn_sparse(
+            *self._rounded_entries(),
+            self.num_paps,
+            self.num_revs,
+            self.precision,
+            seed=seed,
         )
-        for i in range(self.num_paps):
-            for j in range(self.num_revs):
-                self.rounded_assignment_matrix[i][j] = np.round(
-                    self.fractional_assignment_matrix[i][j] * self.precision
-                )
-
-        # Construct CFFI interface to use the sampling extension in C
-        ffi = FFI()
-        F = self.rounded_assignment_matrix.flatten()
-        Fbuf = ffi.new("int[]", self.num_paps * self.num_revs)
-        for i in range(F.size):
-            Fbuf[i] = F[i]
-        Sbuf = ffi.new("int[]", self.num_revs)
-        for i in range(self.num_revs):
-            Sbuf[i] = 1
-        run_bvn(Fbuf, Sbuf, self.num_paps, self.num_revs, self.precision)
 
         # Obtain the sampled assignment matrix and compute properties
-        self.sampled_assignment_matrix = np.zeros((self.num_paps, self.num_revs))
-        for i in range(F.size):
-            coords = np.unravel_index(i, (self.num_paps, self.num_revs))
-            self.sampled_assignment_matrix[coords] = Fbuf[i]
+        self.sampled_assignment_matrix = np.zeros(
+            (self.num_paps, self.num_revs)
+        )
+        self.sampled_assignment_matrix[assigned] = 1
         self.sampled_assignment_cost = self._compute_expected_cost(self.sampled_assignment_matrix)
         sampled_cost_ratio = 1.0
         if self.deterministic_assignment_cost != 0:
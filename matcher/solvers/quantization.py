@@ -0,0 +1,70 @@
+"""
+Cost quantization for the flow-based solvers.
+
+The min-cost flow solvers need integer costs, so SimpleSolver multiplies the
+costs of the reviewer-paper edges by a `cost_scale` and truncates them. A
+small scale merges affinities that differ only in their last digits into
+the same cost. Cost-scaling flow algorithms take longer as the costs grow
+(their running time depends on log(C)), so a large scale costs time.
+
+The rank-order loss of a scale measures how much precision is lost: it is
+the fraction of edges whose integer cost ties with another edge of the same
+paper that has a different cost before quantization.
+"""
+
+import numpy as np
+
+# the scales choose_cost_scale tries, from coarse to fine
+COST_SCALES = (1, 10, 100, 1000, 10000)
+
+
+def quantize_costs(costs, cost_scale=1):
+    """return the costs multiplied by `cost_scale` and truncated to integers"""
+    costs = np.asarray(costs)
+    if cost_scale != 1:
+        costs = costs * cost_scale
+    return costs.astype(np.int64)
+
+
+def rank_order_loss(paper_indices, costs, cost_scale=1):
+    """
+    return the fraction of the given edges whose quantized cost ties with
+    another edge of the same paper, which has a different (unquantized) cost.
+    """
+    if len(costs) == 0:
+        return 0.0
+    order = np.lexsort((costs, paper_indices))
+    papers = np.asarray(paper_indices)[order]
+    costs = np.asarray(costs)[order]
+    quantized = quantize_costs(costs, cost_scale)
+
+    # neighbouring edges of the same paper that became tied
+    merged = (
+        (papers[1:] == papers[:-1])
+        & (quantized[1:] == quantized[:-1])
+        & (costs[1:] != costs[:-1])
+    )
+    # a run of equal costs is merged as a whole
+    run_starts = np.concatenate(
+        [[True], (papers[1:] != papers[:-1]) | (costs[1:] != costs[:-1])]
+    )
+    run_ids = np.cumsum(run_starts) - 1
+    lost_runs = np.zeros(run_ids[-1] + 1, dtype=bool)
+    lost_runs[run_ids[1:][merged]] = True
+    lost_runs[run_ids[:-1][merged]] = True
+    return np.count_nonzero(lost_runs[run_ids]) / len(costs)
+
+
+def choose_cost_scale(
+    paper_indices, costs, max_rank_order_loss=0.01, cost_scales=COST_SCALES
+):
+    """
+    return the smallest of `cost_scales` whose rank-order loss on the given
+    edges is at most `max_rank_order_loss` (or the largest, if none is), and
+    its rank-order loss.
+    """
+    for cost_scale in cost_scales:
+        loss = rank_order_loss(paper_indices, costs, cost_scale)
+        if loss <= max_rank_order_loss:
+            break
+    return cost_scale, loss
@@ -14,9 +14,8 @@ are maintained even if all alternates are used.
 
 from .minmax_solver import MinMaxSolver
 from .core import SolverException
-from .bvn_extension import run_bvn
+from .bvn_extension import sample_bvn_sparse, sample_bvn_batch
 from ortools.linear_solver import pywraplp
-from cffi import FFI
 import logging
 import numpy as np
 from itertools import product
@@ -31,14 +30,16 @@ class RandomizedSolver:
         encoder,
         allow_zero_score_assignments=False,
         logger=logging.getLogger(__name__),
+        flow_backend="ortools",
     ):
         self.minimums = minimums
         self.maximums = maximums
         self.demands = demands
-        self.cost_matrix = encoder.cost_matrix
+        self.cost_matrix = np.asarray(encoder.cost_matrix)
         self.num_paps, self.num_revs = self.cost_matrix.shape
         self.allow_zero_score_assignments = allow_zero_score_assignments
         self.logger = logger
+        self.flow_backend = flow_backend
         self.encoder = (
             encoder  # for passing cost and constraint matrices to MinMaxSolver
         )
@@ -46,9 +47,9 @@ class RandomizedSolver:
         if not self.cost_matrix.any():
             self.cost_matrix = np.random.rand(*encoder.cost_matrix.shape)
 
-        self.constraint_matrix = encoder.constraint_matrix
+        self.constraint_matrix = np.asarray(encoder.constraint_matrix)
 
-        self.prob_limit_matrix = encoder.prob_limit_matrix
+        self.prob_limit_matrix = np.asarray(encoder.prob_limit_matrix)
 
         if not self.allow_zero_score_assignments:
             bad_affinity_reviewers = np.where(
@@ -185,6 +186,7 @@ class RandomizedSolver:
             self.allow_zero_score_assignments,
             self.logger,
             scaled_limits,
+            flow_backend=self.flow_backend,
         )
 
         self.logger.debug("Finished construct_solver")
@@ -263,30 +265,64 @@ class RandomizedSolver:
 
         return self.flow_matrix
 
-    def sample_assignment(self):
-        """Sample a deterministic assignment from the fractional assignment"""
-        self.logger.debug("sample_assignment")
+    def _fractional_entries(self):
+        """
+        return the paper and reviewer indices and the integer flows of the
+        nonzero entries of the fractional assignment, which is what the
+        sampling extension in C takes
+        """
+        paper_indices, reviewer_indices = np.nonzero(
+            self.integer_fractional_assignment_matrix
+        )
+        flows = self.integer_fractional_assignment_matrix[
+            paper_indices, reviewer_indices
+        ]
+        return paper_indices, reviewer_indices, flows
 
+    def sample_assignments(self, num_samples, seeds=None, threads=None):
+        """
+        Sample `num_samples` independent deterministic assignments from the
+        fractional assignment, with one seed per sample in `seeds`. The
+        samples are drawn by `threads` threads (by default, one per CPU).
+
+        return an array (samples x pairs x 2) of the paper and reviewer
+        indices of the assigned pairs of each sample
+        """
         assert (
             self.solved
         ), "Solver not solved. Run self.solve() before sampling."
 
-        # construct CFFI interface to the sampling extension in C
-        ffi = FFI()
-        F = self.integer_fractional_assignment_matrix.flatten()
-        Fbuf = ffi.new("int[]", self.num_paps * self.num_revs)
-        for i in range(F.size):
-            Fbuf[i] = F[i]
-        Sbuf = ffi.new("int[]", self.num_revs)
-        for i in range(self.num_revs):
-            Sbuf[i] = 1
+        pairs, _ = sample_bvn_batch(
+            *self._fractional_entries(),
+            self.num_paps,
+            self.num_revs,
+            self.one,
+            num_samples,
+            seeds=seeds,
+            threads=threads,
+        )
+        return pairs
+
+    def sample_assignment(self, seed=None):
+        """
+        Sample a deterministic assignment from the fractional assignment.
+        `seed` makes the sample reproducible.
+        """
+        self.logger.debug("sample_assignment")
 
-        run_bvn(Fbuf, Sbuf, self.num_paps, self.num_revs, self.one)
+        assert (
+            self.solved
+        ), "Solver not solved. Run self.solve() before sampling."
 
+        assigned = sample_bvn_sparse(
+            *self._fractional_entries(),
+            self.num_paps,
+            self.num_revs,
+            self.one,
+            seed=seed,
+        )
         self.flow_matrix = np.zeros((self.num_paps, self.num_revs))
-        for i in range(F.size):
-            coords = np.unravel_index(i, (self.num_paps, self.num_revs))
-            self.flow_matrix[coords] = Fbuf[i]
+        self.flow_matrix[assigned] = 1
 
         self.cost = np.sum(self.flow_matrix * self.cost_matrix)
 
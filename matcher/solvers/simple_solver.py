@@ -14,11 +14,11 @@ SimpleSolver is initialized with the following arguments:
         reviews the paper should be assigned.
 
     "cost_matrix":
-        a #reviewers by #papers numpy array representing the cost of
-        each reviewer-paper combination.
+        a #reviewers by #papers numpy array (or DefaultSparseMatrix) representing
+        the cost of each reviewer-paper combination.
 
     "constraint_matrix":
-        a #reviewers by #papers numpy array representing
+        a #reviewers by #papers numpy array (or DefaultSparseMatrix) representing
         constraints on the match. Each cell can take a value of -1, 0, or 1:
 
         0: no constraint
@@ -37,6 +37,30 @@ SimpleSolver is initialized with the following arguments:
         a #papers by #reviewers numpy array representing the limit on the flow
         between that reviewer and paper (usually 1)
 
+    "candidate_limit":
+        None (default) or an integer. If set, only each paper's
+        `candidate_limit` cheapest edges (and each reviewer's cheapest edges,
+        as many as its number of reviews) are added to the graph. The limit
+        is doubled until the pruned graph has a solution.
+
+    "flow_backend":
+        the name of the min-cost flow implementation, "ortools" (default) or
+        "highs" (see flow_backends).
+
+    "cost_scale":
+        1 (default) or a larger integer. Edge costs are multiplied by this
+        before they are truncated to integers (see quantization). Unless
+        zero scores are allowed, the pairs whose cost truncates to 0 are left
+        out, so a larger scale keeps the pairs with smaller scores.
+
+    "coarse_cost_scale" & "tie_margin":
+        None (default), or a divisor of "cost_scale". If set, the problem is
+        first solved with edge costs at the coarse scale; then it is solved
+        again at "cost_scale", with only the edges that are nearly tied with
+        the coarse solution: the assigned edges, and the edges that cost at
+        most `tie_margin` (default 1) coarse units more than the most
+        expensive edge assigned to their paper or to their reviewer.
+
 
 Node is a namedtuple that is used to represent nodes in the graph:
 
@@ -60,8 +84,11 @@ from __future__ import print_function, division
 from collections import namedtuple
 import logging
 import numpy as np
-from ortools.graph.python import min_cost_flow
 from .core import SolverException
+from .flow_backends import make_min_cost_flow
+from .candidates import select_candidates
+from .quantization import quantize_costs
+from ..sparse_matrix import DefaultSparseMatrix
 
 Node = namedtuple("Node", ["number", "index", "supply"])
 
@@ -79,6 +106,11 @@ class SimpleSolver:
         logger=logging.getLogger(__name__),
         strict=True,
         limit_matrix=None,
+        candidate_limit=None,
+        flow_backend="ortools",
+        cost_scale=1,
+        coarse_cost_scale=None,
+        tie_margin=1,
     ):
 
         self.logger = logger
@@ -91,6 +123,11 @@ class SimpleSolver:
         self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
         self.num_reviews = num_reviews
         self.demands = demands
+        self.candidate_limit = candidate_limit
+        self.flow_backend = flow_backend
+        self.cost_scale = cost_scale
+        self.coarse_cost_scale = coarse_cost_scale
+        self.tie_margin = tie_margin
         self.num_papers = np.size(cost_matrix, axis=0)
         self.num_reviewers = np.size(cost_matrix, axis=1)
         self.current_offset = 0
@@ -99,10 +136,6 @@ class SimpleSolver:
 
         self._check_inputs(strict)
 
-        self.start_nodes = []
-        self.end_nodes = []
-        self.capacities = []
-        self.costs = []
         self.node_by_number = {}
 
         total_supply = min(sum(self.num_reviews), sum(self.demands))
@@ -126,44 +159,263 @@ class SimpleSolver:
 
         # -- Add Edges --
 
-        # connect the source node to all reviewer nodes.
-        for r_node in self.reviewer_nodes:
-            capacity = self.num_reviews[r_node.index]
-            self.add_edge(self.source_node, r_node, capacity, cost=0)
-
-        for r_node in self.reviewer_nodes:
-            for p_node in self.paper_nodes:
-
-                coordinates = (p_node.index, r_node.index)
-                arc_cost = int(self.cost_matrix[coordinates])
-                arc_constraint = self.constraint_matrix[coordinates]
-
-                # a constraint of 0 means there's no constraint, so apply the cost as normal
-                # a constraint of 1 means that this user was explicitly assigned to this paper
-                # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
-                if arc_constraint == 0 and (
-                    self.allow_zero_score_assignments or arc_cost != 0
-                ):
-                    self.add_edge(
-                        r_node, p_node, limit_matrix[coordinates], arc_cost
-                    )
-                elif arc_constraint == 1:
-                    # TODO: this should be handled as a hard constraint
-                    arc_cost = self._least_cost() - 1
-                    self.add_edge(
-                        r_node,
-                        p_node,
-                        limit_matrix[coordinates],
-                        int(arc_cost),
-                    )
-
-        # connect paper nodes to the sink node.
-        for p_node in self.paper_nodes:
-            capacity = self.demands[p_node.index]
-            self.add_edge(p_node, self.sink_node, capacity, cost=0)
+        if self._has_sparse_candidates():
+            (
+                paper_indices,
+                reviewer_indices,
+                arc_costs,
+            ) = self._sparse_reviewer_paper_arcs()
+        else:
+            (
+                paper_indices,
+                reviewer_indices,
+                arc_costs,
+            ) = self._reviewer_paper_arcs()
+        arc_capacities = self._arc_capacities(
+            limit_matrix, paper_indices, reviewer_indices
+        )
+        self.reviewer_paper_arcs = (
+            paper_indices,
+            reviewer_indices,
+            arc_capacities,
+            arc_costs,
+        )
 
+        self._add_edges(coarse=self.coarse_cost_scale is not None)
         self.construct_solver()
 
+    def _add_edges(self, coarse=False, selected=None):
+        """
+        Represent the edges by the aligned arrays `start_nodes`, `end_nodes`,
+        `capacities` and `costs`, in the order in which they are added to the
+        OR-Tools solver: source to reviewers, reviewers to papers
+        (reviewer-major), then papers to sink.
+
+        If `coarse`, the reviewer-paper edges get their costs at the coarse
+        cost scale. If `selected` (a mask over reviewer_paper_arcs) is given,
+        only those edges are added, and if `candidate_limit` is set, only
+        the reviewer-paper edges selected by select_candidates are added.
+        The arguments are kept in `edge_options`, to add the edges again when
+        the candidate limit is widened.
+        """
+        self.edge_options = {"coarse": coarse, "selected": selected}
+        (
+            paper_indices,
+            reviewer_indices,
+            arc_capacities,
+            arc_costs,
+        ) = self.reviewer_paper_arcs
+        if coarse:
+            arc_costs = self._coarse_arc_costs(arc_costs)
+        if selected is not None:
+            paper_indices = paper_indices[selected]
+            reviewer_indices = reviewer_indices[selected]
+            arc_capacities = arc_capacities[selected]
+            arc_costs = arc_costs[selected]
+        self.pruned = False
+        if self.candidate_limit is not None:
+            # edges without capacity are kept, but don't count as candidates
+            usable = arc_capacities > 0
+            selected = ~usable
+            selected[usable] = select_candidates(
+                paper_indices[usable],
+                reviewer_indices[usable],
+                arc_costs[usable],
+                self.candidate_limit,
+                self.demands,
+                self.num_reviews,
+            )
+            self.pruned = not selected.all()
+            self.logger.debug(
+                "Keeping {} of {} reviewer-paper edges with a candidate limit of {}".format(
+                    np.count_nonzero(selected),
+                    len(selected),
+                    self.candidate_limit,
+                )
+            )
+            paper_indices = paper_indices[selected]
+            reviewer_indices = reviewer_indices[selected]
+            arc_capacities = arc_capacities[selected]
+            arc_costs = arc_costs[selected]
+
+        # the matrix coordinates of the reviewer-paper edges, used to read the flows back
+        self.arc_paper_indices = paper_indices
+        self.arc_reviewer_indices = reviewer_indices
+
+        self.start_nodes = np.concatenate(
+            [
+                np.full(self.num_reviewers, self.source_node.number),
+                self._reviewer_numbers(reviewer_indices),
+                self._paper_numbers(np.arange(self.num_papers)),
+            ]
+        ).astype(np.int32)
+        self.end_nodes = np.concatenate(
+            [
+                self._reviewer_numbers(np.arange(self.num_reviewers)),
+                self._paper_numbers(paper_indices),
+                np.full(self.num_papers, self.sink_node.number),
+            ]
+        ).astype(np.int32)
+        self.capacities = np.concatenate(
+            [
+                np.asarray(self.num_reviews, dtype=np.int64),
+                arc_capacities,
+                np.asarray(self.demands, dtype=np.int64),
+            ]
+        )
+        self.costs = np.concatenate(
+            [
+                np.zeros(self.num_reviewers, dtype=np.int64),
+                arc_costs,
+                np.zeros(self.num_papers, dtype=np.int64),
+            ]
+        )
+
+    def _reviewer_numbers(self, reviewer_indices):
+        """return the Node numbers of the reviewers at `reviewer_indices`"""
+        return self.source_node.number + 1 + reviewer_indices
+
+    def _paper_numbers(self, paper_indices):
+        """return the Node numbers of the papers at `paper_indices`"""
+        return self.source_node.number + 1 + self.num_reviewers + paper_indices
+
+    def _arc_mask(self, arc_costs, arc_constraints):
+        """
+        Select the reviewer-paper pairs that become edges.
+
+        A constraint of 0 means there's no constraint, so apply the cost as normal.
+        A constraint of 1 means that this user was explicitly assigned to this paper.
+        A constraint of anything other that 0 or 1 essentially indicates a
+        conflict, so do not add an arc.
+
+        Unless zero scores are allowed, pairs whose cost quantizes to 0 at
+        the cost scale are not added either.
+        """
+        unconstrained = arc_constraints == 0
+        if not self.allow_zero_score_assignments:
+            # the same as quantize_costs(costs, cost_scale) != 0, without an
+            # integer copy of the costs
+            if self.cost_scale != 1:
+                arc_costs = arc_costs * self.cost_scale
+            unconstrained &= (arc_costs >= 1) | (arc_costs <= -1)
+        return unconstrained | (arc_constraints == 1)
+
+    def _arc_costs(self, arc_costs, arc_constraints):
+        """return the integer costs of the selected edges"""
+        arc_costs = quantize_costs(arc_costs, self.cost_scale)
+        forced = arc_constraints == 1
+        if forced.any():
+            # TODO: this should be handled as a hard constraint
+            arc_costs[forced] = int(self._least_cost() * self.cost_scale - 1)
+        return arc_costs
+
+    def _coarse_arc_costs(self, arc_costs):
+        """
+        return the integer edge costs at the coarse cost scale, rounded down
+        so that explicitly assigned pairs stay the cheapest
+        """
+        if self.cost_scale % self.coarse_cost_scale:
+            raise SolverException(
+                "coarse_cost_scale ({}) must divide cost_scale ({})".format(
+                    self.coarse_cost_scale, self.cost_scale
+                )
+            )
+        return arc_costs // (self.cost_scale // self.coarse_cost_scale)
+
+    def _near_tie_arcs(self):
+        """
+        return a mask over reviewer_paper_arcs of the edges of the current
+        (coarse) solution, and of the edges that cost at most `tie_margin`
+        coarse units more than the most expensive edge assigned to their
+        paper or to their reviewer.
+        """
+        paper_indices, reviewer_indices, arc_capacities, arc_costs = (
+            self.reviewer_paper_arcs
+        )
+        arc_costs = self._coarse_arc_costs(arc_costs)
+        assigned = self.flow_matrix[paper_indices, reviewer_indices] > 0
+
+        near_ties = assigned | (arc_capacities <= 0)
+        for indices, count in [
+            (paper_indices, self.num_papers),
+            (reviewer_indices, self.num_reviewers),
+        ]:
+            thresholds = np.full(count, np.iinfo(np.int64).min)
+            np.maximum.at(thresholds, indices[assigned], arc_costs[assigned])
+            near_ties |= (
+                arc_costs - self.tie_margin <= thresholds[indices]
+            )
+        return near_ties
+
+    def _arc_capacities(self, limit_matrix, paper_indices, reviewer_indices):
+        """return the integer capacities of the selected edges"""
+        return np.asarray(limit_matrix)[paper_indices, reviewer_indices].astype(
+            np.int64
+        )
+
+    def _reviewer_paper_arcs(self):
+        """
+        Consider every reviewer-paper pair as an edge, and return the paper
+        indices, reviewer indices and costs of the pairs that are kept.
+        """
+        # transposed, so that the pairs are visited reviewer-major
+        cost_matrix = np.asarray(self.cost_matrix).T
+        constraint_matrix = np.asarray(self.constraint_matrix).T
+
+        reviewer_indices, paper_indices = np.nonzero(
+            self._arc_mask(cost_matrix, constraint_matrix)
+        )
+        arc_costs = cost_matrix[reviewer_indices, paper_indices]
+        arc_constraints = constraint_matrix[reviewer_indices, paper_indices]
+        return (
+            paper_indices,
+            reviewer_indices,
+            self._arc_costs(arc_costs, arc_constraints),
+        )
+
+    def _has_sparse_candidates(self):
+        """
+        Whether the reviewer-paper edges can be read off the stored cells of
+        sparse cost and constraint matrices, without visiting every pair.
+        """
+        if not isinstance(self.cost_matrix, DefaultSparseMatrix):
+            return False
+        if not isinstance(self.constraint_matrix, DefaultSparseMatrix):
+            return False
+
+        return (
+            not self.allow_zero_score_assignments
+            and int(self.cost_matrix.default) == 0
+            and self.constraint_matrix.default == 0
+        )
+
+    def _sparse_reviewer_paper_arcs(self):
+        """
+        Only consider reviewer-paper pairs stored in the sparse cost or
+        constraint matrices; every other pair has zero cost and no constraint,
+        so it would not become an edge. Pairs are visited in the same order
+        as in _reviewer_paper_arcs.
+        """
+        keys = np.union1d(
+            self.cost_matrix.keys(), self.constraint_matrix.keys()
+        )
+        paper_indices = keys // self.num_reviewers
+        reviewer_indices = keys % self.num_reviewers
+        order = np.lexsort((paper_indices, reviewer_indices))
+        paper_indices = paper_indices[order]
+        reviewer_indices = reviewer_indices[order]
+
+        arc_costs = self.cost_matrix.values_at(paper_indices, reviewer_indices)
+        arc_constraints = self.constraint_matrix.values_at(
+            paper_indices, reviewer_indices
+        )
+        selected = self._arc_mask(arc_costs, arc_constraints)
+        return (
+            paper_indices[selected],
+            reviewer_indices[selected],
+            self._arc_costs(arc_costs[selected], arc_constraints[selected]),
+        )
+
     def _check_inputs(self, strict):
         """Validate inputs (e.g. that matrix and array dimensions are correct)"""
         self.logger.debug("Checking graph inputs")
@@ -172,9 +424,9 @@ class SimpleSolver:
         num_reviewers = np.size(self.cost_matrix, axis=1)
 
         for matrix in [self.cost_matrix, self.constraint_matrix]:
-            if not isinstance(matrix, np.ndarray):
+            if not isinstance(matrix, (np.ndarray, DefaultSparseMatrix)):
                 raise SolverException(
-                    "cost and constraint matrices must be of type numpy.ndarray"
+                    "cost and constraint matrices must be of type numpy.ndarray or DefaultSparseMatrix"
                 )
 
         if not np.shape(self.cost_matrix) == np.shape(self.constraint_matrix):
@@ -237,15 +489,18 @@ class SimpleSolver:
                 )
             )
 
-        if any([not isinstance(i, int) for i in self.capacities]):
-            raise SolverException(
-                "capacities list may not contain integers of type numpy.int64"
-            )
-
-        if any([not isinstance(i, int) for i in self.costs]):
-            raise SolverException(
-                "costs list may not contain integers of type numpy.int64"
-            )
+        for name, array in [
+            ("start_nodes", self.start_nodes),
+            ("end_nodes", self.end_nodes),
+            ("capacities", self.capacities),
+            ("costs", self.costs),
+        ]:
+            if not np.issubdtype(array.dtype, np.integer):
+                raise SolverException(
+                    "{} array must contain integers, not {}".format(
+                        name, array.dtype
+                    )
+                )
 
     def _boundary_cost(self, boundary_function):
         """
@@ -272,6 +527,8 @@ class SimpleSolver:
         finds the lowest value in cost_matrix.
 
         """
+        if isinstance(self.cost_matrix, DefaultSparseMatrix):
+            return self.cost_matrix.min()
         return self._boundary_cost(self.cost_matrix.argmin)
 
     def add_node(self, index, supply=0):
@@ -297,39 +554,85 @@ class SimpleSolver:
             self.current_offset += 1
             return new_node
 
-    def add_edge(self, start_node, end_node, capacity, cost):
+    def construct_solver(self):
         """
-        Adds an "edge" between `start_node` and `end_node` with the given capacity and cost.
-
-        Edges are represented virtually by the presence of Node numbers in the aligned arrays
-        `self.start_nodes` and `self.end_nodes`; there is no "Edge" object.
+        Constructs the MinCostFlow solver with this SimpleSolver's Nodes and edges.
         """
-        self.start_nodes.append(start_node)
-        self.end_nodes.append(end_node)
+        self._check_graph_integrity()
 
-        # cast `capacity` to Python int because SimpleMinCostFlow can't handle other int types
-        # (e.g. numpy.int64)
-        self.capacities.append(int(capacity))
-        self.costs.append(cost)
+        self.min_cost_flow = make_min_cost_flow(self.flow_backend)
 
-    def construct_solver(self):
+        self.min_cost_flow.add_arcs_with_capacity_and_unit_cost(
+            self.start_nodes, self.end_nodes, self.capacities, self.costs
+        )
+
+        nodes = list(self.node_by_number.values())
+        self.min_cost_flow.set_nodes_supplies(
+            np.array([node.number for node in nodes], dtype=np.int32),
+            np.array([node.supply for node in nodes], dtype=np.int64),
+        )
+
+    def set_residual(self, num_reviews, demands, strict=True):
         """
-        Constructs the OR-Tools MinCostFlow solver with this SimpleSolver's Nodes and edges.
+        Prepare another solve over the same graph: the flow of the current
+        solution is removed from the reviewer-paper edge capacities, and the
+        reviews and demands are replaced by `num_reviews` and `demands`.
+
+        The edges are not recomputed from the cost and constraint matrices,
+        and unless candidates are pruned, the OR-Tools solver is reused with
+        only its capacities and supplies updated.
         """
-        self._check_graph_integrity()
+        paper_indices, reviewer_indices, arc_capacities, arc_costs = (
+            self.reviewer_paper_arcs
+        )
+        arc_flows = self.flow_matrix[paper_indices, reviewer_indices]
+        self.reviewer_paper_arcs = (
+            paper_indices,
+            reviewer_indices,
+            (arc_capacities - arc_flows).astype(np.int64),
+            arc_costs,
+        )
+
+        self.num_reviews = num_reviews
+        self.demands = demands
+        self._check_inputs(strict)
 
-        self.min_cost_flow = min_cost_flow.SimpleMinCostFlow()
+        self.cost = 0
+        self.solved = False
+        self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
 
-        for arc_index in range(len(self.start_nodes)):
-            self.min_cost_flow.add_arcs_with_capacity_and_unit_cost(
-                self.start_nodes[arc_index].number,
-                self.end_nodes[arc_index].number,
-                self.capacities[arc_index],
-                self.costs[arc_index],
-            )
+        total_supply = min(sum(self.num_reviews), sum(self.demands))
+        self.source_node = self.source_node._replace(supply=int(total_supply))
+        self.sink_node = self.sink_node._replace(supply=-int(total_supply))
+        for node in [self.source_node, self.sink_node]:
+            self.node_by_number[node.number] = node
+
+        if self.coarse_cost_scale is not None:
+            # the near-tie edges depend on the coarse solution
+            self._add_edges(coarse=True)
+            self.construct_solver()
+            return
+
+        self._add_edges()
+        if self.candidate_limit is not None:
+            # the pruned edges depend on the reviews and demands
+            self.construct_solver()
+            return
 
-        for node in self.node_by_number.values():
-            self.min_cost_flow.set_nodes_supplies(node.number, node.supply)
+        self._check_graph_integrity()
+        self.min_cost_flow.set_arc_capacities(
+            np.arange(len(self.capacities), dtype=np.int32), self.capacities
+        )
+        self.min_cost_flow.set_nodes_supplies(
+            np.array(
+                [self.source_node.number, self.sink_node.number],
+                dtype=np.int32,
+            ),
+            np.array(
+                [self.source_node.supply, self.sink_node.supply],
+                dtype=np.int64,
+            ),
+        )
 
     def solve(self):
         """
@@ -340,29 +643,60 @@ class SimpleSolver:
         assert hasattr(
             self, "min_cost_flow"
         ), "Solver not constructed. Run self.construct_solver() first."
+        self._solve()
+        if self.coarse_cost_scale is None or not self.solved:
+            return self.flow_matrix
+
+        # refine the coarse solution at the full cost scale
+        near_ties = self._near_tie_arcs()
+        self.logger.debug(
+            "Refining {} of {} reviewer-paper edges at cost scale {}".format(
+                np.count_nonzero(near_ties), len(near_ties), self.cost_scale
+            )
+        )
+        self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
+        self._add_edges(selected=near_ties)
+        self.construct_solver()
+        self._solve()
+        return self.flow_matrix
+
+    def _solve(self):
+        """
+        Solve the current min-cost flow problem, widening the candidate limit
+        if needed, and read the solution into `flow_matrix` and `cost`.
+        """
         self.cost = 0
         solver_status = self.min_cost_flow.solve()
+        while solver_status != self.min_cost_flow.OPTIMAL and self.pruned:
+            # the best candidates can't satisfy the supplies and demands
+            self.candidate_limit *= 2
+            self.logger.debug(
+                "Solver status: {}, widening candidate limit to {}".format(
+                    solver_status, self.candidate_limit
+                )
+            )
+            self._add_edges(**self.edge_options)
+            self.construct_solver()
+            solver_status = self.min_cost_flow.solve()
+
         if solver_status == self.min_cost_flow.OPTIMAL:
             self.solved = True
-            for i in range(self.min_cost_flow.num_arcs()):
-                self.cost += self.min_cost_flow.flow(
-                    i
-                ) * self.min_cost_flow.unit_cost(i)
-                r_node = self.node_by_number[self.min_cost_flow.tail(i)]
-                p_node = self.node_by_number[self.min_cost_flow.head(i)]
-                flow = self.min_cost_flow.flow(i)
-
-                if (
-                    r_node in self.reviewer_nodes
-                    and p_node in self.paper_nodes
-                ):
-                    self.flow_matrix[p_node.index, r_node.index] = flow
+            flows = self.min_cost_flow.flows(
+                np.arange(self.min_cost_flow.num_arcs(), dtype=np.int32)
+            )
+            self.cost = int(np.dot(flows, self.costs))
+
+            reviewer_paper_flows = flows[
+                self.num_reviewers : self.num_reviewers
+                + len(self.arc_paper_indices)
+            ]
+            self.flow_matrix[
+                self.arc_paper_indices, self.arc_reviewer_indices
+            ] = reviewer_paper_flows
         else:
             logging.debug("Solver status: {}".format(solver_status))
             self.solved = False
 
-        return self.flow_matrix
-
     def __str__(self):
         return_lines = []
         return_lines.append(
@@ -0,0 +1,217 @@
+"""
+A sparse (papers, reviewers) matrix representation used by the Encoder in sparse mode.
+
+Most cells of the score, constraint and probability limit matrices hold the same
+default value. DefaultSparseMatrix keeps only the explicitly set cells in a scipy
+CSR matrix, and reports `default` for every other cell.
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+class DefaultSparseMatrix:
+    """
+    A matrix stored as a scipy CSR matrix of explicit entries plus a default value.
+
+    The CSR matrix is kept in canonical form (sorted indices, no duplicates).
+    Explicitly stored zeros are meaningful, since they may differ from `default`.
+    """
+
+    def __init__(self, matrix, default=0):
+        self.matrix = matrix
+        self.default = default
+        # the sorted flat indices of the stored cells, see keys()
+        self._keys = None
+
+    @classmethod
+    def from_keys(cls, shape, keys, data, default=0):
+        """
+        Build a matrix from sorted, unique flat (row-major) cell indices and their values.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        rows = keys // shape[1]
+        cols = keys % shape[1]
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        matrix = scipy.sparse.csr_matrix(
+            (np.asarray(data), cols, indptr), shape=shape
+        )
+        sparse_matrix = cls(matrix, default)
+        sparse_matrix._keys = keys
+        return sparse_matrix
+
+    @classmethod
+    def from_edges(
+        cls,
+        shape,
+        paper_indices,
+        reviewer_indices,
+        values,
+        default=0,
+        dtype=float,
+    ):
+        """
+        Build a matrix from aligned index and value arrays.
+
+        As with a dense scatter, the last value given for a cell wins.
+        """
+        keys = np.asarray(paper_indices, dtype=np.int64) * shape[1]
+        keys += np.asarray(reviewer_indices, dtype=np.int64)
+        dtype = np.dtype(dtype)
+        values = np.asarray(values, dtype=dtype)
+
+        unique_keys, last = np.unique(keys[::-1], return_index=True)
+        return cls.from_keys(
+            shape, unique_keys, values[::-1][last], dtype.type(default)
+        )
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def dtype(self):
+        return self.matrix.dtype
+
+    @property
+    def nnz(self):
+        """number of explicitly stored cells"""
+        return self.matrix.nnz
+
+    @property
+    def data(self):
+        return self.matrix.data
+
+    def coo(self):
+        """return aligned (paper indices, reviewer indices, values) of stored cells"""
+        rows = np.repeat(
+            np.arange(self.shape[0]), np.diff(self.matrix.indptr)
+        )
+        return rows, self.matrix.indices, self.matrix.data
+
+    def keys(self):
+        """
+        return the sorted flat (row-major) indices of stored cells. They are
+        computed once, and the same array is returned on every call.
+        """
+        if self._keys is None:
+            rows, cols, _ = self.coo()
+            self._keys = rows.astype(np.int64) * self.shape[1] + cols
+        return self._keys
+
+    def values_at_keys(self, keys):
+        """return the values at the given flat cell indices"""
+        keys = np.asarray(keys, dtype=np.int64)
+        stored_keys = self.keys()
+        if stored_keys.size == 0:
+            return np.full(keys.shape, self.default, dtype=self.dtype)
+
+        positions = np.searchsorted(stored_keys, keys)
+        positions[positions == stored_keys.size] = 0
+        return np.where(
+            stored_keys[positions] == keys,
+            self.matrix.data[positions],
+            self.default,
+        ).astype(self.dtype, copy=False)
+
+    def values_at(self, paper_indices, reviewer_indices):
+        """return the values at the given (paper, reviewer) coordinates"""
+        keys = np.asarray(paper_indices, dtype=np.int64) * self.shape[1]
+        keys += np.asarray(reviewer_indices, dtype=np.int64)
+        return self.values_at_keys(keys)
+
+    def __getitem__(self, coordinates):
+        paper_index, reviewer_index = coordinates
+        values = self.values_at(
+            np.atleast_1d(paper_index), np.atleast_1d(reviewer_index)
+        )
+        if np.isscalar(paper_index) and np.isscalar(reviewer_index):
+            return values[0]
+        return values
+
+    def with_data(self, data, default):
+        """return a matrix with the same stored cells but new values"""
+        matrix = scipy.sparse.csr_matrix(
+            (data, self.matrix.indices, self.matrix.indptr), shape=self.shape
+        )
+        return DefaultSparseMatrix(matrix, default)
+
+    def astype(self, dtype):
+        dtype = np.dtype(dtype)
+        return self.with_data(
+            self.matrix.data.astype(dtype), dtype.type(self.default)
+        )
+
+    def any(self):
+        """whether any cell of the matrix is nonzero"""
+        has_default_cells = self.nnz < self.shape[0] * self.shape[1]
+        return bool(
+            (has_default_cells and self.default != 0)
+            or np.any(self.matrix.data)
+        )
+
+    def min(self):
+        has_default_cells = self.nnz < self.shape[0] * self.shape[1]
+        candidates = [self.matrix.data.min()] if self.nnz else []
+        if has_default_cells:
+            candidates.append(self.default)
+        return min(candidates)
+
+    def max(self):
+        has_default_cells = self.nnz < self.shape[0] * self.shape[1]
+        candidates = [self.matrix.data.max()] if self.nnz else []
+        if has_default_cells:
+            candidates.append(self.default)
+        return max(candidates)
+
+    def argmin(self):
+        """return the flat index of the first lowest cell, as numpy does"""
+        return self._first_key_of(self.min())
+
+    def argmax(self):
+        """return the flat index of the first greatest cell, as numpy does"""
+        return self._first_key_of(self.max())
+
+    def _first_key_of(self, value):
+        """return the flat index of the first cell that holds `value`"""
+        keys = self.keys()
+        stored = keys[self.matrix.data == value]
+        candidates = [stored[0]] if stored.size else []
+        if self.default == value:
+            # the first cell that is not stored
+            gaps = np.flatnonzero(keys != np.arange(keys.size))
+            first_default = gaps[0] if gaps.size else keys.size
+            if first_default < self.shape[0] * self.shape[1]:
+                candidates.append(first_default)
+        return int(min(candidates))
+
+    def toarray(self):
+        """return the equivalent dense numpy array"""
+        return self.dense_rows(0, self.shape[0])
+
+    def dense_rows(self, start, stop):
+        """return rows `start` to `stop` as a dense numpy array"""
+        block = self.matrix[start:stop]
+        array = np.full(block.shape, self.default, dtype=self.dtype)
+        rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+        array[rows, block.indices] = block.data
+        return array
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.toarray()
+        if dtype is not None:
+            array = array.astype(dtype, copy=False)
+        return array
+
+    def __mul__(self, scalar):
+        return self.with_data(
+            self.matrix.data * scalar, self.default * scalar
+        )
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return "DefaultSparseMatrix(shape={}, nnz={}, default={})".format(
+            self.shape, self.nnz, self.default
+        )
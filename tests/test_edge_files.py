@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+from matcher.edge_files import (
+    read_edges,
+    read_edges_in_parallel,
+    save_npz_edges,
+    edge_ids,
+    to_edge_arrays,
+)
+
+ROWS = [
+    ("paper1", "reviewer2", "0.5"),
+    ("paper0", "reviewer1", "1"),
+    ("paper1", "reviewer0", "0.25"),
+    ("paper2", "reviewer1", "0"),
+]
+
+
+def assert_same_edge_arrays(edges, expected_edges):
+    for array, expected in zip(edges, expected_edges):
+        assert np.array_equal(array, expected)
+
+
+def write_csv(path, rows):
+    path.write_text("".join(" {} , {}, {}\n".format(*row) for row in rows))
+
+
+def test_read_csv_edges(tmp_path):
+    """CSV edge files should be factorized into distinct IDs and indices"""
+    path = tmp_path / "scores.csv"
+    write_csv(path, ROWS)
+
+    edges = read_edges(str(path))
+    assert edges.paper_ids == ["paper1", "paper0", "paper2"]
+    assert edges.reviewer_ids == ["reviewer2", "reviewer1", "reviewer0"]
+    assert edges.paper_indices.tolist() == [0, 1, 0, 2]
+    assert edges.reviewer_indices.tolist() == [0, 1, 2, 1]
+    assert edges.values.tolist() == [0.5, 1.0, 0.25, 0.0]
+
+    unstripped_edges = read_edges(str(path), strip=False)
+    assert unstripped_edges.paper_ids[0] == " paper1 "
+
+
+def test_to_edge_arrays(tmp_path):
+    """Edges should be indexed against the given IDs, dropping unknown ones"""
+    path = tmp_path / "scores.csv"
+    write_csv(path, ROWS)
+    edges = read_edges(str(path))
+
+    papers, reviewers = edge_ids(edges)
+    assert sorted(papers) == ["paper0", "paper1", "paper2"]
+    assert sorted(reviewers) == ["reviewer0", "reviewer1", "reviewer2"]
+
+    index_by_paper = {"paper0": 0, "paper1": 1}
+    index_by_reviewer = {"reviewer0": 0, "reviewer1": 1, "reviewer2": 2}
+    edge_arrays = to_edge_arrays(edges, index_by_paper, index_by_reviewer)
+    assert_same_edge_arrays(
+        edge_arrays, ([1, 0, 1], [2, 1, 0], [0.5, 1.0, 0.25])
+    )
+
+
+def test_npz_edges(tmp_path):
+    """NPZ edge files should give the same edges as the equivalent CSV"""
+    csv_path = tmp_path / "scores.csv"
+    npz_path = tmp_path / "scores.npz"
+    write_csv(csv_path, ROWS)
+    save_npz_edges(
+        str(npz_path),
+        [row[0] for row in ROWS],
+        [row[1] for row in ROWS],
+        [float(row[2]) for row in ROWS],
+    )
+
+    index_by_paper = {"paper0": 0, "paper1": 1, "paper2": 2}
+    index_by_reviewer = {"reviewer0": 0, "reviewer1": 1, "reviewer2": 2}
+    assert_same_edge_arrays(
+        to_edge_arrays(
+            read_edges(str(npz_path)), index_by_paper, index_by_reviewer
+        ),
+        to_edge_arrays(
+            read_edges(str(csv_path)), index_by_paper, index_by_reviewer
+        ),
+    )
+
+
+def test_parquet_edges(tmp_path):
+    """Parquet edge files should give the same edges as the equivalent CSV"""
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    csv_path = tmp_path / "scores.csv"
+    parquet_path = tmp_path / "scores.parquet"
+    write_csv(csv_path, ROWS)
+    table = pyarrow.table(
+        {
+            "paper": [row[0] for row in ROWS],
+            "reviewer": [row[1] for row in ROWS],
+            "score": [float(row[2]) for row in ROWS],
+        }
+    )
+    pyarrow.parquet.write_table(table, str(parquet_path))
+
+    index_by_paper = {"paper0": 0, "paper1": 1, "paper2": 2}
+    index_by_reviewer = {"reviewer0": 0, "reviewer1": 1, "reviewer2": 2}
+    assert_same_edge_arrays(
+        to_edge_arrays(
+            read_edges(str(parquet_path)), index_by_paper, index_by_reviewer
+        ),
+        to_edge_arrays(
+            read_edges(str(csv_path)), index_by_paper, index_by_reviewer
+        ),
+    )
+
+
+def test_read_edges_in_parallel(tmp_path):
+    """
+    Reading files in parallel chunks should give the same edges as reading
+    each file whole, wherever the chunk boundaries fall
+    """
+    rng = np.random.default_rng(0)
+    rows = [
+        (
+            "paper{}".format(rng.integers(20)),
+            "~Reviewer_{}1".format(rng.integers(30)),
+            str(rng.random()),
+        )
+        for _ in range(200)
+    ]
+    plain_path = tmp_path / "plain.csv"
+    write_csv(plain_path, rows)
+    quoted_path = tmp_path / "quoted.csv"
+    quoted_path.write_bytes(
+        "".join(
+            '"{}",{},{}\r\n'.format(*row) for row in rows[:50]
+        ).encode()
+    )
+    npz_path = tmp_path / "scores.npz"
+    save_npz_edges(
+        str(npz_path),
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        [float(row[2]) for row in rows],
+    )
+    paths = [str(plain_path), str(quoted_path), str(npz_path)]
+
+    expected_edges = [read_edges(path) for path in paths]
+    for processes, chunk_size in [(1, 97), (2, 64), (2, 2**20)]:
+        parallel_edges = read_edges_in_parallel(
+            paths, processes=processes, chunk_size=chunk_size
+        )
+        for edges, expected in zip(parallel_edges, expected_edges):
+            assert edges.paper_ids == expected.paper_ids
+            assert edges.reviewer_ids == expected.reviewer_ids
+            assert_same_edge_arrays(edges[2:], expected[2:])
+
+    assert read_edges(str(quoted_path)).paper_ids[:2] == [
+        rows[0][0],
+        rows[1][0],
+    ]
@@ -8,7 +8,10 @@ from collections import namedtuple
 import pytest
 import numpy as np
 
-from matcher.encoder import Encoder, EncoderError
+from matcher.encoder import Encoder, EncoderError, EdgeArrays
+from matcher.encoder_cache import EncoderCache, CACHED_MATRICES
+from matcher.solvers.quantization import quantize_costs
+from matcher.sparse_matrix import DefaultSparseMatrix
 from conftest import assert_arrays
 
 MockNote = namedtuple("Note", ["id", "forum"])
@@ -547,3 +550,648 @@ def test_encoder_no_papers(encoder_context):
         )
 
     assert "Papers List can not be empty." == str(exc.value)
+
+
+def test_encoder_edge_arrays(encoder_context):
+    """Columnar edge arrays should encode the same matrices as lists of triples"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    edges = [
+        ("paper0", "reviewer0", 0.1),
+        ("paper1", "reviewer3", 0.7),
+        ("paper2", "reviewer1", 0.4),
+    ]
+    constraints = [("paper0", "reviewer1", -1), ("paper2", "reviewer2", 1)]
+    prob_limits = [("paper1", "reviewer3", 0.5)]
+
+    def to_edge_arrays(triples):
+        return EdgeArrays(
+            np.array([papers.index(forum) for forum, _, _ in triples]),
+            np.array([reviewers.index(user) for _, user, _ in triples]),
+            np.array([value for _, _, value in triples]),
+        )
+
+    tuple_encoder = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"mock/-/score_edge": {"default": 0.05, "edges": edges}},
+        {"mock/-/score_edge": 1},
+        probability_limits=prob_limits,
+    )
+    array_encoder = Encoder(
+        reviewers,
+        papers,
+        to_edge_arrays(constraints),
+        {
+            "mock/-/score_edge": {
+                "default": 0.05,
+                "edges": to_edge_arrays(edges),
+            }
+        },
+        {"mock/-/score_edge": 1},
+        probability_limits=to_edge_arrays(prob_limits),
+    )
+
+    assert array_encoder.aggregate_score_matrix.shape == matrix_shape
+    assert (
+        array_encoder.aggregate_score_matrix
+        == tuple_encoder.aggregate_score_matrix
+    ).all()
+    assert (
+        array_encoder.constraint_matrix == tuple_encoder.constraint_matrix
+    ).all()
+    assert (
+        array_encoder.prob_limit_matrix == tuple_encoder.prob_limit_matrix
+    ).all()
+
+    with pytest.raises(EncoderError):
+        Encoder(
+            reviewers,
+            papers,
+            EdgeArrays([0], [len(reviewers)], [1]),
+            {},
+            {},
+        )
+
+
+def test_encoder_sparse(encoder_context):
+    """Sparse encoding should represent the same matrices as dense encoding"""
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=5, n_papers=4
+    )
+
+    scores_by_type = {
+        "TPMS": {
+            "edges": [
+                ("paper0", "reviewer0", 0.9),
+                ("paper1", "reviewer2", 0.0),
+                ("paper3", "reviewer4", 0.4),
+            ]
+        },
+        "Affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.5),
+                ("paper2", "reviewer1", 0.7),
+            ]
+        },
+        "Bid": {
+            "default": 0.25,
+            "edges": [
+                ("paper0", "reviewer3", 1),
+                ("paper2", "reviewer1", -1),
+                ("paper2", "reviewer1", 0.5),
+            ],
+        },
+    }
+    weight_by_type = {"TPMS": 0.8, "Affinity": 0.2, "Bid": 1}
+    constraints = [("paper1", "reviewer1", -1), ("paper3", "reviewer0", 1)]
+    prob_limits = [("paper2", "reviewer2", 0.5)]
+
+    encoders = [
+        Encoder(
+            reviewers,
+            papers,
+            constraints,
+            scores_by_type,
+            weight_by_type,
+            ["TPMS", "Affinity"],
+            probability_limits=prob_limits,
+            sparse=sparse,
+        )
+        for sparse in [False, True]
+    ]
+    dense_encoder, sparse_encoder = encoders
+
+    assert isinstance(sparse_encoder.cost_matrix, DefaultSparseMatrix)
+    for score_type in scores_by_type:
+        assert_arrays(
+            sparse_encoder.score_matrices[score_type].toarray().flatten(),
+            dense_encoder.score_matrices[score_type].flatten(),
+        )
+    for attribute in [
+        "aggregate_score_matrix",
+        "cost_matrix",
+        "constraint_matrix",
+        "prob_limit_matrix",
+    ]:
+        sparse_matrix = getattr(sparse_encoder, attribute)
+        dense_matrix = getattr(dense_encoder, attribute)
+        assert sparse_matrix.shape == matrix_shape
+        assert np.allclose(sparse_matrix.toarray(), dense_matrix)
+
+    assert sparse_encoder.aggregate_score_matrix[2, 1] == pytest.approx(
+        dense_encoder.aggregate_score_matrix[2, 1]
+    )
+
+    mock_solution = np.zeros(matrix_shape)
+    mock_solution[0, 0] = mock_solution[2, 1] = 1
+    sparse_assignments = sparse_encoder.decode_assignments(mock_solution)
+    dense_assignments = dense_encoder.decode_assignments(mock_solution)
+    assert sparse_assignments.keys() == dense_assignments.keys()
+    for forum, entries in dense_assignments.items():
+        assert [entry["user"] for entry in sparse_assignments[forum]] == [
+            entry["user"] for entry in entries
+        ]
+        assert_arrays(
+            [entry["aggregate_score"] for entry in sparse_assignments[forum]],
+            [entry["aggregate_score"] for entry in entries],
+        )
+
+
+def test_encoder_compact(encoder_context):
+    """
+    Compact encoding should use low-precision dtypes without changing the
+    integer costs used by the flow-based solvers
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=5, n_papers=4
+    )
+
+    # scores like 0.57 give float64 costs just above an integer (-56.99...),
+    # which a plain float32 conversion would round to the integer itself
+    scores = [0.29, 0.53, 0.57, 0.58, 0.59]
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                (paper, reviewer, scores[(p + r) % len(scores)])
+                for p, paper in enumerate(papers)
+                for r, reviewer in enumerate(reviewers)
+            ]
+        },
+        "Bid": {"default": 0.25, "edges": [("paper0", "reviewer3", 1)]},
+    }
+    weight_by_type = {"Affinity": 1, "Bid": 0}
+    constraints = [("paper1", "reviewer1", -1), ("paper3", "reviewer0", 1)]
+
+    for sparse in [False, True]:
+        default_encoder, compact_encoder = [
+            Encoder(
+                reviewers,
+                papers,
+                constraints,
+                scores_by_type,
+                weight_by_type,
+                probability_limits=0.7,
+                sparse=sparse,
+                compact=compact,
+            )
+            for compact in [False, True]
+        ]
+
+        for score_type in scores_by_type:
+            assert (
+                compact_encoder.score_matrices[score_type].dtype == np.float32
+            )
+        assert compact_encoder.aggregate_score_matrix.dtype == np.float32
+        assert compact_encoder.cost_matrix.dtype == np.float32
+        assert compact_encoder.constraint_matrix.dtype == np.int8
+        assert compact_encoder.prob_limit_matrix.dtype == np.float64
+
+        default_costs = np.asarray(default_encoder.cost_matrix)
+        compact_costs = np.asarray(compact_encoder.cost_matrix)
+        assert np.allclose(compact_costs, default_costs)
+        assert_arrays(
+            compact_costs.astype(int).flatten(),
+            default_costs.astype(int).flatten(),
+        )
+        assert_arrays(
+            np.asarray(compact_encoder.constraint_matrix).flatten(),
+            np.asarray(default_encoder.constraint_matrix).flatten(),
+        )
+
+        mock_solution = np.zeros(matrix_shape)
+        mock_solution[0, 0] = 1
+        assignments = compact_encoder.decode_assignments(mock_solution)
+        assert type(assignments["paper0"][0]["aggregate_score"]) is float
+
+
+def test_encoder_compact_scores(encoder_context):
+    """
+    Compact encoding writes the aggregate scores of assignments and
+    alternates as the shortest decimal of their float32 value
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=4, n_papers=3
+    )
+    scores = [0.85, 0.1, 0.57, 0.3]
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                (paper, reviewer, scores[(p + r) % len(scores)])
+                for p, paper in enumerate(papers)
+                for r, reviewer in enumerate(reviewers)
+            ]
+        },
+    }
+    mock_solution = np.zeros(matrix_shape)
+    mock_solution[:, 0] = 1
+
+    for sparse in [False, True]:
+        default_encoder, compact_encoder = [
+            Encoder(
+                reviewers,
+                papers,
+                [],
+                scores_by_type,
+                {"Affinity": 1},
+                sparse=sparse,
+                compact=compact,
+            )
+            for compact in [False, True]
+        ]
+        assert compact_encoder.decode_assignments(
+            mock_solution
+        ) == default_encoder.decode_assignments(mock_solution)
+        assert compact_encoder.decode_alternates(
+            mock_solution, 2
+        ) == default_encoder.decode_alternates(mock_solution, 2)
+        assert compact_encoder.decode_selected_alternates(
+            {0: [1, 2]}
+        ) == default_encoder.decode_selected_alternates({0: [1, 2]})
+
+    # a score with more digits than float32 holds is rounded
+    compact_encoder = Encoder(
+        reviewers,
+        papers,
+        [],
+        {"Affinity": {"default": 0.123456789}},
+        {"Affinity": 1},
+        compact=True,
+    )
+    assignments = compact_encoder.decode_assignments(mock_solution)
+    assert assignments["paper0"][0]["aggregate_score"] == 0.12345679
+
+
+@pytest.mark.parametrize("cost_scale", [10, 1000, 10000])
+def test_encoder_compact_cost_scale(encoder_context, cost_scale):
+    """
+    Compact costs truncate to the same integers as the float64 costs once
+    they are multiplied by the cost scale
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=40, n_papers=50
+    )
+    rng = np.random.default_rng(0)
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                (paper, reviewer, float(score))
+                for (paper, reviewer), score in zip(
+                    itertools.product(papers, reviewers),
+                    rng.random(len(papers) * len(reviewers)),
+                )
+            ]
+        },
+    }
+
+    default_encoder, compact_encoder = [
+        Encoder(
+            reviewers,
+            papers,
+            [],
+            scores_by_type,
+            {"Affinity": 1},
+            compact=compact,
+            cost_scale=cost_scale,
+        )
+        for compact in [False, True]
+    ]
+    assert compact_encoder.cost_matrix.dtype == np.float32
+    assert_arrays(
+        quantize_costs(compact_encoder.cost_matrix, cost_scale).flatten(),
+        quantize_costs(default_encoder.cost_matrix, cost_scale).flatten(),
+    )
+
+
+def test_encoder_compact_cost_scale_overflow(encoder_context):
+    """
+    Costs too large for float32 to hold as integers at the cost scale are
+    kept as float64
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=3, n_papers=2
+    )
+    scores_by_type = {
+        "Affinity": {"default": 0.1, "edges": [("paper0", "reviewer0", 300.1)]}
+    }
+    for sparse in [False, True]:
+        encoder = Encoder(
+            reviewers,
+            papers,
+            [],
+            scores_by_type,
+            {"Affinity": 1},
+            sparse=sparse,
+            compact=True,
+            cost_scale=10000,
+        )
+        costs = quantize_costs(
+            np.asarray(encoder.cost_matrix, dtype=np.float64), 10000
+        )
+        assert costs[0, 0] == -300100000
+        assert costs[1, 1] == -100000
+
+
+def test_encoder_drop_score_matrices(encoder_context):
+    """
+    Dropping the per-type score matrices should not change the aggregate
+    scores, with or without normalization
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=6, n_papers=5
+    )
+    rng = np.random.default_rng(0)
+
+    scores_by_type = {
+        score_type: {
+            "default": default,
+            "edges": [
+                (paper, reviewer, rng.random())
+                for paper in papers
+                for reviewer in reviewers
+                if rng.random() < 0.5
+            ],
+        }
+        for score_type, default in [("TPMS", 0), ("Affinity", 0), ("Bid", 0.1)]
+    }
+    weight_by_type = {"TPMS": 0.8, "Affinity": 0.2, "Bid": -1}
+
+    for sparse, normalization_types in itertools.product(
+        [False, True], [[], ["TPMS", "Affinity"]]
+    ):
+        kept_encoder, dropped_encoder = [
+            Encoder(
+                reviewers,
+                papers,
+                [],
+                scores_by_type,
+                weight_by_type,
+                normalization_types,
+                sparse=sparse,
+                keep_score_matrices=keep_score_matrices,
+            )
+            for keep_score_matrices in [True, False]
+        ]
+
+        assert kept_encoder.score_matrices.keys() == scores_by_type.keys()
+        assert dropped_encoder.score_matrices == {}
+        assert np.array_equal(
+            np.asarray(dropped_encoder.aggregate_score_matrix),
+            np.asarray(kept_encoder.aggregate_score_matrix),
+        )
+
+
+def test_encoder_decode_alternates_ties(encoder_context):
+    """
+    Alternates should be the highest scoring unassigned reviewers, with ties
+    going to the lower reviewer index
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=6, n_papers=3
+    )
+    scores = [
+        [0.5, 0.9, 0.5, 0.5, 0.9, 0.1],
+        [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.3, 0.8, 0.7, 0.6, 0.5, 0.4],
+    ]
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                (paper, reviewer, scores[p][r])
+                for p, paper in enumerate(papers)
+                for r, reviewer in enumerate(reviewers)
+            ]
+        }
+    }
+    flow_matrix = np.zeros(matrix_shape)
+    flow_matrix[0, 4] = flow_matrix[1, 1] = 1
+    flow_matrix[2, :5] = 1
+
+    for sparse in [False, True]:
+        encoder = Encoder(
+            reviewers,
+            papers,
+            [],
+            scores_by_type,
+            {"Affinity": 1},
+            sparse=sparse,
+        )
+        alternates = encoder.decode_alternates(flow_matrix, 3)
+
+        assert [entry["user"] for entry in alternates["paper0"]] == [
+            "reviewer1",
+            "reviewer0",
+            "reviewer2",
+        ]
+        assert [entry["user"] for entry in alternates["paper1"]] == [
+            "reviewer0",
+            "reviewer2",
+            "reviewer3",
+        ]
+        assert alternates["paper2"] == [
+            {"aggregate_score": 0.4, "user": "reviewer5"}
+        ]
+        assert encoder.decode_alternates(flow_matrix, 0) == {
+            paper: [] for paper in papers
+        }
+
+
+def test_encoder_cache(encoder_context, tmp_path):
+    """
+    A cached encoding should be reused for the same inputs, and only for them
+    """
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=5, n_papers=4
+    )
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.9),
+                ("paper2", "reviewer3", 0.4),
+            ]
+        },
+        "Bid": {"default": 0.5, "edges": [("paper1", "reviewer1", 1)]},
+    }
+    weight_by_type = {"Affinity": 1, "Bid": 0.5}
+    constraints = [("paper3", "reviewer4", -1)]
+    cache = EncoderCache(str(tmp_path))
+
+    def encode(weight_by_type=weight_by_type, **kwargs):
+        return Encoder(
+            reviewers,
+            papers,
+            constraints,
+            scores_by_type,
+            weight_by_type,
+            ["Affinity"],
+            probability_limits=0.5,
+            **kwargs
+        )
+
+    uncached_encoder = encode()
+    stored_encoder = encode(cache=cache)
+    loaded_encoder = encode(cache=cache)
+
+    assert len(list(tmp_path.iterdir())) == 1
+    assert stored_encoder.score_matrices == {}
+    assert loaded_encoder.score_matrices == {}
+    for attribute in CACHED_MATRICES:
+        loaded_matrix = getattr(loaded_encoder, attribute)
+        assert isinstance(loaded_matrix, np.memmap)
+        assert not loaded_matrix.flags.writeable
+        assert np.array_equal(
+            loaded_matrix, getattr(uncached_encoder, attribute)
+        )
+
+    # different inputs get their own entries, and sparse encoding is not cached
+    encode(weight_by_type={"Affinity": 1, "Bid": 1}, cache=cache)
+    encode(compact=True, cache=cache)
+    encode(sparse=True, cache=cache)
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_encoder_apply_delta():
+    """
+    Applying a delta should give the same encoding as encoding the updated
+    inputs from scratch
+    """
+    rng = np.random.default_rng(0)
+    papers = ["paper{}".format(i) for i in range(6)]
+    reviewers = ["reviewer{}".format(i) for i in range(7)]
+
+    def random_edges(papers, reviewers, density=0.5):
+        return [
+            (paper, reviewer, float(rng.random()))
+            for paper in papers
+            for reviewer in reviewers
+            if rng.random() < density
+        ]
+
+    affinity_edges = random_edges(papers, reviewers)
+    bid_edges = random_edges(papers, reviewers, 0.3)
+    constraints = [("paper1", "reviewer2", -1), ("paper4", "reviewer0", 1)]
+    weight_by_type = {"Affinity": 1, "Bid": 0.5}
+    attribute_constraints = {
+        "seniority": {
+            "comparator": ">=",
+            "bound": 1,
+            "members": ["reviewer1", "reviewer3", "reviewer6"],
+        }
+    }
+
+    def encode(papers, reviewers, affinity_edges, bid_edges, constraints):
+        return Encoder(
+            reviewers,
+            papers,
+            constraints,
+            {
+                "Affinity": {"edges": affinity_edges},
+                "Bid": {"default": 0.1, "edges": bid_edges},
+            },
+            weight_by_type,
+            ["Affinity", "Bid"],
+            probability_limits=0.6,
+            attribute_constraints=attribute_constraints,
+        )
+
+    encoder = encode(
+        papers, reviewers, affinity_edges, bid_edges, constraints
+    )
+
+    new_papers = papers[:2] + papers[3:] + ["paper6", "paper7"]
+    new_reviewers = [r for r in reviewers if r != "reviewer3"] + ["reviewer7"]
+    new_affinity_edges = random_edges(["paper6", "paper7"], new_reviewers)
+    new_affinity_edges += random_edges(new_papers, ["reviewer7"])
+    new_affinity_edges += [("paper0", "reviewer0", 0.25)]
+    new_bid_edges = [("paper6", "reviewer7", 1.0), ("paper1", "reviewer1", 0)]
+    new_constraints = [("paper7", "reviewer1", -1)]
+
+    encoder.apply_delta(
+        removed_papers=["paper2"],
+        removed_reviewers=["reviewer3"],
+        added_papers=["paper6", "paper7"],
+        added_reviewers=["reviewer7"],
+        scores_by_type={
+            "Affinity": new_affinity_edges,
+            "Bid": new_bid_edges,
+        },
+        constraints=new_constraints,
+        probability_limits=[("paper0", "reviewer1", 0.2)],
+    )
+
+    def kept(edges):
+        return [
+            edge
+            for edge in edges
+            if edge[0] in new_papers and edge[1] in new_reviewers
+        ]
+
+    expected = encode(
+        new_papers,
+        new_reviewers,
+        kept(affinity_edges) + new_affinity_edges,
+        kept(bid_edges) + new_bid_edges,
+        kept(constraints) + new_constraints,
+    )
+
+    assert encoder.papers == new_papers
+    assert encoder.reviewers == new_reviewers
+    assert encoder.index_by_forum == expected.index_by_forum
+    assert encoder.index_by_user == expected.index_by_user
+    assert encoder.attribute_constraints == expected.attribute_constraints
+    for attribute in ["aggregate_score_matrix", "cost_matrix"]:
+        assert np.array_equal(
+            getattr(encoder, attribute), getattr(expected, attribute)
+        )
+    assert np.array_equal(
+        encoder.constraint_matrix, expected.constraint_matrix
+    )
+    expected.prob_limit_matrix[0, 1] = 0.2
+    assert np.array_equal(
+        encoder.prob_limit_matrix, expected.prob_limit_matrix
+    )
+
+    dropped_encoder = Encoder(
+        reviewers,
+        papers,
+        [],
+        {"Affinity": {"edges": affinity_edges}},
+        {"Affinity": 1},
+        keep_score_matrices=False,
+    )
+    with pytest.raises(EncoderError):
+        dropped_encoder.apply_delta(added_papers=["paper6"])
+    dropped_encoder.apply_delta(removed_papers=["paper0"])
+    assert dropped_encoder.aggregate_score_matrix.shape == (5, 7)
+
+
+@pytest.mark.parametrize("default", [0, -5, 5])
+def test_default_sparse_matrix_boundaries(default):
+    """The extremes of a sparse matrix count its default cells, as dense."""
+    dense = np.full((3, 4), float(default))
+    dense[0, 0] = 0
+    dense[1, 2] = -3
+    dense[2, 1] = 3
+    dense[2, 3] = -3
+    paper_indices, reviewer_indices = np.nonzero(dense != default)
+    matrix = DefaultSparseMatrix.from_edges(
+        dense.shape,
+        paper_indices,
+        reviewer_indices,
+        dense[paper_indices, reviewer_indices],
+        default=default,
+    )
+    assert matrix.min() == dense.min()
+    assert matrix.max() == dense.max()
+    assert matrix.argmin() == dense.argmin()
+    assert matrix.argmax() == dense.argmax()
+    assert matrix[np.unravel_index(matrix.argmax(), matrix.shape)] == (
+        dense.max()
+    )
+
+    # the stored keys are computed once
+    assert matrix.keys() is matrix.keys()
+    assert np.array_equal(
+        matrix.values_at_keys(np.arange(dense.size)), dense.ravel()
+    )
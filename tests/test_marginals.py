@@ -0,0 +1,78 @@
+import numpy as np
+from matcher.marginals import (
+    benchmark,
+    empirical_marginals,
+    hoeffding_bound,
+    main,
+    synthetic_venue,
+    verify_marginals,
+)
+from matcher import marginals
+from matcher.solvers import RandomizedSolver
+
+
+def test_empirical_marginals():
+    """Padding pairs are ignored, and counts are divided by the samples."""
+    pairs = np.array([[[0, 1], [1, 0]], [[0, 1], [-1, -1]]])
+    marginals = empirical_marginals(pairs, 2, 2)
+    assert np.array_equal(marginals, [[0, 1], [0.5, 0]])
+
+
+def test_hoeffding_bound():
+    assert hoeffding_bound(0, 100, 0.99) == 0
+    assert hoeffding_bound(10, 400, 0.99) < hoeffding_bound(10, 100, 0.99)
+    assert hoeffding_bound(100, 100, 0.99) > hoeffding_bound(10, 100, 0.99)
+
+
+def test_verify_marginals():
+    """
+    The samples of RandomizedSolver match its fractional assignment, and a
+    wrong fractional assignment is detected.
+    """
+    minimums, maximums, demands, encoder = synthetic_venue(
+        12, 16, demand=2, prob_limit=0.4, seed=1
+    )
+    solver = RandomizedSolver(minimums, maximums, demands, encoder)
+    solver.solve()
+    assert solver.solved
+
+    report = verify_marginals(solver, 2000, seeds=range(2000), threads=2)
+    assert report.num_samples == 2000
+    assert report.deviations == 0
+    assert report.limit_violations == 0
+    assert report.max_deviation <= report.bound
+    assert report.samples_per_second > 0
+
+    # swap the probabilities of two papers
+    solver.fractional_assignment_matrix = solver.fractional_assignment_matrix[
+        [1, 0] + list(range(2, 12))
+    ]
+    report = verify_marginals(solver, 2000, seeds=range(2000), threads=2)
+    assert report.deviations > 0
+
+
+def test_benchmark():
+    report = benchmark("Randomized", 8, 10, 200, seed=2)
+    assert report.deviations == 0
+    assert report.sample_bytes > 0
+    assert main(["--solvers", "Randomized", "--samples", "200"]) == 0
+
+
+def test_peak_memory_units(monkeypatch):
+    """ru_maxrss is in bytes on macOS and in kilobytes on Linux."""
+
+    class FakeResource:
+        RUSAGE_SELF = 0
+
+        @staticmethod
+        def getrusage(who):
+            class Usage:
+                ru_maxrss = 3 * 2**20
+
+            return Usage
+
+    monkeypatch.setattr(marginals, "resource", FakeResource)
+    monkeypatch.setattr(marginals.sys, "platform", "darwin")
+    assert marginals._peak_memory_mb() == 3
+    monkeypatch.setattr(marginals.sys, "platform", "linux")
+    assert marginals._peak_memory_mb() == 3 * 2**10
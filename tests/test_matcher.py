@@ -3,11 +3,15 @@ Verifies that custom loads are being used correctly in the matcher.
 
 """
 import itertools
+import json
+import os
 import random
+import subprocess
+import sys
 import pytest
 import logging
 from numpy import testing as nptest
-from matcher import Matcher
+from matcher import Matcher, MatcherSession
 
 
 def test_matcher_basic_minmax():
@@ -174,3 +178,158 @@ def test_matcher_fairflow_fixed_input():
     )
     assert test_fairflow_matcher.assignments
     assert test_fairflow_matcher.alternates
+
+
+@pytest.mark.parametrize("solver_class", ["MinMax", "FairFlow", "Auction"])
+def test_matcher_decompose(tmp_path, solver_class):
+    """Conflicts split the problem into two tracks, solved separately."""
+    reviewers = ["reviewer{}".format(index) for index in range(6)]
+    papers = ["paper{}".format(index) for index in range(6)]
+
+    scores = [
+        (paper, reviewer, random.uniform(0.1, 1))
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+    constraints = [
+        (paper, reviewer, -1)
+        for paper, reviewer in itertools.product(papers, reviewers)
+        if (paper[-1] < "3") != (reviewer[-1] < "3")
+    ]
+
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "constraints": constraints,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [1] * 6,
+            "maximums": [3] * 6,
+            "demands": [2] * 6,
+            "num_alternates": 1,
+            "decompose": True,
+            "processes": 2,
+            "assignments_output": str(tmp_path / "assignments.json"),
+            "alternates_output": str(tmp_path / "alternates.json"),
+        },
+        solver_class=solver_class,
+    )
+
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    nptest.assert_array_equal(test_matcher.solution.sum(axis=1), [2] * 6)
+    nptest.assert_array_equal(test_matcher.solution[:3, 3:], 0)
+    nptest.assert_array_equal(test_matcher.solution[3:, :3], 0)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_matcher_session(tmp_path, concurrent):
+    """
+    A session encodes once, and its solvers find the same solutions as
+    separate Matchers.
+    """
+    rng = random.Random(0)
+    reviewers = ["reviewer{}".format(index) for index in range(8)]
+    papers = ["paper{}".format(index) for index in range(6)]
+    scores = [
+        (paper, reviewer, round(rng.uniform(0.1, 1), 3))
+        for paper, reviewer in itertools.product(papers, reviewers)
+        if reviewer != "reviewer7"
+    ]
+    datasource = {
+        "reviewers": reviewers,
+        "papers": papers,
+        "constraints": [("paper0", "reviewer0", -1)],
+        "scores_by_type": {"affinity": {"edges": scores}},
+        "weight_by_type": {"affinity": 1},
+        "minimums": [1] * 8,
+        "maximums": [3] * 8,
+        "demands": [2] * 6,
+        "num_alternates": 1,
+        "assignments_output": str(tmp_path / "assignments.json"),
+        "alternates_output": str(tmp_path / "alternates.json"),
+    }
+    solver_classes = ["MinMax", "FairFlow", "FairSequence"]
+
+    session = MatcherSession(datasource)
+    matchers = session.run(solver_classes, concurrent=concurrent)
+    encoder = session.encoder
+    assert session.encode() is encoder
+    assert set(matchers) == set(solver_classes)
+    # MinMax drops the minimum of the reviewer without scores in its copy
+    assert session.datasource.minimums == [1] * 8
+    assert not list(tmp_path.iterdir())
+
+    for solver_class in solver_classes:
+        matcher = Matcher(dict(datasource), solver_class=solver_class)
+        matcher.run()
+        session_matcher = matchers[solver_class]
+        assert session_matcher.get_status() == "Complete"
+        nptest.assert_array_equal(session_matcher.solution, matcher.solution)
+        assert session_matcher.assignments == matcher.assignments
+        assert session_matcher.datasource.assignments == matcher.assignments
+        assert session_matcher.alternates == matcher.alternates
+
+
+def test_cli_max_papers_and_user_group(tmp_path):
+    """
+    The CLI applies --max_papers rows to known reviewers only, and keeps
+    only the reviewers of --user_group.
+    """
+    papers = ["paper{}".format(index) for index in range(4)]
+    reviewers = ["reviewer{}".format(index) for index in range(4)]
+    with open(tmp_path / "scores.csv", "w") as file_handle:
+        for paper, (index, reviewer) in itertools.product(
+            papers, enumerate(reviewers)
+        ):
+            # reviewer0 is the best match for every paper
+            score = 0.9 if index == 0 else 0.1 * (index + 1)
+            file_handle.write("{},{},{}\n".format(paper, reviewer, score))
+    with open(tmp_path / "max_papers.csv", "w") as file_handle:
+        file_handle.write("reviewer0,1\nunknown_reviewer,3\n")
+    with open(tmp_path / "user_groups.csv", "w") as file_handle:
+        file_handle.write(
+            "group1,reviewer0\ngroup1,reviewer1\ngroup1,reviewer2\n"
+            "group2,reviewer3\n"
+        )
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "matcher",
+            "--scores",
+            "scores.csv",
+            "--weights",
+            "1",
+            "--max_papers_default",
+            "4",
+            "--num_reviewers",
+            "1",
+            "--max_papers",
+            "max_papers.csv",
+            "--user_group",
+            "group1",
+            "--user_group_file",
+            "user_groups.csv",
+        ],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=repo_dir),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "Reviewers missing in all score files: unknown_reviewer" in (
+        result.stderr
+    )
+
+    with open(tmp_path / "assignments.json") as file_handle:
+        assignments = json.load(file_handle)
+    assigned = [
+        edge["user"] for edges in assignments.values() for edge in edges
+    ]
+    assert sorted(assignments) == papers
+    assert assigned.count("reviewer0") == 1
+    assert "reviewer3" not in assigned
@@ -0,0 +1,243 @@
+from collections import namedtuple
+import pytest
+import numpy as np
+import scipy.sparse
+from scipy.optimize import linprog
+from matcher.solvers import AuctionSolver, MinMaxSolver, SolverException
+from matcher.solvers.auction_solver import auction
+
+encoder = namedtuple("Encoder", ["cost_matrix", "constraint_matrix"])
+
+
+def random_encoder(num_papers, num_reviewers, seed):
+    rng = np.random.default_rng(seed)
+    aggregate_score_matrix = np.round(
+        rng.random((num_papers, num_reviewers))
+        * (rng.random((num_papers, num_reviewers)) > 0.3),
+        2,
+    )
+    constraint_matrix = rng.choice(
+        [0] * 20 + [-1], size=(num_papers, num_reviewers)
+    )
+    constraint_matrix[0, 0] = 1
+    return encoder(-aggregate_score_matrix * 100, constraint_matrix)
+
+
+def exact_optimum(benefit_matrix, demands, capacities):
+    """
+    return the highest total benefit of assigning each row i to demands[i]
+    distinct columns, and each column j to at most capacities[j] rows. The
+    constraint matrix of this transportation LP is totally unimodular, so
+    its optimum is the optimum of the assignment.
+    """
+    num_rows, num_columns = benefit_matrix.shape
+    allowed = np.isfinite(benefit_matrix)
+    rows, columns = np.nonzero(allowed)
+    pairs = np.arange(len(rows))
+    result = linprog(
+        -benefit_matrix[allowed],
+        A_ub=scipy.sparse.csr_matrix(
+            (np.ones(len(pairs)), (columns, pairs)),
+            shape=(num_columns, len(pairs)),
+        ),
+        b_ub=capacities,
+        A_eq=scipy.sparse.csr_matrix(
+            (np.ones(len(pairs)), (rows, pairs)), shape=(num_rows, len(pairs))
+        ),
+        b_eq=demands,
+        bounds=(0, 1),
+        method="highs",
+    )
+    assert result.status == 0
+    return -result.fun
+
+
+@pytest.mark.parametrize(
+    "minimum, maximum", [(1, 6), (0, 7), (0, 5)], ids=["min", "slack", "tight"]
+)
+def test_solver_auction(minimum, maximum):
+    """
+    The auction assignment respects the loads, demands and constraints.
+    Without minimums there is only one auction, and its cost is optimal.
+    """
+    num_papers, num_reviewers = 40, 24
+    minimums = [minimum] * num_reviewers
+    maximums = [maximum] * num_reviewers
+    demands = [3] * num_papers
+    problem = random_encoder(num_papers, num_reviewers, seed=0)
+
+    solver = AuctionSolver(minimums, maximums, demands, problem)
+    result = solver.solve()
+    assert solver.solved
+    assert result.shape == (num_papers, num_reviewers)
+    assert np.all(np.sum(result, axis=1) == demands)
+    assert np.all(np.sum(result, axis=0) <= maximums)
+    assert np.all(np.sum(result, axis=0) >= minimums)
+    assert not result[problem.constraint_matrix == -1].any()
+    assert result[0, 0] == 1
+    assert solver.cost == np.sum(result * problem.cost_matrix)
+    if minimum == 0:
+        assert -solver.optimal_cost == pytest.approx(
+            exact_optimum(solver.benefit_matrix, demands, maximums)
+        )
+
+
+@pytest.mark.parametrize(
+    "demand, capacity", [(1, 2), (2, 5), (3, 8)], ids=["tight", "slack", "multiple"]
+)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_auction_exact_optimum(demand, capacity, seed):
+    """
+    The auction's total benefit is the exact optimum, whether the columns
+    have spare capacity or not.
+    """
+    rng = np.random.default_rng(seed)
+    num_rows, num_columns = 24, 12
+    benefit_matrix = np.round(rng.random((num_rows, num_columns)) * 100)
+    benefit_matrix[rng.random((num_rows, num_columns)) < 0.2] = -np.inf
+    demands = np.full(num_rows, demand)
+    capacities = np.full(num_columns, capacity)
+
+    assigned = auction(benefit_matrix, demands, capacities)
+    assert assigned is not None
+    assert np.all(np.sum(assigned, axis=1) == demands)
+    assert np.all(np.sum(assigned, axis=0) <= capacities)
+    assert np.sum(benefit_matrix[assigned]) == pytest.approx(
+        exact_optimum(benefit_matrix, demands, capacities)
+    )
+
+
+def test_auction_optimal():
+    """The auction finds the best assignment of a small problem."""
+    benefit_matrix = np.array(
+        [[10.0, 9.0, 1.0], [10.0, 1.0, 1.0], [-np.inf, 8.0, 7.0]]
+    )
+    assigned = auction(benefit_matrix, [1, 1, 1], [1, 1, 1])
+    assert np.array_equal(
+        assigned, [[False, True, False], [True, False, False], [False, False, True]]
+    )
+
+    # with two slots in the first column
+    assigned = auction(benefit_matrix, [1, 1, 1], [2, 1, 1])
+    assert np.array_equal(
+        assigned, [[True, False, False], [True, False, False], [False, True, False]]
+    )
+
+
+def test_auction_price_bound_across_scaling():
+    """
+    Prices carried over from earlier epsilon-scaling rounds do not count
+    towards the bound that detects an impossible assignment.
+    """
+    benefit_matrix = np.array([[-108.0, -211.0], [-258.0, -192.0]])
+    for epsilon_factor in [2, 4, 7]:
+        assigned = auction(
+            benefit_matrix, [1, 1], [1, 1], epsilon_factor=epsilon_factor
+        )
+        assert np.array_equal(assigned, [[True, False], [False, True]])
+
+
+def test_solver_auction_impossible_constraints():
+    num_papers = 20
+    num_reviewers = 5
+    cost_matrix = np.zeros((num_papers, num_reviewers))
+    constraint_matrix = -1 * np.ones((num_papers, num_reviewers))
+
+    solver = AuctionSolver(
+        [5] * num_reviewers,
+        [20] * num_reviewers,
+        [3] * num_papers,
+        encoder(cost_matrix, constraint_matrix),
+    )
+    solver.solve()
+    assert not solver.solved
+    with pytest.raises(SolverException):
+        solver.optimality_gap()
+
+
+@pytest.mark.parametrize("allow_zero_score_assignments", [False, True])
+def test_solver_auction_zero_scores(allow_zero_score_assignments):
+    """Without any scores, the auction solves what MinMaxSolver solves."""
+    num_papers, num_reviewers = 6, 4
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[:, 3] = -1
+    problem = encoder(np.zeros((num_papers, num_reviewers)), constraint_matrix)
+    solvers = [
+        solver_class(
+            [1, 1, 1, 0],
+            [4] * num_reviewers,
+            [2] * num_papers,
+            problem,
+            allow_zero_score_assignments=allow_zero_score_assignments,
+        )
+        for solver_class in [AuctionSolver, MinMaxSolver]
+    ]
+    for solver in solvers:
+        solver.solve()
+    assert solvers[0].solved == solvers[1].solved
+    assert solvers[0].solved == allow_zero_score_assignments
+    # as in MinMaxSolver, reviewers keep their minimums without any scores
+    assert list(solvers[0].minimums) == list(solvers[1].minimums)
+    if allow_zero_score_assignments:
+        result = solvers[0].flow_matrix
+        assert np.all(np.sum(result, axis=1) == 2)
+        assert np.all(np.sum(result, axis=0)[:3] >= 1)
+        assert not result[:, 3].any()
+
+
+def test_solver_auction_optimality_gap():
+    num_papers, num_reviewers = 30, 20
+    solver = AuctionSolver(
+        [1] * num_reviewers,
+        [5] * num_reviewers,
+        [3] * num_papers,
+        random_encoder(num_papers, num_reviewers, seed=1),
+    )
+    solver.solve()
+    assert solver.solved
+    assert solver.optimality_gap() <= 0
+
+
+@pytest.mark.parametrize("minimum, maximum", [(1, 6), (0, 5)])
+def test_solver_auction_parallelism(minimum, maximum):
+    """Bidding in threads gives the same assignment as bidding in one."""
+    num_papers, num_reviewers = 40, 24
+    problem = random_encoder(num_papers, num_reviewers, seed=2)
+    results = []
+    for parallelism in [1, 3]:
+        solver = AuctionSolver(
+            [minimum] * num_reviewers,
+            [maximum] * num_reviewers,
+            [3] * num_papers,
+            problem,
+            parallelism=parallelism,
+        )
+        results.append(solver.solve())
+        assert solver.solved
+    assert np.array_equal(results[0], results[1])
+
+
+def test_solver_auction_epsilon():
+    """With a larger epsilon, each phase is at most slots * epsilon off."""
+    num_papers, num_reviewers = 40, 24
+    problem = random_encoder(num_papers, num_reviewers, seed=3)
+    minmax_solver = MinMaxSolver(
+        [0] * num_reviewers, [6] * num_reviewers, [3] * num_papers, problem
+    )
+    minmax_solver.solve()
+
+    epsilon = 0.5
+    solver = AuctionSolver(
+        [0] * num_reviewers,
+        [6] * num_reviewers,
+        [3] * num_papers,
+        problem,
+        epsilon=epsilon,
+        parallelism=2,
+    )
+    solver.solve()
+    assert solver.solved
+    assert (
+        solver.optimal_cost
+        <= minmax_solver.optimal_cost + 3 * num_papers * epsilon
+    )
@@ -0,0 +1,150 @@
+from collections import namedtuple
+import pytest
+import numpy as np
+from matcher.solvers import (
+    DecomposedSolver,
+    FairSequence,
+    MinMaxSolver,
+    SolverException,
+)
+from matcher.solvers.components import allowed_pairs, connected_components
+
+encoder = namedtuple(
+    "Encoder", ["cost_matrix", "constraint_matrix", "aggregate_score_matrix"]
+)
+
+
+def track_encoder(num_tracks, papers_per_track, reviewers_per_track, seed):
+    """scores within tracks, and conflicts across them"""
+    rng = np.random.default_rng(seed)
+    num_papers = num_tracks * papers_per_track
+    num_reviewers = num_tracks * reviewers_per_track
+    aggregate_score_matrix = np.round(
+        rng.random((num_papers, num_reviewers)), 2
+    )
+    paper_tracks = np.arange(num_papers) // papers_per_track
+    reviewer_tracks = np.arange(num_reviewers) // reviewers_per_track
+    constraint_matrix = np.where(
+        paper_tracks[:, np.newaxis] == reviewer_tracks, 0, -1
+    )
+    return encoder(
+        -aggregate_score_matrix * 100, constraint_matrix, aggregate_score_matrix
+    )
+
+
+def test_connected_components():
+    cost_matrix = np.array(
+        [[-10, -20, 0, 0], [0, -5, 0, 0], [0, 0, 0, -1], [0, 0, 0, 0]]
+    )
+    constraint_matrix = np.zeros((4, 4), dtype=int)
+    constraint_matrix[2, 3] = -1
+    constraint_matrix[3, 2] = 1
+
+    allowed = allowed_pairs(cost_matrix, constraint_matrix, False)
+    num_components, paper_labels, reviewer_labels = connected_components(
+        allowed
+    )
+    # papers 0 and 1 share reviewer 1, paper 3 is forced on reviewer 2, and
+    # paper 2 is only allowed with reviewer 3 through a conflict
+    assert num_components == 4
+    assert paper_labels[0] == paper_labels[1] == reviewer_labels[0]
+    assert reviewer_labels[1] == paper_labels[0]
+    assert paper_labels[3] == reviewer_labels[2]
+    assert len({paper_labels[0], paper_labels[2], paper_labels[3]}) == 3
+    assert reviewer_labels[3] not in paper_labels
+
+    # with zero scores, everything but the conflict is allowed
+    allowed = allowed_pairs(cost_matrix, constraint_matrix, True)
+    assert connected_components(allowed)[0] == 1
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_solver_decomposed_minmax(processes):
+    """Each track is solved separately, and as well as the whole problem."""
+    problem = track_encoder(3, 10, 6, seed=0)
+    minimums, maximums, demands = [1] * 18, [6] * 18, [3] * 30
+
+    solver = DecomposedSolver(
+        MinMaxSolver,
+        minimums,
+        maximums,
+        demands,
+        problem,
+        processes=processes,
+    )
+    assert len(solver.components()[0]) == 3
+    result = solver.solve()
+    assert solver.solved
+    assert np.all(np.sum(result, axis=1) == demands)
+    assert np.all(np.sum(result, axis=0) >= minimums)
+    assert np.all(np.sum(result, axis=0) <= maximums)
+    assert not result[problem.constraint_matrix == -1].any()
+
+    minmax_solver = MinMaxSolver(minimums, maximums, demands, problem)
+    minmax_solver.solve()
+    assert solver.cost == pytest.approx(minmax_solver.cost, abs=2)
+
+
+def test_solver_decomposed_no_solution():
+    """A component without enough reviewers has no solution."""
+    problem = track_encoder(2, 10, 4, seed=1)
+    maximums = [8] * 4 + [4] * 4  # the second track needs 30 reviews
+    solver = DecomposedSolver(
+        MinMaxSolver, [0] * 8, maximums, [3] * 20, problem, processes=1
+    )
+    with pytest.raises(SolverException):
+        solver.solve()
+
+
+def test_solver_decomposed_unsupported():
+    problem = track_encoder(2, 2, 2, seed=2)
+    with pytest.raises(SolverException):
+        DecomposedSolver(FairSequence, [0] * 4, [2] * 4, [1] * 4, problem)
+
+
+def test_solver_decomposed_same_errors():
+    """Decomposing does not change when the solver raises or fails."""
+    problem = track_encoder(2, 10, 4, seed=1)
+
+    # the whole problem has too little supply
+    with pytest.raises(SolverException) as plain_error:
+        MinMaxSolver([0] * 8, [5] * 8, [3] * 20, problem).solve()
+    with pytest.raises(SolverException) as decomposed_error:
+        DecomposedSolver(
+            MinMaxSolver, [0] * 8, [5] * 8, [3] * 20, problem, processes=1
+        ).solve()
+    assert str(decomposed_error.value) == str(plain_error.value)
+
+    # the whole problem has enough supply, but the second track does not
+    maximums = [12] * 4 + [4] * 4
+    minmax_solver = MinMaxSolver([0] * 8, maximums, [3] * 20, problem)
+    minmax_solver.solve()
+    solver = DecomposedSolver(
+        MinMaxSolver, [0] * 8, maximums, [3] * 20, problem, processes=1
+    )
+    solver.solve()
+    assert not minmax_solver.solved
+    assert not solver.solved
+
+
+def test_solver_decomposed_papers_without_reviewers():
+    """Papers that conflict with every reviewer have no solution."""
+    problem = track_encoder(2, 3, 3, seed=3)
+    problem.constraint_matrix[0, :] = -1
+    minmax_solver = MinMaxSolver([0] * 6, [3] * 6, [1] * 6, problem)
+    minmax_solver.solve()
+    solver = DecomposedSolver(
+        MinMaxSolver, [0] * 6, [3] * 6, [1] * 6, problem, processes=1
+    )
+    assert len(solver.components()[0][0][1]) == 0
+    solver.solve()
+    assert not minmax_solver.solved
+    assert not solver.solved
+
+    # unless they need no reviews
+    solver = DecomposedSolver(
+        MinMaxSolver, [0] * 6, [3] * 6, [0] + [1] * 5, problem, processes=1
+    )
+    result = solver.solve()
+    assert solver.solved
+    assert not result[0].any()
@@ -626,3 +626,38 @@ def test_solver_fairflow_avoid_zero_scores_get_no_solution():
         SolverException, match=r".*Solver could not find a solution.*"
     ):
         res = solver.solve()
+
+
+def test_solver_fairflow_candidate_limit():
+    """
+    A candidate limit that covers every reviewer gives the unpruned solution;
+    a smaller one still gives a valid solution.
+    """
+    rng = np.random.default_rng(0)
+    num_papers, num_reviewers = 20, 15
+    aggregate_score_matrix = np.round(
+        rng.random((num_papers, num_reviewers)), 2
+    )
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[0, :5] = -1
+
+    def solve(candidate_limit):
+        solver = FairFlow(
+            [1] * num_reviewers,
+            [5] * num_reviewers,
+            [3] * num_papers,
+            encoder(aggregate_score_matrix, constraint_matrix),
+            candidate_limit=candidate_limit,
+        )
+        return solver, solver.solve()
+
+    unpruned_solver, unpruned_result = solve(None)
+    solver, result = solve(num_reviewers)
+    assert np.array_equal(result, unpruned_result)
+
+    solver, result = solve(2)
+    assert solver.solved
+    assert np.all(np.sum(result, axis=1) == 3)
+    assert np.all(np.sum(result, axis=0) >= 1)
+    assert np.all(np.sum(result, axis=0) <= 5)
+    assert np.all(result[constraint_matrix == -1] == 0)
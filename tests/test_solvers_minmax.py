@@ -2,7 +2,12 @@
 from collections import namedtuple
 import pytest
 import numpy as np
-from matcher.solvers import MinMaxSolver
+import scipy.optimize
+from ortools.graph.python import min_cost_flow
+from matcher.solvers import MinMaxSolver, SimpleSolver, SolverException
+from matcher.solvers.flow_backends import make_min_cost_flow
+from matcher.solvers.quantization import choose_cost_scale, rank_order_loss
+from matcher.sparse_matrix import DefaultSparseMatrix
 
 encoder = namedtuple("Encoder", ["cost_matrix", "constraint_matrix"])
 
@@ -544,3 +549,456 @@ def test_solver_minmax_avoid_zero_scores_get_no_solution():
 
     res = solver.solve()
     assert solver.solved is False
+
+
+def test_solver_minmax_sparse_matches_dense():
+    """
+    Solving from sparse cost and constraint matrices should give the same
+    solution as solving from the equivalent dense matrices.
+    """
+    rng = np.random.default_rng(0)
+    num_papers, num_reviewers = 8, 12
+    cost_matrix = -np.round(
+        rng.random((num_papers, num_reviewers)) * 100
+    ) * (rng.random((num_papers, num_reviewers)) < 0.6)
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[0, 0] = -1
+    constraint_matrix[3, 5] = 1
+    constraint_matrix[7, 2] = -1
+
+    sparse_cost_matrix = DefaultSparseMatrix.from_edges(
+        cost_matrix.shape,
+        *np.nonzero(cost_matrix),
+        cost_matrix[cost_matrix != 0]
+    )
+    sparse_constraint_matrix = DefaultSparseMatrix.from_edges(
+        constraint_matrix.shape,
+        *np.nonzero(constraint_matrix),
+        constraint_matrix[constraint_matrix != 0],
+        dtype=int
+    )
+
+    solvers = [
+        MinMaxSolver(
+            [1] * num_reviewers,
+            [3] * num_reviewers,
+            [2] * num_papers,
+            encoder(costs, constraints),
+        )
+        for costs, constraints in [
+            (cost_matrix, constraint_matrix),
+            (sparse_cost_matrix, sparse_constraint_matrix),
+        ]
+    ]
+    dense_result, sparse_result = [solver.solve() for solver in solvers]
+
+    assert solvers[1].solved
+    assert np.array_equal(dense_result, sparse_result)
+    assert solvers[0].cost == solvers[1].cost
+
+
+def test_simple_solver_edges():
+    """
+    Reviewer-paper edges are added reviewer-major, skip conflicts and zero
+    costs, and give explicitly assigned pairs the lowest cost minus one.
+    """
+    cost_matrix = np.array([[-10.5, 0.0, -3.0], [-0.5, -7.0, -2.0]])
+    constraint_matrix = np.array([[0, 0, -1], [1, 0, 0]])
+    limit_matrix = np.array([[1, 1, 1], [2, 1, 1]])
+
+    solver = SimpleSolver(
+        [1, 1, 1],
+        [1, 1],
+        cost_matrix,
+        constraint_matrix,
+        limit_matrix=limit_matrix,
+    )
+
+    # node 0 is the source, 1-3 the reviewers, 4-5 the papers and 6 the sink
+    reviewer_paper_arcs = slice(3, -2)
+    assert solver.start_nodes[reviewer_paper_arcs].tolist() == [1, 1, 2, 3]
+    assert solver.end_nodes[reviewer_paper_arcs].tolist() == [4, 5, 5, 5]
+    assert solver.costs[reviewer_paper_arcs].tolist() == [-10, -11, -7, -2]
+    assert solver.capacities[reviewer_paper_arcs].tolist() == [1, 2, 1, 1]
+    assert solver.min_cost_flow.num_arcs() == len(solver.start_nodes)
+
+    flow_matrix = solver.solve()
+    assert solver.solved
+    assert flow_matrix.tolist() == [[1, 0, 0], [0, 1, 0]]
+    assert solver.cost == solver.min_cost_flow.optimal_cost() == -17
+
+
+def test_simple_solver_zero_costs_at_cost_scale():
+    """
+    Unless zero scores are allowed, pairs whose cost truncates to 0 at the
+    cost scale are not edges.
+    """
+    cost_matrix = np.array([[-0.5, -0.05], [-2.0, -0.5]])
+    constraint_matrix = np.zeros(cost_matrix.shape)
+
+    edges = {}
+    for cost_scale in [1, 10, 100]:
+        solver = SimpleSolver(
+            [1, 1],
+            [1, 1],
+            cost_matrix,
+            constraint_matrix,
+            strict=False,
+            cost_scale=cost_scale,
+        )
+        edges[cost_scale] = list(
+            zip(solver.arc_paper_indices, solver.arc_reviewer_indices)
+        )
+    assert edges[1] == [(1, 0)]
+    assert edges[10] == [(0, 0), (1, 0), (1, 1)]
+    assert edges[100] == [(0, 0), (1, 0), (0, 1), (1, 1)]
+
+
+def test_simple_solver_candidate_limit_widens():
+    """
+    When the pruned graph has no solution, the candidate limit is doubled
+    until it has one.
+    """
+    cost_matrix = np.array(
+        [[-9.0, -3.0, -3.0], [-5.0, -9.0, -2.0], [-3.0, -5.0, -3.0]]
+    )
+    constraint_matrix = np.zeros((3, 3), dtype=int)
+
+    solver = SimpleSolver(
+        [1, 1, 1], [1, 1, 1], cost_matrix, constraint_matrix, candidate_limit=1
+    )
+    # each paper's best reviewer is kept, plus each reviewer's best paper
+    assert len(solver.arc_paper_indices) == 4
+
+    result = solver.solve()
+    assert solver.solved
+    assert solver.candidate_limit == 2
+    assert np.sum(result, axis=0).tolist() == [1, 1, 1]
+    assert np.sum(result, axis=1).tolist() == [1, 1, 1]
+
+
+@pytest.mark.parametrize("seed", [1, 7], ids=["coarse", "refine"])
+def test_simple_solver_candidate_limit_coarse_cost_scale(seed, monkeypatch):
+    """
+    Widening the candidate limit keeps the edges of the current solve: the
+    coarse costs while solving at the coarse scale, and only the near-tie
+    edges while refining.
+    """
+    num_papers, num_reviewers = 5, 5
+    rng = np.random.default_rng(seed)
+    cost_matrix = np.round(-rng.random((num_papers, num_reviewers)) * 10, 1)
+    constraint_matrix = np.zeros(cost_matrix.shape)
+
+    edge_options = []
+    add_edges = SimpleSolver._add_edges
+
+    def record_add_edges(self, coarse=False, selected=None):
+        edge_options.append((coarse, selected is not None))
+        return add_edges(self, coarse=coarse, selected=selected)
+
+    monkeypatch.setattr(SimpleSolver, "_add_edges", record_add_edges)
+    solver = SimpleSolver(
+        [1] * num_reviewers,
+        [1] * num_papers,
+        cost_matrix,
+        constraint_matrix,
+        strict=False,
+        candidate_limit=1,
+        cost_scale=10,
+        coarse_cost_scale=1,
+    )
+    result = solver.solve()
+    assert solver.solved
+    assert solver.candidate_limit > 1
+    assert np.all(np.sum(result, axis=1) == 1)
+    assert np.all(np.sum(result, axis=0) == 1)
+
+    # the coarse solves, then the refining solves
+    assert len(edge_options) > 2
+    coarse_solves = edge_options.count((True, False))
+    assert edge_options[:coarse_solves] == [(True, False)] * coarse_solves
+    assert edge_options[coarse_solves:] == [(False, True)] * (
+        len(edge_options) - coarse_solves
+    )
+
+
+def test_solver_minmax_candidate_limit():
+    """
+    A candidate limit that covers every reviewer gives the unpruned solution;
+    a smaller one still gives a valid solution.
+    """
+    rng = np.random.default_rng(0)
+    num_papers, num_reviewers = 20, 15
+    cost_matrix = -np.round(rng.random((num_papers, num_reviewers)) * 100)
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[0, :5] = -1
+
+    def solve(candidate_limit):
+        solver = MinMaxSolver(
+            [1] * num_reviewers,
+            [5] * num_reviewers,
+            [3] * num_papers,
+            encoder(cost_matrix, constraint_matrix),
+            candidate_limit=candidate_limit,
+        )
+        return solver, solver.solve()
+
+    unpruned_solver, unpruned_result = solve(None)
+    solver, result = solve(num_reviewers)
+    assert np.array_equal(result, unpruned_result)
+    assert solver.cost == unpruned_solver.cost
+
+    solver, result = solve(3)
+    assert solver.solved
+    assert np.all(np.sum(result, axis=1) == 3)
+    assert np.all(np.sum(result, axis=0) >= 1)
+    assert np.all(np.sum(result, axis=0) <= 5)
+    assert np.all(result[constraint_matrix == -1] == 0)
+
+
+def test_simple_solver_set_residual():
+    """
+    Solving again after set_residual gives the same result as a new solver
+    whose limits have the first solution's flow removed.
+    """
+    rng = np.random.default_rng(1)
+    num_papers, num_reviewers = 10, 8
+    cost_matrix = -np.round(rng.random((num_papers, num_reviewers)) * 100)
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[2, 3] = -1
+    constraint_matrix[4, 1] = 1
+    limit_matrix = np.ones((num_papers, num_reviewers), dtype=np.int64)
+    minimums = np.ones(num_reviewers, dtype=int)
+    maximums = np.full(num_reviewers, 4)
+    demands = np.full(num_papers, 3)
+
+    solver = SimpleSolver(
+        minimums,
+        demands,
+        cost_matrix,
+        constraint_matrix,
+        strict=False,
+        limit_matrix=limit_matrix,
+    )
+    minimum_result = solver.solve().copy()
+
+    residual_maximums = maximums - np.sum(minimum_result, axis=0)
+    residual_demands = demands - np.sum(minimum_result, axis=1)
+    new_solver = SimpleSolver(
+        residual_maximums,
+        residual_demands,
+        cost_matrix,
+        constraint_matrix,
+        limit_matrix=limit_matrix - minimum_result,
+    )
+    solver.set_residual(residual_maximums, residual_demands)
+
+    assert np.array_equal(solver.capacities, new_solver.capacities)
+    assert np.array_equal(solver.solve(), new_solver.solve())
+    assert solver.solved
+    assert solver.cost == new_solver.cost
+    assert np.all(minimum_result + solver.flow_matrix <= 1)
+
+
+@pytest.mark.parametrize("flow_backend", ["ortools", "highs"])
+def test_solver_minmax_flow_backends(flow_backend):
+    """Every min-cost flow backend finds a solution of the same cost."""
+    rng = np.random.default_rng(2)
+    num_papers, num_reviewers = 12, 9
+    cost_matrix = -np.round(rng.random((num_papers, num_reviewers)) * 100)
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[1, 2] = -1
+    constraint_matrix[5, 0] = 1
+
+    def solve(backend):
+        solver = MinMaxSolver(
+            [1] * num_reviewers,
+            [5] * num_reviewers,
+            [3] * num_papers,
+            encoder(cost_matrix, constraint_matrix),
+            flow_backend=backend,
+        )
+        return solver, solver.solve()
+
+    expected_solver, _ = solve("ortools")
+    solver, result = solve(flow_backend)
+    assert solver.solved
+    assert solver.optimal_cost == expected_solver.optimal_cost
+    assert np.all(np.sum(result, axis=1) == 3)
+    assert result[5, 0] == 1 and result[1, 2] == 0
+
+
+def test_solver_minmax_unknown_flow_backend():
+    with pytest.raises(SolverException):
+        MinMaxSolver(
+            [0, 0],
+            [1, 1],
+            [1],
+            encoder(np.array([[-1.0, -2.0]]), np.zeros((1, 2))),
+            flow_backend="unknown",
+        ).solve()
+
+
+def test_simple_solver_highs_infeasible():
+    """The HiGHS backend reports an infeasible graph like OR-Tools does."""
+    solver = SimpleSolver(
+        [2, 2],
+        [2, 2],
+        np.array([[-1.0, 0.0], [-1.0, 0.0]]),
+        np.zeros((2, 2)),
+        flow_backend="highs",
+    )
+    solver.solve()
+    assert solver.solved is False
+
+
+@pytest.mark.parametrize("num_papers,num_reviewers", [(30, 30), (20, 35)])
+def test_solver_minmax_highs_unit_capacities(
+    monkeypatch, num_papers, num_reviewers
+):
+    """
+    With unit capacities the HiGHS backend solves an assignment problem,
+    without the linear program, and matches OR-Tools.
+    """
+    rng = np.random.default_rng(3)
+    cost_matrix = -np.round(rng.random((num_papers, num_reviewers)) * 100)
+    constraint_matrix = np.zeros((num_papers, num_reviewers), dtype=int)
+    constraint_matrix[0, :3] = -1
+
+    def solve(backend):
+        solver = MinMaxSolver(
+            [0] * num_reviewers,
+            [1] * num_reviewers,
+            [1] * num_papers,
+            encoder(cost_matrix, constraint_matrix),
+            flow_backend=backend,
+        )
+        return solver, solver.solve()
+
+    expected_solver, _ = solve("ortools")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("linprog should not be called")
+
+    monkeypatch.setattr(scipy.optimize, "linprog", fail)
+    solver, result = solve("highs")
+    assert solver.solved
+    assert solver.optimal_cost == expected_solver.optimal_cost
+    assert np.all(np.sum(result, axis=1) == 1)
+    assert np.all(np.sum(result, axis=0) <= 1)
+    assert not result[0, :3].any()
+
+
+def test_simple_solver_highs_unit_capacities_infeasible():
+    """No assignment covers both papers when one conflicts with every reviewer."""
+    solver = SimpleSolver(
+        [1, 1],
+        [1, 1],
+        np.array([[-1.0, -2.0], [-3.0, -4.0]]),
+        np.array([[0, 0], [-1, -1]]),
+        flow_backend="highs",
+    )
+    solver.solve()
+    assert solver.solved is False
+
+
+def test_highs_min_cost_flow_single_arcs():
+    """Arcs and supplies added one at a time, as FairFlow does, solve by LP."""
+    expected = min_cost_flow.SimpleMinCostFlow()
+    flow = make_min_cost_flow("highs")
+    # a cycle through nodes 1, 2 and 3, so the graph is not an assignment
+    arcs = [(0, 1, 3, 0), (1, 2, 2, 4), (1, 3, 2, 1), (2, 3, 2, -2), (3, 1, 1, 1)]
+    arcs += [(2, 4, 3, 0), (3, 4, 3, 2)]
+    for tail, head, capacity, unit_cost in arcs:
+        for mcf in [expected, flow]:
+            mcf.add_arcs_with_capacity_and_unit_cost(
+                tail, head, capacity, unit_cost
+            )
+    for node, supply in [(0, 3), (4, -3)]:
+        for mcf in [expected, flow]:
+            mcf.set_nodes_supplies(node, supply)
+
+    assert expected.solve() == expected.OPTIMAL
+    assert flow.solve() == flow.OPTIMAL
+    assert flow.num_arcs() == len(arcs)
+    assert flow.optimal_cost() == expected.optimal_cost()
+    assert [flow.tail(arc) for arc in range(len(arcs))] == [
+        arc[0] for arc in arcs
+    ]
+    assert sum(flow.flow(arc) for arc in [5, 6]) == 3
+
+
+def test_rank_order_loss():
+    paper_indices = np.array([0, 0, 0, 0, 1, 1])
+    costs = np.array([-10.1, -10.1, -10.2, -20.0, -5.5, -5.6])
+
+    # -10.1 and -10.2, and -5.5 and -5.6, become tied
+    assert rank_order_loss(paper_indices, costs, 1) == pytest.approx(5 / 6)
+    assert rank_order_loss(paper_indices, costs, 10) == 0
+    assert choose_cost_scale(paper_indices, costs) == (10, 0)
+    assert choose_cost_scale(paper_indices, costs, 0.9) == (1, 5 / 6)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"cost_scale": 10},
+        {"cost_scale": "auto"},
+        {"cost_scale": 100, "coarse_cost_scale": 1},
+    ],
+)
+def test_solver_minmax_cost_scale(options):
+    """
+    Scores that differ in the third decimal have the same integer cost
+    unless the costs are scaled up.
+    """
+    cost_matrix = np.array([[-50.1, -50.9], [-50.9, -50.1], [-30.0, -30.0]])
+    constraint_matrix = np.zeros(cost_matrix.shape)
+
+    solver = MinMaxSolver(
+        [0, 0],
+        [2, 2],
+        [1, 1, 1],
+        encoder(cost_matrix, constraint_matrix),
+        **options
+    )
+    result = solver.solve()
+    assert solver.solved
+    assert np.array_equal(result[:2], [[0, 1], [1, 0]])
+    assert solver.rank_order_loss == 0
+    assert solver.cost == pytest.approx(-131.8)
+
+
+def test_solver_minmax_coarse_cost_scale():
+    """Refining a coarse solution gives the best assignment at full scale."""
+    rng = np.random.default_rng(0)
+    num_papers, num_reviewers = 30, 15
+    cost_matrix = np.round(-rng.random((num_papers, num_reviewers)) * 100, 3)
+    constraint_matrix = np.zeros(cost_matrix.shape)
+    constraint_matrix[0, 0] = 1
+
+    solvers = [
+        MinMaxSolver(
+            [1] * num_reviewers,
+            [6] * num_reviewers,
+            [2] * num_papers,
+            encoder(cost_matrix, constraint_matrix),
+            cost_scale=1000,
+            coarse_cost_scale=coarse_cost_scale,
+        )
+        for coarse_cost_scale in [None, 10]
+    ]
+    results = [solver.solve() for solver in solvers]
+    assert all(solver.solved for solver in solvers)
+    assert results[1][0, 0] == 1
+    assert solvers[1].cost == pytest.approx(solvers[0].cost, abs=0.1)
+
+    with pytest.raises(SolverException):
+        MinMaxSolver(
+            [1] * num_reviewers,
+            [6] * num_reviewers,
+            [2] * num_papers,
+            encoder(cost_matrix, constraint_matrix),
+            cost_scale=1000,
+            coarse_cost_scale=3,
+        ).solve()
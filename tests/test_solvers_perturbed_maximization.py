@@ -711,3 +711,24 @@ def test_identical_costs():
     )
     for _ in range(1000):
         check_test_solution(solver, T=1)
+
+
+def test_sample_assignments():
+    """A batch of samples equals single samples with the same seeds"""
+    S = np.transpose(np.array([[1, 0.1], [1, 1], [0.3, 0.6], [0.5, 0.8]]))
+    M = np.zeros(np.shape(S))
+    Q = np.full(np.shape(S), 0.75)
+    solver = PerturbedMaximizationSolver(
+        [0, 0, 0, 0], [1, 1, 1, 1], [2, 2], encoder(-S, M, Q, 0.0)
+    )
+    solver.solve()
+
+    seeds = list(range(50))
+    pairs = solver.sample_assignments(len(seeds), seeds=seeds, threads=2)
+    assert pairs.shape == (len(seeds), 4, 2)
+    for sample, seed in zip(pairs, seeds):
+        solver.sample_assignment(seed=seed)
+        check_sampled_solution(solver)
+        sampled = np.zeros(np.shape(S))
+        sampled[sample[:, 0], sample[:, 1]] = 1
+        assert np.array_equal(sampled, solver.sampled_assignment_matrix)
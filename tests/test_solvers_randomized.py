@@ -1,7 +1,13 @@
 import pytest
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from matcher.solvers import SolverException, RandomizedSolver
+from matcher.solvers.bvn_extension import (
+    sample_bvn,
+    sample_bvn_sparse,
+    sample_bvn_batch,
+)
 
 cost_scale = 1000
 
@@ -405,3 +411,175 @@ def test_identical_costs():
     )
     for _ in range(1000):
         check_test_solution(solver, T=1)
+
+
+def test_sample_bvn():
+    """The sampler overwrites a NumPy matrix with an integral assignment."""
+    one = 100
+    # a doubly stochastic matrix, each paper needs two of four reviewers
+    flows = np.array(
+        [
+            [50, 50, 50, 50],
+            [100, 50, 0, 50],
+            [50, 0, 100, 50],
+            [0, 100, 50, 50],
+        ],
+        dtype=np.intc,
+    )
+    sampled = sample_bvn(flows, one)
+    assert sampled is flows
+    assert np.all((flows == 0) | (flows == 1))
+    assert np.all(flows.sum(axis=1) == 2)
+    assert np.all(flows.sum(axis=0) == 2)
+    assert flows[1, 0] == 1 and flows[1, 2] == 0
+
+    with pytest.raises(ValueError):
+        sample_bvn(flows.astype(np.int64), one)
+    with pytest.raises(ValueError):
+        sample_bvn(np.asfortranarray(flows[:, :3]), one)
+
+
+def test_sample_bvn_sparse():
+    """The sparse sampler assigns pairs from the nonzero entries only."""
+    one = 100
+    paper_indices = [0, 0, 1, 1, 2, 2, 2]
+    reviewer_indices = [0, 1, 1, 2, 0, 2, 3]
+    flows = [50, 50, 50, 50, 50, 50, 100]
+    for _ in range(20):
+        papers, reviewers = sample_bvn_sparse(
+            paper_indices, reviewer_indices, flows, 3, 4, one
+        )
+        pairs = set(zip(papers.tolist(), reviewers.tolist()))
+        assert pairs <= set(zip(paper_indices, reviewer_indices))
+        assert (2, 3) in pairs
+        assert np.array_equal(np.bincount(papers, minlength=3), [1, 1, 2])
+        assert np.all(np.bincount(reviewers, minlength=4) <= 1)
+
+    with pytest.raises(ValueError):
+        sample_bvn_sparse([0], [0, 1], [100, 0], 1, 2, one)
+
+
+@pytest.mark.parametrize(
+    "paper_indices, reviewer_indices, flows",
+    [
+        ([0, 2], [0, 1], [50, 50]),
+        ([0, -1], [0, 1], [50, 50]),
+        ([0, 1], [0, 2], [50, 50]),
+        ([0, 1], [-1, 1], [50, 50]),
+        ([0, 0], [1, 1], [50, 50]),
+        ([0, 1], [0, 1], [50.5, 50]),
+        ([0, 1], [0, 1], [-50, 50]),
+        ([0, 1], [0, 1], [[50, 50]]),
+    ],
+    ids=[
+        "paper_range",
+        "negative_paper",
+        "reviewer_range",
+        "negative_reviewer",
+        "duplicate",
+        "float_flow",
+        "negative_flow",
+        "flow_shape",
+    ],
+)
+def test_sample_bvn_sparse_invalid(paper_indices, reviewer_indices, flows):
+    """Entries the C code could not handle are rejected before sampling."""
+    with pytest.raises(ValueError):
+        sample_bvn_sparse(paper_indices, reviewer_indices, flows, 2, 2, 100)
+
+
+@pytest.mark.parametrize(
+    "paper_indices, reviewer_indices, flows",
+    [
+        ([0, 2], [0, 1], [50, 50]),
+        ([0, 1], [0, -1], [50, 50]),
+        ([1, 1], [0, 0], [50, 50]),
+        ([0, 1], [0, 1], [0.5, 0.5]),
+    ],
+    ids=["paper_range", "negative_reviewer", "duplicate", "float_flow"],
+)
+def test_sample_bvn_batch_invalid(paper_indices, reviewer_indices, flows):
+    """The batch sampler rejects the same entries as the sparse one."""
+    with pytest.raises(ValueError):
+        sample_bvn_batch(
+            paper_indices, reviewer_indices, flows, 2, 2, 100, 3, threads=2
+        )
+
+
+def test_sample_bvn_seed():
+    """
+    A seed determines the sample, also when threads sample concurrently,
+    and the samples follow the fractional assignment.
+    """
+    one = 1000
+    rng = np.random.default_rng(0)
+    # two reviewers per paper, spread evenly over 40 reviewers
+    num_papers, num_reviewers = 40, 40
+    flows = np.zeros((num_papers, num_reviewers), dtype=np.intc)
+    for offset in range(4):
+        flows[
+            np.arange(num_papers),
+            (np.arange(num_papers) + 7 * offset) % num_reviewers,
+        ] = one // 2
+    paper_indices, reviewer_indices = np.nonzero(flows)
+
+    def sample(seed):
+        papers, reviewers = sample_bvn_sparse(
+            paper_indices,
+            reviewer_indices,
+            flows[paper_indices, reviewer_indices],
+            num_papers,
+            num_reviewers,
+            one,
+            seed=seed,
+        )
+        sampled = np.zeros((num_papers, num_reviewers))
+        sampled[papers, reviewers] = 1
+        return sampled
+
+    seeds = rng.integers(0, 2**63, size=200).tolist()
+    serial = [sample(seed) for seed in seeds]
+    with ThreadPoolExecutor(4) as executor:
+        threaded = list(executor.map(sample, seeds))
+    for first, second in zip(serial, threaded):
+        assert np.array_equal(first, second)
+    assert not np.array_equal(serial[0], serial[1])
+
+    dense = flows.copy()
+    sample_bvn(dense, one, seed=seeds[0])
+    assert np.array_equal(dense, serial[0])
+
+    marginals = np.mean(serial, axis=0)
+    assert np.all(marginals[flows == 0] == 0)
+    assert np.abs(marginals[flows > 0] - 0.5).max() < 0.2
+
+
+def test_sample_assignments():
+    """
+    A batch of samples equals single samples with the same seeds, and their
+    mean is close to the fractional assignment.
+    """
+    S = np.transpose(np.array([[1, 0.1], [1, 1], [0.3, 0.6], [0.5, 0.8]]))
+    M = np.zeros(np.shape(S))
+    Q = np.full(np.shape(S), 0.75)
+    solver = RandomizedSolver(
+        [0, 0, 0, 0], [1, 1, 1, 1], [2, 2], encoder(-S, M, Q)
+    )
+    solver.solve()
+
+    seeds = list(range(500))
+    pairs = solver.sample_assignments(len(seeds), seeds=seeds, threads=3)
+    assert pairs.shape == (len(seeds), 4, 2)
+
+    mean_matrix = np.zeros(np.shape(S))
+    for sample, seed in zip(pairs, seeds):
+        solver.sample_assignment(seed=seed)
+        check_sampled_solution(solver)
+        sampled = np.zeros(np.shape(S))
+        sampled[sample[:, 0], sample[:, 1]] = 1
+        assert np.array_equal(sampled, solver.flow_matrix)
+        mean_matrix += sampled
+    mean_matrix /= len(seeds)
+    assert np.all(
+        np.abs(mean_matrix - solver.fractional_assignment_matrix) < 0.1
+    )